@@ -17,6 +17,7 @@ import numpy as np
 import pathlib
 
 # Import the system modules
+import config
 from drowsiness_detection import DrowsinessDetector
 from emotion_recognition import EmotionRecognizer
 from phone_detection import PhoneDetector
@@ -24,6 +25,10 @@ from heart_rate_monitor import HeartRateMonitor
 from music_player import MusicPlayer
 from sos_alert import SOSAlert
 from database import db
+from frame_bus import FrameBus
+from frame_context import FrameContext
+from model_registry import registry
+import overlay
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -38,7 +43,7 @@ thread_lock = threading.Lock()
 
 # Initialize the components
 try:
-    drowsiness_detector = DrowsinessDetector()
+    drowsiness_detector = DrowsinessDetector(user_id=config.DROWSINESS_PARAMS['DRIVER_USER_ID'])
     emotion_recognizer = EmotionRecognizer()
     phone_detector = PhoneDetector()
     heart_rate_monitor = HeartRateMonitor()
@@ -53,22 +58,39 @@ except Exception as e:
 # Camera capture object
 camera = None
 
-# Global variables to store the latest frame and results
-latest_frame = None
+# Posted and captured frames are published on a frame bus: readers take read-only
+# references with sequence numbers instead of copies. Results of the latest frame:
+frame_bus = FrameBus(config.SCHEDULER_PARAMS['FRAME_POOL_SIZE'])
 latest_results = {
     "drowsiness": {
         "ear_value": 0.0,
         "is_drowsy": False,
         "blink_count": 0,
         "yawn_count": 0,
+        "blink_rate": 0.0,
+        "fatigue_detected": False,
         "head_pose": {"x": 0, "y": 0, "z": 0},
         "drowsiness_level": 0,
         "alert_status": "normal",
-        "face_detected": False
+        "face_detected": False,
+        "face_count": 0,
+        "occupants": [],
+        "rolling_stats": {
+            "ear_mean": 0.0,
+            "ear_variance": 0.0,
+            "mar_mean": 0.0,
+            "mar_variance": 0.0,
+            "perclos": 0.0,
+            "samples": 0,
+            "window_seconds": 0.0
+        }
     },
     "emotion": {
         "current_emotion": "neutral",
         "confidence": 0.0,
+        "probabilities": {},  # Averaged probability of each of the seven emotions
+        "frame_age": None,  # Frames between the analysed frame and the one the emotion comes from
+        "age": None,  # Seconds since the emotion was computed
         "emotion_history": []
     },
     "phone": {
@@ -98,28 +120,36 @@ if not static_folder.exists():
 
 # Thread to process frames
 def process_frames():
-    global latest_frame, latest_results
+    global latest_results
     logger.info("Frame processing thread started")
+    last_seq = 0
+    last_emotion_seq = None
     
     while True:
-        with thread_lock:
-            frame = latest_frame
+        # Each frame is analysed once, at its capture time. Frames published while
+        # the previous one was processed are skipped.
+        frame_ref = frame_bus.wait(last_seq, timeout=1.0)
+        if frame_ref is None:
+            continue
+        last_seq = frame_ref.seq
         
-        if frame is not None:
-            # Create a copy to avoid modifying the original frame
-            frame_copy = frame.copy()
+        with frame_ref:
+            # Read-only reference shared with the video feed, the analyses never modify it
+            frame = frame_ref.image
+            frame_time = frame_ref.timestamp
             
             try:
                 # Process with drowsiness detector
                 if hasattr(drowsiness_detector, 'process_frame'):
-                    drowsy_result = drowsiness_detector.process_frame(frame_copy)
+                    drowsy_result = drowsiness_detector.process_frame(frame, timestamp=frame_time)
                 elif hasattr(drowsiness_detector, 'detect_drowsiness'):
                     # Backward compatibility
-                    processed_frame, is_drowsy, ear = drowsiness_detector.detect_drowsiness(frame_copy)
+                    processed_frame, is_drowsy, ear = drowsiness_detector.detect_drowsiness(
+                        frame, draw=False, timestamp=frame_time)
                     drowsy_result = {
                         "ear": ear,
                         "is_drowsy": is_drowsy,
-                        "blink_count": latest_results["drowsiness"]["blink_count"] + (1 if ear < 0.25 else 0),
+                        "blink_count": latest_results["drowsiness"]["blink_count"],
                         "yawn_count": latest_results["drowsiness"]["yawn_count"],
                         "head_pose": latest_results["drowsiness"]["head_pose"],
                         "face_detected": True
@@ -134,8 +164,13 @@ def process_frames():
                         latest_results["drowsiness"]["is_drowsy"] = drowsy_result.get("is_drowsy", False)
                         latest_results["drowsiness"]["blink_count"] = drowsy_result.get("blink_count", latest_results["drowsiness"]["blink_count"])
                         latest_results["drowsiness"]["yawn_count"] = drowsy_result.get("yawn_count", latest_results["drowsiness"]["yawn_count"])
+                        latest_results["drowsiness"]["blink_rate"] = drowsy_result.get("blink_rate", latest_results["drowsiness"]["blink_rate"])
+                        latest_results["drowsiness"]["fatigue_detected"] = drowsy_result.get("fatigue_detected", False)
                         latest_results["drowsiness"]["face_detected"] = drowsy_result.get("face_detected", True)
                         latest_results["drowsiness"]["head_pose"] = drowsy_result.get("head_pose", latest_results["drowsiness"]["head_pose"])
+                        latest_results["drowsiness"]["rolling_stats"] = drowsy_result.get("rolling_stats", latest_results["drowsiness"]["rolling_stats"])
+                        latest_results["drowsiness"]["face_count"] = drowsy_result.get("face_count", 0)
+                        latest_results["drowsiness"]["occupants"] = drowsy_result.get("occupants", [])
                         
                         # Calculate drowsiness level (0-100)
                         if drowsy_result.get("is_drowsy", False):
@@ -153,33 +188,46 @@ def process_frames():
             except Exception as e:
                 logger.error(f"Error in drowsiness detection: {str(e)}")
             
+            # Crops around the driver's face located above, shared with the other detectors
+            if hasattr(drowsiness_detector, 'frame_context'):
+                context = drowsiness_detector.frame_context(frame)
+            else:
+                context = FrameContext(frame)
+            
             try:
                 # Process with emotion recognizer
                 if hasattr(emotion_recognizer, 'process_frame'):
-                    emotion_result = emotion_recognizer.process_frame(frame_copy)
+                    # Returns at once with the latest finished result, which may come from an earlier frame
+                    emotion_result = emotion_recognizer.process_frame(frame, context, seq=frame_ref.seq,
+                                                                    timestamp=frame_time)
                     
                     if emotion_result:
                         with thread_lock:
                             latest_results["emotion"]["current_emotion"] = emotion_result.get("emotion", "neutral")
                             latest_results["emotion"]["confidence"] = emotion_result.get("confidence", 0.0)
+                            latest_results["emotion"]["probabilities"] = emotion_result.get("probabilities", {})
+                            latest_results["emotion"]["frame_age"] = last_seq - emotion_result["seq"]
+                            latest_results["emotion"]["age"] = emotion_result["age"]
                             
-                            # Add to emotion history
-                            latest_results["emotion"]["emotion_history"].append({
-                                "emotion": latest_results["emotion"]["current_emotion"],
-                                "confidence": latest_results["emotion"]["confidence"],
-                                "timestamp": datetime.now().isoformat()
-                            })
-                            
-                            # Keep only last 20 entries
-                            if len(latest_results["emotion"]["emotion_history"]) > 20:
-                                latest_results["emotion"]["emotion_history"] = latest_results["emotion"]["emotion_history"][-20:]
+                            # A cached result is only added to the history once
+                            if emotion_result["seq"] != last_emotion_seq:
+                                last_emotion_seq = emotion_result["seq"]
+                                latest_results["emotion"]["emotion_history"].append({
+                                    "emotion": latest_results["emotion"]["current_emotion"],
+                                    "confidence": latest_results["emotion"]["confidence"],
+                                    "timestamp": datetime.now().isoformat()
+                                })
+                                
+                                # Keep only last 20 entries
+                                if len(latest_results["emotion"]["emotion_history"]) > 20:
+                                    latest_results["emotion"]["emotion_history"] = latest_results["emotion"]["emotion_history"][-20:]
             except Exception as e:
                 logger.error(f"Error in emotion recognition: {str(e)}")
             
             try:
                 # Process with phone detector
                 if hasattr(phone_detector, 'process_frame'):
-                    phone_result = phone_detector.process_frame(frame_copy)
+                    phone_result = phone_detector.process_frame(frame, context)
                     
                     if phone_result:
                         with thread_lock:
@@ -194,7 +242,7 @@ def process_frames():
             try:
                 # Process with heart rate monitor
                 if hasattr(heart_rate_monitor, 'process_frame'):
-                    heart_result = heart_rate_monitor.process_frame(frame_copy)
+                    heart_result = heart_rate_monitor.process_frame(frame)
                     
                     if heart_result:
                         with thread_lock:
@@ -213,8 +261,6 @@ def process_frames():
                                 latest_results["heart_rate"]["history"] = latest_results["heart_rate"]["history"][-20:]
             except Exception as e:
                 logger.error(f"Error in heart rate monitoring: {str(e)}")
-        
-        time.sleep(0.1)  # Sleep to avoid high CPU usage
 
 # Variable to track the processing thread
 processing_thread = None
@@ -239,13 +285,18 @@ def get_status():
             "heart_rate_monitor": "active" if heart_rate_monitor else "inactive",
             "music_player": "active" if music_player else "inactive",
             "sos_alert": "active" if sos_alert else "inactive"
-        }
+        },
+        "frame_bus": frame_bus.stats()
     })
 
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    """Get the load state, load time and memory of the shared models"""
+    return jsonify(registry.stats())
+
 @app.route('/api/frame', methods=['POST'])
 def process_frame():
-    """Process a frame from the webcam"""
-    global latest_frame
+    """Process a frame from the webcam, with its optional capture time in 'timestamp' (ms)"""
     
     if not request.is_json:
         return jsonify({"error": "Expected JSON request"}), 400
@@ -263,9 +314,13 @@ def process_frame():
         
         if frame is None:
             return jsonify({"error": "Failed to decode image"}), 400
+        
+        # The client's capture time, the arrival time when it is not sent
+        timestamp = request.json.get('timestamp')
+        frame_time = float(timestamp) / 1000.0 if timestamp is not None else time.time()
             
-        with thread_lock:
-            latest_frame = frame
+        # The decoded image is handed over without a copy, imdecode cannot reuse pool buffers
+        frame_bus.publish(frame, frame_time, recycle=False)
         
         return jsonify({"status": "success", "message": "Frame received"})
     except Exception as e:
@@ -380,8 +435,13 @@ def get_drowsiness_data():
             "ear": latest_results["drowsiness"]["ear_value"],
             "blink_count": latest_results["drowsiness"]["blink_count"],
             "yawn_count": latest_results["drowsiness"]["yawn_count"],
+            "blink_rate": latest_results["drowsiness"]["blink_rate"],
             "drowsiness_level": latest_results["drowsiness"]["drowsiness_level"],
             "face_detected": latest_results["drowsiness"]["face_detected"],
+            "perclos": latest_results["drowsiness"]["rolling_stats"]["perclos"],
+            "ear_mean": latest_results["drowsiness"]["rolling_stats"]["ear_mean"],
+            "face_count": latest_results["drowsiness"]["face_count"],
+            "occupants": latest_results["drowsiness"]["occupants"],
             "head_pose": {
                 "x": latest_results["drowsiness"]["head_pose"]["x"],
                 "y": latest_results["drowsiness"]["head_pose"]["y"],
@@ -418,7 +478,7 @@ def release_camera():
 @app.route('/api/start-drowsiness-detection', methods=['GET'])
 def start_drowsiness_detection():
     """Start the drowsiness detection system"""
-    global latest_frame, processing_thread, camera
+    global processing_thread, camera
     
     try:
         # Initialize camera
@@ -431,8 +491,7 @@ def start_drowsiness_detection():
             return jsonify({"success": False, "message": "Failed to read from camera"})
         
         # Update latest frame
-        with thread_lock:
-            latest_frame = frame
+        frame_bus.publish(frame, time.time())
         
         # Start processing thread if not running
         if processing_thread is None or not processing_thread.is_alive():
@@ -449,12 +508,9 @@ def start_drowsiness_detection():
 @app.route('/api/stop-drowsiness-detection', methods=['GET'])
 def stop_drowsiness_detection():
     """Stop the drowsiness detection system"""
-    global latest_frame
-    
     try:
         # Clear latest frame to stop processing but keep thread running
-        with thread_lock:
-            latest_frame = None
+        frame_bus.clear()
         
         # Release camera
         release_camera()
@@ -478,43 +534,44 @@ def video_feed():
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
             cv2.imwrite(placeholder_path, black_img)
         
+        canvas = None  # Reused buffer the overlay is drawn on, bus frames are read-only
+        last_drawn = None  # (frame seq, drowsiness status) of the last encoded frame
+        frame_bytes = None
+        
         while True:
-            with thread_lock:
-                frame_copy = latest_frame.copy() if latest_frame is not None else None
+            frame_ref = frame_bus.latest()
             
-            if frame_copy is not None:
+            if frame_ref is not None:
                 try:
-                    # Add drowsiness detection visualizations
-                    with thread_lock:
-                        drowsy = latest_results["drowsiness"]["is_drowsy"]
-                        ear = latest_results["drowsiness"]["ear_value"]
-                        blink_count = latest_results["drowsiness"]["blink_count"]
-                        yawn_count = latest_results["drowsiness"]["yawn_count"]
-                    
-                    # Draw status
-                    status = "Drowsy" if drowsy else "Alert"
-                    color = (0, 0, 255) if drowsy else (0, 255, 0)
-                    cv2.putText(frame_copy, f"Status: {status}", (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                    cv2.putText(frame_copy, f"EAR: {ear:.2f}", (10, 60),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(frame_copy, f"Blinks: {blink_count}", (10, 90),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(frame_copy, f"Yawns: {yawn_count}", (10, 120),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    # Encode the frame as JPEG
-                    ret, jpeg = cv2.imencode('.jpg', frame_copy)
-                    if not ret:
-                        raise Exception("Failed to encode frame")
-                    
-                    frame_bytes = jpeg.tobytes()
+                    with frame_ref:
+                        # Add drowsiness detection visualizations, only drawn for feed viewers
+                        with thread_lock:
+                            drowsiness = latest_results["drowsiness"].copy()
+                        drawn = (frame_ref.seq, drowsiness["is_drowsy"], drowsiness["ear_value"],
+                                 drowsiness["blink_count"], drowsiness["yawn_count"])
+                        
+                        # Re-encode only when the frame or its status changed
+                        if drawn != last_drawn or frame_bytes is None:
+                            if canvas is None or canvas.shape != frame_ref.image.shape:
+                                canvas = np.empty_like(frame_ref.image)
+                            np.copyto(canvas, frame_ref.image)
+                            overlay.draw_status(canvas, drowsiness)
+                            
+                            # Encode the frame as JPEG
+                            ret, jpeg = cv2.imencode('.jpg', canvas)
+                            if not ret:
+                                raise Exception("Failed to encode frame")
+                            
+                            frame_bytes = jpeg.tobytes()
+                            last_drawn = drawn
                 except Exception as e:
                     logger.error(f"Error processing video frame: {str(e)}")
                     # Use placeholder on error
                     with open(placeholder_path, 'rb') as f:
                         frame_bytes = f.read()
+                    last_drawn = None
             else:
+                last_drawn = None
                 # Return a placeholder image
                 try:
                     with open(placeholder_path, 'rb') as f:
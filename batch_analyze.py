@@ -0,0 +1,395 @@
+"""
+Offline Batch Analysis for the Drowsiness Detection System
+Runs the DrowsinessDetector over a recorded video without display or
+real-time pacing and writes per-frame results of the primary occupant
+(the largest face, normally the driver) to CSV or Parquet
+
+With --workers the video is split into keyframe-aligned segments that are
+measured in parallel, one DrowsinessDetector per process. Face re-detection
+is scheduled by frame index, and every worker warms its face tracks and
+smoothing filters up on the frames before its segment, so the measurements
+match a single-process run up to smoothing residue that decays during the
+warm-up. The temporal drowsiness state (timers, blink cooldown, events) is
+then replayed over the merged measurements in timestamp order, one state
+per face track as in a single-process run. The tracks of a segment are
+matched to the previous segment's on the last warm-up frame, which both
+segments measured, so an occupant keeps their state across the boundary.
+Every worker loads its own models, so parallel runs only pay off on long videos.
+
+Usage:
+    python batch_analyze.py dashcam.mp4 -o results.csv [--stride 2] [--max-frames 10000]
+    python batch_analyze.py dashcam.mp4 -o results.parquet --workers 16
+"""
+
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import subprocess
+import time
+
+import cv2
+
+import config
+from capture import TimestampedCapture
+from drowsiness_detection import DriverState, DrowsinessDetector
+from face_tracking import rect_iou
+
+logger = logging.getLogger(__name__)
+
+# Seconds of video measured before each parallel segment and discarded, so
+# face tracks and smoothing filters enter the segment as in a serial run
+WARMUP_SECONDS = 2.0
+# Minimum parallel segment length in warm-up lengths
+MIN_SEGMENT_WARMUPS = 10
+
+RESULT_COLUMNS = [
+    'frame', 'timestamp_ms', 'face_detected', 'ear', 'mar',
+    'pitch', 'yaw', 'roll', 'is_drowsy', 'fatigue_detected',
+    'blink_count', 'yawn_count'
+]
+
+def analysis_to_row(frame_index, timestamp_ms, analysis, state):
+    """
+    Flatten a FrameAnalysis into a result row
+
+    Args:
+        frame_index: Index of the frame in the video
+        timestamp_ms: Position of the frame in the video in milliseconds
+        analysis: FrameAnalysis of the frame
+        state: DriverState of the primary occupant, the last primary
+            occupant's on frames without a face, None before the first face
+
+    Returns:
+        dict: Values for RESULT_COLUMNS
+    """
+    pitch, yaw, roll = analysis.head_pose if analysis.head_pose is not None else (None, None, None)
+    return {
+        'frame': frame_index,
+        'timestamp_ms': timestamp_ms,
+        'face_detected': analysis.face_detected,
+        'ear': analysis.ear,
+        'mar': analysis.mar,
+        'pitch': pitch,
+        'yaw': yaw,
+        'roll': roll,
+        'is_drowsy': analysis.is_drowsy,
+        'fatigue_detected': analysis.fatigue_detected,
+        'blink_count': state.events.blink_count if state is not None else 0,
+        'yawn_count': state.events.yawn_count if state is not None else 0
+    }
+
+def _read_frames(cap, start_frame, end_frame, stride):
+    """
+    Decode the analysed frames of a frame range
+
+    Args:
+        cap: Open TimestampedCapture positioned at start_frame
+        start_frame: Index of the first frame
+        end_frame: Index after the last frame, None for the end of the video
+        stride: Analyse frames whose index is a multiple of stride
+
+    Yields:
+        tuple: (frame_index, timestamp_ms, frame)
+    """
+    frame_index = start_frame
+    while end_frame is None or frame_index < end_frame:
+        if not cap.grab():
+            break
+
+        if frame_index % stride == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield frame_index, cap.timestamp * 1000.0, frame
+
+        frame_index += 1
+
+def analyze_video(video_path, stride=1, max_frames=None, detector=None):
+    """
+    Analyse a video file as fast as it can be decoded
+
+    Args:
+        video_path: Path to the video file
+        stride: Analyse every stride-th frame, skipped frames are grabbed but not decoded to BGR
+        max_frames: Stop after this many analysed frames
+        detector: DrowsinessDetector to use, a new one is created if None
+
+    Yields:
+        dict: One result row per analysed frame
+    """
+    cap = TimestampedCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+
+    detector = detector or DrowsinessDetector()
+    end_frame = max_frames * stride if max_frames is not None else None
+    state = None
+
+    try:
+        for frame_index, timestamp_ms, frame in _read_frames(cap, 0, end_frame, stride):
+            analysis = detector.measure_frame(frame, timestamp_ms / 1000.0, frame_index=frame_index // stride)
+            # Every occupant's track keeps its own state, the row reports the primary's
+            detector.update_state(analysis, timestamp_ms / 1000.0)
+            if analysis.primary is not None:
+                state = detector.tracker.tracks[analysis.primary.track_id].state
+            yield analysis_to_row(frame_index, timestamp_ms, analysis, state)
+    finally:
+        cap.release()
+
+def find_keyframes(video_path):
+    """
+    Find the frame indices of the keyframes with ffprobe
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        list: Sorted keyframe indices, empty if ffprobe is not available
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+        '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', video_path
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not read keyframes, splitting evenly: {e}")
+        return []
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    keyframes = set()
+    for line in output.split():
+        try:
+            keyframes.add(int(round(float(line.strip(',')) * fps)))
+        except ValueError:
+            continue
+    return sorted(keyframes)
+
+def plan_segments(frame_count, workers, keyframes=None, min_length=1):
+    """
+    Split a frame range into roughly equal segments starting on keyframes
+
+    Args:
+        frame_count: Number of frames to cover
+        workers: Number of worker processes
+        keyframes: Keyframe indices, segments are split evenly when empty
+        min_length: Minimum number of frames per segment
+
+    Returns:
+        list: (start_frame, end_frame) tuples covering [0, frame_count)
+    """
+    # A few segments per worker keeps the pool busy when segments differ in cost
+    segment_count = max(1, min(frame_count // max(1, min_length), workers * 4))
+    targets = [frame_count * i // segment_count for i in range(1, segment_count)]
+
+    if keyframes:
+        # Snap each boundary to the nearest keyframe so every worker can seek exactly
+        candidates = [k for k in keyframes if 0 < k < frame_count]
+        targets = [min(candidates, key=lambda k: abs(k - t)) for t in targets] if candidates else []
+
+    boundaries = [0] + sorted(set(targets)) + [frame_count]
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+_worker_detector = None
+
+def _init_worker():
+    """Create the detector of a worker process"""
+    global _worker_detector
+    logging.getLogger('drowsiness_detection').setLevel(logging.WARNING)
+    _worker_detector = DrowsinessDetector()
+
+def _measure_segment(task):
+    """
+    Measure one segment in a worker process
+
+    Args:
+        task: (video_path, warmup_frame, start_frame, end_frame, stride), frames from
+            warmup_frame to start_frame are measured to warm up the detector but not returned
+
+    Returns:
+        tuple: (overlap, results), overlap is the FrameAnalysis of the last warm-up
+            frame or None without a warm-up, results is a list of
+            (frame_index, timestamp_ms, FrameAnalysis) in frame order, all without pixel data
+    """
+    video_path, warmup_frame, start_frame, end_frame, stride = task
+    cap = TimestampedCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+
+    # Face tracks, smoothing and the head pose warm start are rebuilt during the warm-up
+    _worker_detector.tracker.reset()
+    overlap = None
+    results = []
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warmup_frame)
+        for frame_index, timestamp_ms, frame in _read_frames(cap, warmup_frame, end_frame, stride):
+            analysis = _worker_detector.measure_frame(frame, timestamp_ms / 1000.0,
+                                                      frame_index=frame_index // stride)
+            # Only the measurements are sent back to the parent process
+            analysis.frame = analysis.gray = None
+            if frame_index < start_frame:
+                overlap = analysis
+                continue
+            results.append((frame_index, timestamp_ms, analysis))
+    finally:
+        cap.release()
+    return overlap, results
+
+def _match_tracks(previous, overlap, iou_threshold):
+    """
+    Match a segment's tracks to the previous segment's on the frame both measured
+
+    Args:
+        previous: FrameAnalysis of the previous segment's last frame, with run-wide track ids
+        overlap: FrameAnalysis of the same frame from the segment's warm-up, with worker track ids
+        iou_threshold: Minimum IoU for two faces to be the same occupant
+
+    Returns:
+        dict: Worker track id -> run-wide track id of the matched occupants
+    """
+    if previous is None or overlap is None:
+        return {}
+
+    candidates = sorted((-rect_iou(face.face, previous_face.face), face.track_id, previous_face.track_id)
+                        for face in overlap.faces for previous_face in previous.faces)
+    identities = {}
+    for score, worker_id, track_id in candidates:
+        if -score < iou_threshold:
+            break
+        if worker_id not in identities and track_id not in identities.values():
+            identities[worker_id] = track_id
+    return identities
+
+def analyze_video_parallel(video_path, workers, stride=1, max_frames=None):
+    """
+    Analyse a video file with a pool of worker processes
+
+    Args:
+        video_path: Path to the video file
+        workers: Number of worker processes
+        stride: Analyse every stride-th frame
+        max_frames: Stop after this many analysed frames
+
+    Yields:
+        dict: One result row per analysed frame, in timestamp order
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    if max_frames is not None:
+        frame_count = min(frame_count, max_frames * stride)
+
+    # Segments are kept much longer than their warm-up, which is measured twice
+    warmup = int(round(WARMUP_SECONDS * fps))
+    keyframes = find_keyframes(video_path)
+    segments = plan_segments(frame_count, workers, keyframes, min_length=MIN_SEGMENT_WARMUPS * warmup)
+    if len(segments) < 2:
+        logger.info(f"Video too short to split, analysing {frame_count} frames in one process")
+        yield from analyze_video(video_path, stride, max_frames)
+        return
+
+    tasks = []
+    for start, end in segments:
+        # The warm-up starts on a keyframe too, so the worker can seek exactly
+        warmup_frame = max(0, start - warmup)
+        if keyframes:
+            warmup_frame = max([k for k in keyframes if k <= warmup_frame], default=0)
+        tasks.append((video_path, warmup_frame, start, end, stride))
+    logger.info(f"Analysing {frame_count} frames in {len(tasks)} segments with {workers} workers")
+
+    iou_threshold = config.DROWSINESS_PARAMS['TRACK_IOU_THRESHOLD']
+    states = {}  # Run-wide track id -> DriverState
+    next_track_id = 1
+    state = None
+    previous = None
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        # imap returns segments in order, so the states are replayed as results arrive
+        for overlap, results in pool.imap(_measure_segment, tasks):
+            # Occupants not carried into this segment never come back under their old id
+            identities = _match_tracks(previous, overlap, iou_threshold)
+            states = {track_id: states[track_id] for track_id in identities.values()}
+            results.sort(key=lambda result: (result[1], result[0]))
+            for frame_index, timestamp_ms, analysis in results:
+                for face in analysis.faces:
+                    if face.track_id not in identities:
+                        identities[face.track_id] = next_track_id
+                        states[next_track_id] = DriverState()
+                        next_track_id += 1
+                    face.track_id = identities[face.track_id]
+                    states[face.track_id].update(face, timestamp_ms / 1000.0)
+                if analysis.primary is not None:
+                    state = states[analysis.primary.track_id]
+                yield analysis_to_row(frame_index, timestamp_ms, analysis, state)
+            if results:
+                previous = results[-1][2]
+
+def write_results(rows, output_path):
+    """
+    Write result rows to CSV, or to Parquet when the path ends in .parquet
+
+    Args:
+        rows: Iterable of result rows
+        output_path: Destination file
+
+    Returns:
+        int: Number of rows written
+    """
+    if output_path.endswith('.parquet'):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("Parquet output needs pandas and pyarrow: pip install pandas pyarrow")
+
+        df = pd.DataFrame(list(rows), columns=RESULT_COLUMNS)
+        df.to_parquet(output_path, index=False)
+        return len(df)
+
+    count = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+def main():
+    """Parse arguments and analyse the video"""
+    parser = argparse.ArgumentParser(description="Headless batch drowsiness analysis of a video file")
+    parser.add_argument('video', help="Input video file")
+    parser.add_argument('-o', '--output', help="Output .csv or .parquet file (default: <video>.csv)")
+    parser.add_argument('--stride', type=int, default=1, help="Analyse every N-th frame")
+    parser.add_argument('--max-frames', type=int, default=None, help="Stop after this many analysed frames")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for keyframe-aligned segments")
+    args = parser.parse_args()
+
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    output = args.output or os.path.splitext(args.video)[0] + '.csv'
+    logging.getLogger('drowsiness_detection').setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        rows = analyze_video_parallel(args.video, args.workers, args.stride, args.max_frames)
+    else:
+        rows = analyze_video(args.video, args.stride, args.max_frames)
+    count = write_results(rows, output)
+    elapsed = time.perf_counter() - start
+
+    fps = count / elapsed if elapsed > 0 else 0.0
+    print(f"Analysed {count} frames in {elapsed:.1f} s ({fps:.1f} frames/s), results written to {output}")
+
+if __name__ == "__main__":
+    main()
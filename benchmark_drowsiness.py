@@ -0,0 +1,382 @@
+"""
+Benchmarks for the Drowsiness Detection System
+Measures the per-frame cost of the DrowsinessDetector pipeline on a video clip
+
+Usage:
+    python benchmark_drowsiness.py pipeline [--video uploads/Garden_Explosion.mp4] [--frames 300]
+    python benchmark_drowsiness.py scales [--scales 1.0 0.75 0.5 0.35 0.25]
+    python benchmark_drowsiness.py backends [--backends hog haar dnn] [--reference hog]
+    python benchmark_drowsiness.py faces [--counts 1 2 3 4]
+    python benchmark_drowsiness.py landmarks [--models dlib68 dlib_subset lbf]
+    python benchmark_drowsiness.py smoothing [--fps 30] [--strides 1 2 3]
+"""
+
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+
+import config
+import face_geometry
+from drowsiness_detection import DrowsinessDetector
+from face_detectors import create_face_detector
+from face_tracking import rect_iou
+from landmark_models import create_landmark_model
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_CLIP = 'uploads/Garden_Explosion.mp4'
+
+# Untimed frames run through each pipeline first, so lazy model loading is not measured
+WARMUP_FRAMES = 5
+
+def load_frames(video_path, max_frames):
+    """
+    Decode up to max_frames frames from a video into memory so decoding
+    cost is excluded from the measurements
+
+    Args:
+        video_path: Path to the video file
+        max_frames: Maximum number of frames to decode
+
+    Returns:
+        list: Decoded BGR frames
+    """
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+
+    cap.release()
+
+    if not frames:
+        raise RuntimeError(f"Could not read any frames from {video_path}")
+
+    return frames
+
+def time_per_frame(func, frames):
+    """
+    Call func on a copy of every frame and return per-frame latencies
+
+    Args:
+        func: Callable taking a single frame
+        frames: Frames to process
+
+    Returns:
+        np.ndarray: Per-frame latencies in milliseconds
+    """
+    latencies = []
+
+    for frame in frames:
+        frame = frame.copy()
+        start = time.perf_counter()
+        func(frame)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    return np.array(latencies)
+
+def print_latency(name, latencies):
+    """Print a one-line latency summary"""
+    print(f"{name:<28} mean {latencies.mean():7.2f} ms   "
+          f"p50 {np.percentile(latencies, 50):7.2f} ms   "
+          f"p95 {np.percentile(latencies, 95):7.2f} ms   "
+          f"{1000.0 / latencies.mean():7.1f} fps")
+
+def benchmark_pipeline(args):
+    """Compare process_frame against a single detect_drowsiness call"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}")
+
+    # Fresh detectors so tracking state does not carry over between runs
+    detect = DrowsinessDetector().detect_drowsiness
+    process = DrowsinessDetector().process_frame
+    time_per_frame(detect, frames[:WARMUP_FRAMES])
+    detect_latencies = time_per_frame(detect, frames)
+    time_per_frame(process, frames[:WARMUP_FRAMES])
+    process_latencies = time_per_frame(process, frames)
+
+    print_latency("detect_drowsiness", detect_latencies)
+    print_latency("process_frame", process_latencies)
+    print(f"process_frame / detect_drowsiness: {process_latencies.mean() / detect_latencies.mean():.2f}x")
+
+def benchmark_scales(args):
+    """Detection latency and landmark accuracy for each detection scale"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames ({frames[0].shape[1]}x{frames[0].shape[0]}) from {args.video}")
+
+    detector = DrowsinessDetector()
+    detector.detection_min_width = 0
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    results = {}
+
+    for scale in args.scales:
+        detector.detection_scale = scale
+        latencies = []
+        faces = []
+        ears = []
+
+        for gray in grays:
+            start = time.perf_counter()
+            detected = detector._detect_faces(gray)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+            face = detected[0] if detected else None
+            faces.append(face)
+            if face is None:
+                ears.append(np.nan)
+            else:
+                # Landmarks are always refined on the full resolution image
+                shape = face_geometry.shape_to_array(detector.predictor(gray, face))
+                ears.append(float(face_geometry.eye_aspect_ratio(shape)))
+
+        results[scale] = (np.array(latencies), faces, np.array(ears))
+
+    # Accuracy is measured against the largest scale
+    reference_scale = max(args.scales)
+    _, reference_faces, reference_ears = results[reference_scale]
+    reference_count = sum(face is not None for face in reference_faces)
+    print(f"Reference scale {reference_scale}: face found in {reference_count}/{len(frames)} frames")
+    print(f"{'scale':>6} {'detect ms':>10} {'recall':>7} {'mean IoU':>9} {'EAR MAE':>8}")
+
+    for scale in args.scales:
+        latencies, faces, ears = results[scale]
+        matched = [rect_iou(face, ref) for face, ref in zip(faces, reference_faces)
+                   if face is not None and ref is not None]
+        recall = len(matched) / float(reference_count) if reference_count else float('nan')
+        mean_iou = np.mean(matched) if matched else float('nan')
+        both = ~np.isnan(ears) & ~np.isnan(reference_ears)
+        ear_error = np.abs(ears[both] - reference_ears[both]).mean() if both.any() else float('nan')
+        print(f"{scale:>6.2f} {latencies.mean():>10.2f} {recall:>7.2f} {mean_iou:>9.3f} {ear_error:>8.4f}")
+
+def benchmark_backends(args):
+    """Per-backend detection latency and recall against a reference backend"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}")
+
+    # Detection goes through the detector so the configured detection scale applies
+    detector = DrowsinessDetector()
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    results = {}
+
+    for name in dict.fromkeys([args.reference] + args.backends):
+        try:
+            detector.detector = create_face_detector(name)
+        except Exception as e:
+            print(f"Skipping '{name}': {e}")
+            continue
+
+        latencies = []
+        faces = []
+        for gray in grays:
+            start = time.perf_counter()
+            detected = detector._detect_faces(gray)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            faces.append(detected[0] if detected else None)
+
+        results[name] = (np.array(latencies), faces)
+
+    if args.reference not in results:
+        print(f"Reference backend '{args.reference}' is not available")
+        return
+
+    reference_faces = results[args.reference][1]
+    reference_count = sum(face is not None for face in reference_faces)
+    print(f"Reference '{args.reference}': face found in {reference_count}/{len(frames)} frames, "
+          f"match threshold IoU >= {args.iou}")
+    print(f"{'backend':>8} {'mean ms':>8} {'p95 ms':>8} {'found':>6} {'recall':>7} {'mean IoU':>9}")
+
+    for name, (latencies, faces) in results.items():
+        found = sum(face is not None for face in faces) / float(len(faces))
+        ious = [rect_iou(face, ref) for face, ref in zip(faces, reference_faces)
+                if face is not None and ref is not None]
+        matched = sum(iou >= args.iou for iou in ious)
+        recall = matched / float(reference_count) if reference_count else float('nan')
+        mean_iou = np.mean(ious) if ious else float('nan')
+        print(f"{name:>8} {latencies.mean():>8.2f} {np.percentile(latencies, 95):>8.2f} "
+              f"{found:>6.2f} {recall:>7.2f} {mean_iou:>9.3f}")
+
+def benchmark_faces(args):
+    """Per-frame and per-face cost of measure_frame as the number of occupants grows"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}")
+    print("Occupants are simulated by tiling each frame side by side")
+    print(f"{'faces':>6} {'found':>6} {'frame ms':>9} {'tracked ms':>11} {'per face ms':>12}")
+
+    for count in args.counts:
+        tiled = [np.hstack([frame] * count) for frame in frames]
+        detector = DrowsinessDetector()
+        detector.tracker.max_faces = max(detector.tracker.max_faces, count)
+        # Each tile is detected at the scale a single frame would be
+        detector.detection_min_width *= count
+        for frame in tiled[:WARMUP_FRAMES]:
+            detector.measure_frame(frame)
+        latencies = []
+        tracked = []
+        found = []
+
+        for frame in tiled:
+            detecting = detector.detection_due
+            start = time.perf_counter()
+            analysis = detector.measure_frame(frame)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            latencies.append(elapsed)
+            # Tracked frames with every occupant skip detection, so their cost is the per-face landmark work
+            if not detecting and detector.last_detection_seconds is None and len(analysis.faces) == count:
+                tracked.append(elapsed)
+            found.append(len(analysis.faces))
+
+        if not tracked:
+            raise RuntimeError(f"No frame had all {count} faces tracked, found {max(found)} at most")
+
+        latencies = np.array(latencies)
+        tracked_mean = np.mean(tracked)
+        print(f"{count:>6} {np.mean(found):>6.2f} {latencies.mean():>9.2f} {tracked_mean:>11.2f} "
+              f"{tracked_mean / count:>12.2f}")
+
+def benchmark_landmarks(args):
+    """Per-face landmark latency and EAR/MAR error of each landmark model against dlib68"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}")
+
+    detector = DrowsinessDetector()
+    points = detector.landmark_points
+    samples = []
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        samples.extend((gray, face) for face in detector._detect_faces(gray))
+    print(f"{len(samples)} faces, requesting {len(points)} of 68 points")
+
+    results = {}
+    for name in dict.fromkeys(['dlib68'] + args.models):
+        try:
+            model = create_landmark_model(name)
+        except Exception as e:
+            print(f"Skipping '{name}': {e}")
+            continue
+
+        requested = points[np.isin(points, model.points)]
+        if samples:
+            # Load the model weights outside the timed loop
+            model.predict(samples[0][0], samples[0][1], requested)
+        latencies = []
+        shapes = []
+        for gray, face in samples:
+            start = time.perf_counter()
+            shape = model.predict(gray, face, requested)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            # Failed fits are left out of the error
+            shapes.append(shape if shape is not None else np.full((68, 2), np.nan))
+
+        shapes = np.array(shapes)
+        results[name] = (np.array(latencies), face_geometry.eye_aspect_ratio(shapes),
+                         face_geometry.mouth_aspect_ratio(shapes))
+
+    if not samples or 'dlib68' not in results:
+        print("No reference landmarks to compare against")
+        return
+
+    _, reference_ears, reference_mars = results['dlib68']
+    print(f"{'model':>12} {'mean ms':>8} {'p95 ms':>8} {'EAR MAE':>8} {'MAR MAE':>8} {'failed':>7}")
+    for name, (latencies, ears, mars) in results.items():
+        print(f"{name:>12} {latencies.mean():>8.3f} {np.percentile(latencies, 95):>8.3f} "
+              f"{np.nanmean(np.abs(ears - reference_ears)):>8.4f} {np.nanmean(np.abs(mars - reference_mars)):>8.4f} "
+              f"{np.isnan(ears).sum():>7}")
+
+def count_crossings(values, threshold):
+    """Number of times a series crosses a threshold"""
+    below = np.asarray(values) < threshold
+    return int(np.count_nonzero(below[1:] != below[:-1]))
+
+def benchmark_smoothing(args):
+    """EAR jitter, threshold crossings and cost with and without landmark/metric smoothing"""
+    frames = load_frames(args.video, args.frames)
+    print(f"Loaded {len(frames)} frames from {args.video}, timestamps at {args.fps:g} FPS")
+    threshold = config.DROWSINESS_PARAMS['EAR_THRESHOLD']
+    print(f"{'smoothing':>10} {'stride':>7} {'EAR jitter':>11} {'crossings':>10} {'ms/frame':>9}")
+
+    saved = dict(config.SMOOTHING_PARAMS)
+    try:
+        for smoothing in (False, True):
+            config.SMOOTHING_PARAMS['LANDMARK_SMOOTHING'] = smoothing
+            config.SMOOTHING_PARAMS['METRIC_SMOOTHING'] = smoothing
+            for stride in args.strides:
+                detector = DrowsinessDetector()
+                ears = []
+                latencies = []
+                for index in range(0, len(frames), stride):
+                    start = time.perf_counter()
+                    analysis = detector.measure_frame(frames[index], index / args.fps)
+                    latencies.append((time.perf_counter() - start) * 1000.0)
+                    if analysis.face_detected:
+                        ears.append(analysis.ear)
+
+                # Jitter: mean absolute frame-to-frame EAR change
+                jitter = np.abs(np.diff(ears)).mean() if len(ears) > 1 else float('nan')
+                print(f"{'on' if smoothing else 'off':>10} {stride:>7} {jitter:>11.4f} "
+                      f"{count_crossings(ears, threshold):>10} {np.mean(latencies):>9.2f}")
+    finally:
+        config.SMOOTHING_PARAMS.update(saved)
+
+def main():
+    """Parse arguments and run the selected benchmark"""
+    parser = argparse.ArgumentParser(description="Drowsiness detection benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="process_frame vs detect_drowsiness cost")
+    pipeline_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    pipeline_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to use")
+    pipeline_parser.set_defaults(func=benchmark_pipeline)
+
+    scales_parser = subparsers.add_parser('scales', help="Detection latency/accuracy across detection scales")
+    scales_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    scales_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to use")
+    scales_parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.35, 0.25],
+                               help="Detection scales to compare")
+    scales_parser.set_defaults(func=benchmark_scales)
+
+    backends_parser = subparsers.add_parser('backends', help="Latency/recall of each face detector backend")
+    backends_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    backends_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to use")
+    backends_parser.add_argument('--backends', nargs='+', default=['hog', 'haar', 'dnn'],
+                                 help="Face detector backends to compare")
+    backends_parser.add_argument('--reference', default='hog', help="Backend whose detections count as ground truth")
+    backends_parser.add_argument('--iou', type=float, default=0.3,
+                                 help="Minimum IoU for a detection to match the reference")
+    backends_parser.set_defaults(func=benchmark_backends)
+
+    faces_parser = subparsers.add_parser('faces', help="measure_frame cost per number of occupants")
+    faces_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    faces_parser.add_argument('--frames', type=int, default=150, help="Maximum number of frames to use")
+    faces_parser.add_argument('--counts', type=int, nargs='+', default=[1, 2, 3, 4],
+                              help="Numbers of occupants to simulate")
+    faces_parser.set_defaults(func=benchmark_faces)
+
+    landmarks_parser = subparsers.add_parser('landmarks', help="Per-face latency/accuracy of each landmark model")
+    landmarks_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    landmarks_parser.add_argument('--frames', type=int, default=150, help="Maximum number of frames to use")
+    landmarks_parser.add_argument('--models', nargs='+', default=['dlib68', 'dlib_subset', 'lbf'],
+                                  help="Landmark models to compare")
+    landmarks_parser.set_defaults(func=benchmark_landmarks)
+
+    smoothing_parser = subparsers.add_parser('smoothing', help="EAR jitter and threshold crossings with/without smoothing")
+    smoothing_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to benchmark on")
+    smoothing_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to use")
+    smoothing_parser.add_argument('--fps', type=float, default=30.0, help="Frame rate the timestamps are generated at")
+    smoothing_parser.add_argument('--strides', type=int, nargs='+', default=[1, 2, 3],
+                                  help="Analyse every N-th frame, simulating lower frame rates")
+    smoothing_parser.set_defaults(func=benchmark_smoothing)
+
+    args = parser.parse_args()
+    logging.getLogger('drowsiness_detection').setLevel(logging.WARNING)
+    logging.getLogger('face_detectors').setLevel(logging.WARNING)
+    logging.getLogger('landmark_models').setLevel(logging.WARNING)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmarks for the Emotion Recognition of the Drowsiness Detection System
+Measures emotion model throughput in faces per second on faces cut from a
+video clip, and how often adaptive sampling runs the model
+
+Usage:
+    python benchmark_emotion.py batch [--video uploads/Garden_Explosion.mp4] [--faces 256] [--batch-sizes 1 4 8 16 32]
+    python benchmark_emotion.py sampling [--video uploads/Garden_Explosion.mp4] [--fps 25] [--loops 10] [--confidence 0.7]
+"""
+
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+
+import config
+from benchmark_drowsiness import SAMPLE_CLIP, load_frames
+from drowsiness_detection import DrowsinessDetector
+from emotion_models import CLASSES, FACE_SIZE, KerasEmotionModel, create_emotion_model
+from emotion_sampling import EmotionSampler
+from model_registry import registry
+from smoothing import create_emotion_filter
+
+# Fixed schedule the adaptive sampling replaced: one check per second of capture time
+FIXED_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+def load_faces(video_path, max_frames, count):
+    """
+    Cut 48x48 grayscale faces out of a video with the Haar cascade the
+    recognizer uses, repeated until there are count faces
+
+    Args:
+        video_path: Path to the video file
+        max_frames: Maximum number of frames to decode
+        count: Number of faces to return
+
+    Returns:
+        np.ndarray: (count, 48, 48) uint8 faces
+    """
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    faces = []
+
+    for frame in load_frames(video_path, max_frames):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for (x, y, w, h) in cascade.detectMultiScale(gray, 1.1, 4):
+            faces.append(cv2.resize(gray[y:y+h, x:x+w], (FACE_SIZE, FACE_SIZE)))
+        if len(faces) >= count:
+            break
+
+    if not faces:
+        raise RuntimeError(f"No faces found in {video_path}")
+
+    return np.stack([faces[i % len(faces)] for i in range(count)])
+
+def benchmark_batch(args):
+    """Faces per second of per-face Model.predict against batched compiled inference"""
+    faces = load_faces(args.video, args.frames, args.faces)
+    print(f"Loaded {len(faces)} faces from {args.video}")
+
+    # Load the model and trace the compiled function outside the timed runs
+    keras_model = registry.get('emotion_model')
+    inputs = (faces.astype(np.float32) / 255.0)[..., np.newaxis]
+    keras_model.predict(inputs[:1], verbose=0)
+
+    start = time.perf_counter()
+    reference = np.concatenate([keras_model.predict(face[np.newaxis], verbose=0) for face in inputs])
+    baseline = len(faces) / (time.perf_counter() - start)
+
+    print(f"{'method':<24} {'faces/s':>9} {'speedup':>8} {'max |diff|':>11}")
+    print(f"{'predict, per face':<24} {baseline:>9.1f} {1.0:>8.2f} {0.0:>11.2e}")
+
+    for batch_size in args.batch_sizes:
+        model = KerasEmotionModel(max_batch=batch_size)
+        model.predict(faces[:batch_size])
+
+        start = time.perf_counter()
+        predictions = model.predict(faces)
+        throughput = len(faces) / (time.perf_counter() - start)
+
+        difference = np.abs(predictions - reference).max()
+        print(f"{f'tf.function, batch {batch_size}':<24} {throughput:>9.1f} "
+              f"{throughput / baseline:>8.2f} {difference:>11.2e}")
+
+def load_face_boxes(video_path, max_frames):
+    """
+    Driver face boxes as the monitoring loop shares them, from the drowsiness
+    analysis of every frame
+
+    Args:
+        video_path: Path to the video file
+        max_frames: Maximum number of frames to decode
+
+    Returns:
+        list: (grayscale frame, face box) per frame, the box is None where no face was found
+    """
+    detector = DrowsinessDetector()
+    faces = []
+
+    for index, frame in enumerate(load_frames(video_path, max_frames)):
+        analysis = detector.analyze_frame(frame, float(index))
+        faces.append((analysis.gray, detector.frame_context(frame).face_box()))
+
+    return faces
+
+def benchmark_sampling(args):
+    """Model invocations of the fixed one-second schedule against adaptive sampling"""
+    faces = load_face_boxes(args.video, args.frames)
+    print(f"Loaded {len(faces)} frames from {args.video}, {sum(box is not None for _, box in faces)} with a face, "
+          f"played {args.loops}x at {args.fps:g} FPS")
+
+    if args.confidence is None:
+        model = create_emotion_model()
+        emotion_filter = create_emotion_filter(CLASSES)
+    params = config.EMOTION_PARAMS
+    sampler = EmotionSampler(params['SAMPLE_MIN_INTERVAL'], params['SAMPLE_MAX_INTERVAL'],
+                             params['SAMPLE_CHANGE_THRESHOLD'], params['SAMPLE_CONFIDENCE'],
+                             params['SAMPLE_BACKOFF'])
+
+    fixed_calls = 0
+    last_fixed = None
+    confidence = args.confidence or 0.0
+    timestamp = 0.0
+
+    for _ in range(args.loops):
+        for gray, box in faces:
+            timestamp += 1.0 / args.fps
+            if box is None:
+                continue
+
+            if last_fixed is None or timestamp - last_fixed >= FIXED_INTERVAL:
+                fixed_calls += 1
+                last_fixed = timestamp
+
+            if sampler.should_sample(gray, timestamp, confidence, box) and args.confidence is None:
+                left, top, right, bottom = box
+                face = cv2.resize(gray[top:bottom, left:right], (FACE_SIZE, FACE_SIZE))
+                emotion_filter.update(model.predict(face[np.newaxis])[0], timestamp)
+                confidence = emotion_filter.confidence
+
+    adaptive_calls = sampler.samples
+    print(f"{'schedule':<28} {'model calls':>11} {'calls/min':>10}")
+    print(f"{f'fixed, every {FIXED_INTERVAL:g} s':<28} {fixed_calls:>11} {fixed_calls * 60.0 / timestamp:>10.1f}")
+    print(f"{'adaptive':<28} {adaptive_calls:>11} {adaptive_calls * 60.0 / timestamp:>10.1f}")
+    print(f"Reduction: {fixed_calls / max(adaptive_calls, 1):.1f}x, final interval {sampler.interval:.1f} s")
+
+def main():
+    """Parse arguments and run the selected benchmark"""
+    parser = argparse.ArgumentParser(description="Emotion recognition benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help="Per-face predict vs batched tf.function throughput")
+    batch_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file to cut faces from")
+    batch_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to decode")
+    batch_parser.add_argument('--faces', type=int, default=256, help="Number of faces to classify")
+    batch_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                              help="Batch sizes of the compiled model to compare")
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    sampling_parser = subparsers.add_parser('sampling', help="Model calls of fixed vs adaptive emotion sampling")
+    sampling_parser.add_argument('--video', default=SAMPLE_CLIP, help="Video file of steady driving")
+    sampling_parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames to decode")
+    sampling_parser.add_argument('--fps', type=float, default=30.0, help="Frame rate the timestamps are generated at")
+    sampling_parser.add_argument('--loops', type=int, default=10, help="Times the clip is played back to back")
+    sampling_parser.add_argument('--confidence', type=float,
+                                 help="Assume this smoothed confidence instead of running the emotion model")
+    sampling_parser.set_defaults(func=benchmark_sampling)
+
+    args = parser.parse_args()
+    logging.getLogger('model_registry').setLevel(logging.WARNING)
+    logging.getLogger('drowsiness_detection').setLevel(logging.WARNING)
+    logging.getLogger('face_detectors').setLevel(logging.WARNING)
+    logging.getLogger('landmark_models').setLevel(logging.WARNING)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Capture Module for the Drowsiness Detection System
+Wraps cv2.VideoCapture so every frame carries its capture timestamp: the
+media position (CAP_PROP_POS_MSEC) for video files and the driver's buffer
+timestamp for cameras, falling back to the time of the grab. Drowsiness
+timing driven by these timestamps does not depend on how fast frames are
+processed, so frames can be dropped or replayed faster than real time.
+"""
+
+import logging
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class TimestampedCapture:
+    """Video source whose frames carry monotonic capture timestamps in seconds"""
+
+    def __init__(self, source, backend: Optional[int] = None):
+        """
+        Open a video source
+
+        Args:
+            source: Camera index or video file path/URL, as for cv2.VideoCapture
+            backend: Optional cv2.CAP_* backend for cameras
+        """
+        self.source = source
+        self.cap = cv2.VideoCapture(source) if backend is None else cv2.VideoCapture(source, backend)
+        # Files report their media position, live sources are anchored to the wall clock
+        self.live = isinstance(source, int)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0.0
+        self.frame_interval = 1.0 / fps if fps and 0 < fps < 1000 else 1.0 / 30
+        self.timestamp = None  # Capture time of the latest grabbed frame
+        self._offset = 0.0  # Added to file positions after a rewind
+        self._pts_origin = None  # (camera timestamp, wall time) of the first camera timestamp
+        self._last_pts = None
+
+    def isOpened(self) -> bool:
+        """Whether the source was opened"""
+        return self.cap.isOpened()
+
+    def get(self, prop: int) -> float:
+        """Read a cv2.CAP_PROP_* property of the underlying capture"""
+        return self.cap.get(prop)
+
+    def set(self, prop: int, value) -> bool:
+        """Set a cv2.CAP_PROP_* property of the underlying capture"""
+        return self.cap.set(prop, value)
+
+    def grab(self) -> bool:
+        """
+        Grab the next frame and record its capture timestamp
+
+        Returns:
+            bool: Whether a frame was grabbed
+        """
+        if not self.cap.grab():
+            return False
+
+        timestamp = self._live_timestamp() if self.live else self._file_timestamp()
+        # Timestamps never go backwards, e.g. after a file rewind or a camera clock glitch
+        if self.timestamp is not None and timestamp <= self.timestamp:
+            timestamp = self.timestamp + 1e-6
+        self.timestamp = timestamp
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decode the grabbed frame, into image when given"""
+        return self.cap.retrieve(image)
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray], Optional[float]]:
+        """
+        Grab and decode the next frame
+
+        Args:
+            image: Optional preallocated BGR array to decode into
+
+        Returns:
+            tuple: (success, frame, capture timestamp in seconds)
+        """
+        if not self.grab():
+            return False, None, None
+        ret, frame = self.retrieve(image)
+        return ret, frame, self.timestamp if ret else None
+
+    def rewind(self) -> bool:
+        """
+        Restart a video file from the first frame, timestamps keep increasing
+
+        Returns:
+            bool: Whether the position was reset
+        """
+        if self.timestamp is not None:
+            self._offset = self.timestamp + self.frame_interval
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        """Release the underlying capture"""
+        self.cap.release()
+
+    def _file_timestamp(self) -> float:
+        """Media position of the grabbed frame"""
+        position = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if position < 0:
+            # Container without timestamps, count frames instead
+            return (self.timestamp + self.frame_interval) if self.timestamp is not None else self._offset
+        return self._offset + position / 1000.0
+
+    def _live_timestamp(self) -> float:
+        """Driver timestamp of the grabbed frame on the wall clock, or the grab time"""
+        now = time.time()
+        pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+        if pts <= 0 or (self._last_pts is not None and pts <= self._last_pts):
+            # The backend does not provide usable buffer timestamps
+            return now
+
+        self._last_pts = pts
+        if self._pts_origin is None:
+            self._pts_origin = (pts, now)
+        timestamp = self._pts_origin[1] + (pts - self._pts_origin[0])
+        if abs(timestamp - now) > 1.0:
+            # The camera clock drifted or restarted, re-anchor it
+            logger.debug("Camera timestamps re-anchored to the wall clock")
+            self._pts_origin = (pts, now)
+            timestamp = now
+        return timestamp
@@ -38,9 +38,97 @@ EMERGENCY_CONTACTS = [
 
 # Drowsiness Detection Parameters
 DROWSINESS_PARAMS = {
-    'EAR_THRESHOLD': 0.25,  # Eye Aspect Ratio threshold
-    'CONSECUTIVE_FRAMES': 20,  # Number of consecutive frames to trigger alert
-    'BLINK_RATIO_THRESHOLD': 0.8  # Threshold for blink ratio
+    'DRIVER_USER_ID': 1,  # users table id of the monitored driver, whose EAR calibration the apps persist
+    'EAR_THRESHOLD': 0.25,  # Eye Aspect Ratio threshold, used until the driver's own threshold is calibrated
+    'EAR_CALIBRATION_SECONDS': 120.0,  # Seconds of open-eye EAR learned per driver before the threshold adapts
+    'EAR_CALIBRATION_MIN_SAMPLES': 300,  # Face samples required to finish the calibration
+    'EAR_CALIBRATION_RATIO': 0.75,  # Calibrated threshold as a fraction of the driver's median open-eye EAR
+    'EAR_CALIBRATION_QUANTILE': 0.1,  # The calibrated threshold never exceeds this quantile of the open-eye EAR
+    'EAR_THRESHOLD_MIN': 0.15,  # Lower bound of a calibrated threshold
+    'EAR_THRESHOLD_MAX': 0.3,  # Upper bound of a calibrated threshold
+    'EYES_CLOSED_SECONDS': 0.67,  # Seconds of continuous eye closure that flag fatigue (20 frames at 30 FPS)
+    'BLINK_RATIO_THRESHOLD': 0.8,  # Threshold for blink ratio
+    'REDETECT_INTERVAL': 10,  # Run the full face detector at least every N frames while tracking
+    'MAX_TRACKING_DRIFT': 0.15,  # Max landmark shift/scale change between frames (fraction of face size) before re-detecting
+    'DETECTION_SCALE': 0.5,  # Face detection runs on the frame downscaled by this factor, landmarks stay full resolution
+    'DETECTION_MIN_WIDTH': 640,  # Never downscale the detection image below this width (pixels)
+    'DETECTION_UPSAMPLE': 0,  # Number of times dlib upsamples the detection image (finds smaller faces, much slower)
+    'FACE_DETECTOR': 'hog',  # Face detector backend: 'hog' (dlib), 'haar' (OpenCV cascade) or 'dnn' (OpenCV res10 SSD)
+    'LANDMARK_MODEL': 'dlib68',  # Landmark model: 'dlib68', 'dlib_subset' (eye/mouth-only dlib model) or 'lbf' (OpenCV facemark)
+    'LANDMARK_METRICS': ['ear', 'mar', 'head_pose'],  # Metrics to compute, only their landmarks are requested from the model
+    'LANDMARK_SUBSET_POINTS': list(range(36, 68)),  # 68-point indices regressed by the 'dlib_subset' model, in model part order
+    'MAX_FACES': 4,  # Occupants analysed per frame, largest faces first
+    'TRACK_IOU_THRESHOLD': 0.3,  # Minimum IoU for a detection to continue an existing face track
+    'TRACK_MAX_CENTROID_SHIFT': 0.5,  # Fallback match: max centre shift between detections (fraction of face width)
+    'TRACK_MAX_MISSED': 3,  # Detection passes an occupant may be missing before their track and state are dropped
+    'PERCLOS_WINDOW_SECONDS': 30.0,  # Seconds of EAR/MAR samples in the rolling window used for PERCLOS and statistics
+    'HISTORY_MAX_FPS': 60,  # Highest frame rate the window holds in full, it sizes the sample buffer
+    'HISTORY_MAX_SAMPLE_SECONDS': 0.25,  # Longest time one sample covers in PERCLOS, gaps without a face are not counted
+    'PERCLOS_THRESHOLD': 0.4,  # Fraction of time with eyes closed over the window that counts as drowsy
+    'PERCLOS_MIN_SECONDS': 10.0,  # Window length required before PERCLOS is used for the decision
+    'MAR_THRESHOLD': 0.6,  # Mouth Aspect Ratio above which the mouth counts as open for a yawn
+    'BLINK_MIN_DURATION': 0.05,  # Seconds, shorter eye closures are treated as landmark noise
+    'BLINK_MAX_DURATION': 0.5,  # Seconds, longer eye closures count as long closures instead of blinks
+    'YAWN_MIN_DURATION': 1.0,  # Seconds the mouth must stay open for a yawn
+    'BLINK_RATE_WINDOW': 60.0,  # Seconds over which the blink rate is measured
+    'BLINK_RATE_THRESHOLD': 30,  # Blinks per minute above which fatigue is flagged
+    'HEAD_POSE_LIMIT': 20,  # Degrees of pitch/yaw/roll away from the driver's neutral pose beyond which fatigue is flagged
+    'HEAD_POSE_CALIBRATION_SECONDS': 30.0,  # Seconds of head poses the neutral pose is learned from per driver
+    'HEAD_POSE_CALIBRATION_MIN_SAMPLES': 30  # Poses required before head movement is checked
+}
+
+# Face Detector Backend Parameters
+FACE_DETECTOR_PARAMS = {
+    'HAAR_CASCADE': 'haarcascade_frontalface_default.xml',  # Path, or file name in cv2.data.haarcascades
+    'HAAR_SCALE_FACTOR': 1.1,  # Scale step between cascade pyramid levels
+    'HAAR_MIN_NEIGHBORS': 5,  # Neighbouring detections required to keep a face
+    'DNN_CONFIDENCE': 0.5  # Minimum SSD detection confidence
+}
+
+# Temporal Smoothing Parameters (One-Euro filters per face track)
+SMOOTHING_PARAMS = {
+    'LANDMARK_SMOOTHING': True,  # Filter the landmark coordinates before EAR/MAR and head pose
+    'LANDMARK_MIN_CUTOFF': 1.5,  # Hz, landmark cutoff at rest (lower removes more jitter)
+    'LANDMARK_BETA': 20.0,  # Cutoff increase per face size per second of landmark speed
+    'METRIC_SMOOTHING': True,  # Filter EAR and MAR
+    'METRIC_MIN_CUTOFF': 3.0,  # Hz, EAR/MAR cutoff at rest
+    'METRIC_BETA': 5.0,  # Cutoff increase per unit/s of EAR/MAR change
+    'D_CUTOFF': 1.0  # Hz, cutoff of the speed estimate
+}
+
+# Real-Time Scheduling Parameters (live monitoring loops)
+SCHEDULER_PARAMS = {
+    'TARGET_LATENCY': 0.15,  # Seconds from frame capture to the end of its analysis
+    'DETECTION_MAX_INTERVAL': 2.0,  # Seconds a due face re-detection may be deferred while over budget
+    'EMOTION_MAX_INTERVAL': 5.0,  # Seconds after which an emotion check runs even when over budget
+    'PHONE_INTERVAL': 1.0,  # Seconds between phone checks
+    'PHONE_MAX_INTERVAL': 10.0,  # Seconds after which a phone check runs even when over budget
+    'COST_SMOOTHING': 0.2,  # Weight of the newest run time in the smoothed stage costs
+    'FRAME_POOL_SIZE': 4  # Preallocated frame buffers recycled by the frame bus
+}
+
+# Emotion Recognition Parameters
+EMOTION_PARAMS = {
+    'BACKEND': 'keras',  # Emotion model backend: 'keras' (compiled tf.function), or without TensorFlow 'tflite',
+                         # 'onnx' (ONNX Runtime) or 'opencv' (OpenCV DNN on the ONNX file), see export_emotion_model.py
+    'MAX_BATCH': 16,  # Faces per inference call, more are split into several calls
+    'QUEUE_SIZE': 4,  # Frames waiting for the worker, their faces are classified in one batch
+    'EMA_TIME_CONSTANT': 2.0,  # Seconds, time constant of the moving average of the emotion probabilities
+    'SWITCH_MARGIN': 0.1,  # Averaged probability by which a new emotion must lead the current one to replace it
+    'ADAPTIVE_SAMPLING': True,  # Skip the model while the face is unchanged, otherwise every submitted frame is classified
+    'SAMPLE_MIN_INTERVAL': 0.2,  # Seconds between inferences while the face changes
+    'SAMPLE_MAX_INTERVAL': 10.0,  # Seconds between inferences while the face is unchanged and the emotion confident
+    'SAMPLE_BACKOFF': 2.0,  # Growth (unchanged face) or shrinkage (changed face) of the interval after each inference
+    'SAMPLE_CHANGE_THRESHOLD': 0.05,  # Mean 8x8 face thumbnail difference (fraction of 255) at which the face counts as changed
+    'SAMPLE_CONFIDENCE': 0.6  # Smoothed confidence at which the interval jumps to SAMPLE_MAX_INTERVAL
+}
+
+# Region of Interest Parameters (crops of the driver's face shared with the other detectors)
+ROI_PARAMS = {
+    'FACE_MARGIN': 0.1,  # Fraction of the face size added on each side of the emotion face crop
+    'PHONE_REGION_WIDTH': 3.0,  # Width of the phone region in face widths, centred on the face
+    'PHONE_REGION_ABOVE': 0.5,  # Face heights the phone region extends above the face
+    'PHONE_REGION_BELOW': 2.5  # Face heights the phone region extends below the face, down to the hands
 }
 
 # Heart Rate Parameters
@@ -53,6 +141,13 @@ HEART_RATE_PARAMS = {
 # Paths
 SHAPE_PREDICTOR_PATH = 'shape_predictor_68_face_landmarks.dat'
 EMOTION_MODEL_PATH = 'models/emotion_model.h5'
+EMOTION_TFLITE_PATH = 'models/emotion_model.tflite'
+EMOTION_ONNX_PATH = 'models/emotion_model.onnx'
+PHONE_MODEL_PATH = 'yolov5s.pt'
+LANDMARK_SUBSET_MODEL_PATH = 'models/shape_predictor_eyes_mouth.dat'
+LBF_MODEL_PATH = 'models/lbfmodel.yaml'
+FACE_DNN_PROTOTXT_PATH = 'models/deploy.prototxt'
+FACE_DNN_MODEL_PATH = 'models/res10_300x300_ssd_iter_140000.caffemodel'
 
 # Music Folders
 MUSIC_FOLDERS = {
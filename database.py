@@ -53,6 +53,14 @@ class Database:
                 )
             """)
             
+            # Per-driver EAR calibration, added to databases created before it existed
+            cursor.execute("PRAGMA table_info(users)")
+            user_columns = [row[1] for row in cursor.fetchall()]
+            for column, column_type in (('ear_baseline', 'REAL'), ('ear_threshold', 'REAL'),
+                                        ('calibrated_at', 'TIMESTAMP')):
+                if column not in user_columns:
+                    cursor.execute(f"ALTER TABLE users ADD COLUMN {column} {column_type}")
+            
             # Create alerts table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS alerts (
@@ -137,6 +145,43 @@ class Database:
             print(f"Error logging emotion: {e}")
             return False
     
+    def get_ear_calibration(self, user_id=1):
+        """Get a user's stored EAR baseline and threshold, or None if not calibrated"""
+        if not self.connection:
+            self.connect()
+        
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT ear_baseline, ear_threshold FROM users WHERE user_id = ?", (user_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            if row is None or row['ear_threshold'] is None:
+                return None
+            return {"ear_baseline": row['ear_baseline'], "ear_threshold": row['ear_threshold']}
+        except Exception as e:
+            print(f"Error getting EAR calibration: {e}")
+            return None
+    
+    def save_ear_calibration(self, user_id=1, ear_baseline=None, ear_threshold=None):
+        """Store a user's calibrated EAR baseline and threshold"""
+        if not self.connection:
+            self.connect()
+        
+        try:
+            cursor = self.connection.cursor()
+            query = """
+                UPDATE users
+                SET ear_baseline = ?, ear_threshold = ?, calibrated_at = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            """
+            cursor.execute(query, (ear_baseline, ear_threshold, user_id))
+            self.connection.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            print(f"Error saving EAR calibration: {e}")
+            return False
+    
     def get_recent_alerts(self, limit=10):
         """Get recent alerts from the database"""
         if not self.connection:
@@ -17,6 +17,9 @@ import logging
 import subprocess
 import platform
 from werkzeug.utils import secure_filename
+import config
+from capture import TimestampedCapture
+from scheduler import FrameGrabber, RealtimeScheduler
 from phone_detection import PhoneDetector
 from drowsiness_detection import DrowsinessDetector
 from emotion_recognition import EmotionRecognizer
@@ -24,6 +27,7 @@ from heart_rate_monitor import HeartRateMonitor
 from music_player import MusicPlayer
 from sos_alert import SOSAlert
 from database import db
+import overlay
 import keyboard  # Add keyboard module for key detection
 import asyncio
 import queue
@@ -35,7 +39,8 @@ logger = logging.getLogger(__name__)
 
 # Global variables for video streaming
 camera = None
-output_frame = None
+output_frame = None  # FrameRef of the latest analysed frame, shared read-only with the video streams
+output_analysis = None  # FrameAnalysis of output_frame, drawn by the video streams
 frame_lock = threading.Lock()
 is_monitoring = False
 monitoring_thread = None
@@ -43,8 +48,10 @@ current_emotion = "unknown"
 current_emotion_confidence = 0.0
 current_ear = 0
 is_drowsy = False
+phone_detected = False
 heart_rate = 75  # Initial heart rate
 monitoring_mode = None  # 'live' or 'upload'
+frame_scheduler = None  # RealtimeScheduler of the running monitoring loop
 video_file = None  # Path to uploaded video file
 
 # Upload folder configuration
@@ -61,7 +68,7 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # Initialize detection modules
-drowsiness_detector = DrowsinessDetector()
+drowsiness_detector = DrowsinessDetector(user_id=config.DROWSINESS_PARAMS['DRIVER_USER_ID'])
 phone_detector = PhoneDetector()
 emotion_recognizer = EmotionRecognizer()
 heart_rate_monitor = HeartRateMonitor()
@@ -307,8 +314,11 @@ def fix_database():
         return False
 
 def generate_frames():
-    """Generate frames for video streaming with reduced latency"""
-    global output_frame
+    """Generate frames for video streaming with reduced latency.
+    
+    The stream takes a reference to the latest analysed frame instead of a
+    copy, draws the overlay into its own reused buffer, and only re-encodes
+    when a new frame was published."""
     
     # Create a placeholder frame with a message when no camera feed is available
     placeholder_height, placeholder_width = 480, 640
@@ -318,28 +328,42 @@ def generate_frames():
     cv2.putText(placeholder, "Please check your webcam", (int(placeholder_width/4), int(placeholder_height/2) + 40),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
     
+    # Compress the frame with lower quality to reduce latency
+    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]  # Lower quality (0-100)
+    canvas = None  # Reused buffer the overlay is drawn on
+    last_seq = None
+    chunk = None
+    
     while True:
         try:
-            # Check if output_frame is available
-            if output_frame is None:
+            with frame_lock:
+                frame = output_frame.acquire() if output_frame is not None else None
+                analysis = output_analysis
+            
+            if frame is None:
                 # Use placeholder if no frame is available
-                frame_to_show = placeholder.copy()
+                if last_seq != 0:
+                    _, buffer = cv2.imencode('.jpg', placeholder, encode_param)
+                    chunk = buffer.tobytes()
+                    last_seq = 0
+            elif frame.seq != last_seq:
+                with frame:
+                    if canvas is None or canvas.shape != frame.image.shape:
+                        canvas = np.empty_like(frame.image)
+                    np.copyto(canvas, frame.image)
+                    last_seq = frame.seq
+                if analysis is not None:
+                    overlay.draw_drowsiness(canvas, analysis)
+                overlay.draw_emotion(canvas, current_emotion, current_emotion_confidence)
+                _, buffer = cv2.imencode('.jpg', canvas, encode_param)
+                chunk = buffer.tobytes()
             else:
-                # Acquire the lock
-                with frame_lock:
-                    if output_frame is None:
-                        frame_to_show = placeholder.copy()
-                    else:
-                        # Make a copy to avoid modifying the frame while it's being processed
-                        frame_to_show = output_frame.copy()
-            
-            # Compress the frame with lower quality to reduce latency
-            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]  # Lower quality (0-100)
-            _, buffer = cv2.imencode('.jpg', frame_to_show, encode_param)
+                # Same frame as last time, resend its encoding
+                frame.release()
             
             # Yield the frame
             yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+                   b'Content-Type: image/jpeg\r\n\r\n' + chunk + b'\r\n')
             
             # Add a small delay to control frame rate
             time.sleep(0.03)  # ~30 FPS
@@ -353,62 +377,99 @@ def generate_frames():
             time.sleep(0.03)
 
 def monitoring_loop():
-    """Main monitoring loop with optimized processing"""
-    global output_frame, is_monitoring, current_emotion, current_emotion_confidence
-    global current_ear, is_drowsy, heart_rate, monitoring_mode, video_file, camera
-    global monitoring_stats
+    """Main monitoring loop: always analyses the freshest frame and runs the
+    optional analyses only while they fit into the latency budget"""
+    global output_frame, output_analysis, is_monitoring, current_emotion, current_emotion_confidence
+    global current_ear, is_drowsy, phone_detected, heart_rate, monitoring_mode, video_file, camera
+    global monitoring_stats, frame_scheduler
     
     logger.info(f"Starting monitoring loop in {monitoring_mode} mode")
+    grabber = None
     
     try:
-        # Initialize camera
+        # Initialize camera, every frame carries its capture timestamp
         if monitoring_mode == 'live':
-            camera = cv2.VideoCapture(0)
+            camera = TimestampedCapture(0)
         else:
-            camera = cv2.VideoCapture(video_file)
+            camera = TimestampedCapture(video_file)
         
         if not camera.isOpened():
             raise Exception("Failed to open camera/video source")
         
+        # The grabber drains the capture on its own thread, uploaded videos are
+        # played back in real time and looped
+        grabber = FrameGrabber(camera, loop=monitoring_mode == 'upload',
+                               pool_size=config.SCHEDULER_PARAMS['FRAME_POOL_SIZE'])
+        grabber.start()
+        
+        params = config.SCHEDULER_PARAMS
+        frame_scheduler = RealtimeScheduler(params['TARGET_LATENCY'], params['COST_SMOOTHING'])
+        frame_scheduler.add_stage('drowsiness', required=True)
+        frame_scheduler.add_stage('detection', max_interval=params['DETECTION_MAX_INTERVAL'],
+                                  due=lambda: drowsiness_detector.detection_due)
+        # Emotion is checked often but cheaply, the recognizer's sampler decides when the model runs
+        frame_scheduler.add_stage('emotion', min_interval=config.EMOTION_PARAMS['SAMPLE_MIN_INTERVAL'],
+                                  max_interval=params['EMOTION_MAX_INTERVAL'])
+        frame_scheduler.add_stage('phone', min_interval=params['PHONE_INTERVAL'],
+                                  max_interval=params['PHONE_MAX_INTERVAL'])
+        
         frame_count = 0
         last_stats_update = time.time()
-        last_emotion_check = time.time()
-        emotion_check_interval = 1.0  # Check emotion every second
         
         logger.info(f"Monitoring started in {monitoring_mode} mode")
         
         while is_monitoring:
-            success, frame = camera.read()
+            captured = grabber.next()
             
-            if not success:
-                if monitoring_mode == 'upload':
-                    camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                else:
+            if captured is None:
+                if grabber.finished:
                     logger.error("Failed to capture frame from camera")
                     break
+                continue
             
             current_time = time.time()
+            frame = captured.image  # Read-only, shared with the video streams
+            planned = frame_scheduler.begin(captured)
             
-            # Process frame for drowsiness detection
-            frame, drowsy, ear = drowsiness_detector.detect_drowsiness(frame)
+            # Process frame for drowsiness detection. Timing follows the capture
+            # timestamps, so dropped frames do not change the decisions. A due face
+            # re-detection waits while the frame is over budget. The overlay is
+            # drawn by the video streams, on their own buffers.
+            start = time.perf_counter()
+            try:
+                analysis = drowsiness_detector.analyze_frame(frame, captured.timestamp,
+                                                             redetect='detection' in planned)
+            except Exception as e:
+                logger.error(f"Error in drowsiness detection: {e}")
+                analysis = None
+            drowsiness_detector.record_stages(frame_scheduler, time.perf_counter() - start)
+            drowsy = analysis.is_drowsy if analysis is not None else False
+            ear = analysis.ear if analysis is not None else 0.0
             
             # Update drowsiness status
             is_drowsy = drowsy
             current_ear = ear
             
-            # Check emotion periodically
-            if current_time - last_emotion_check >= emotion_check_interval:
-                # Detect emotion
-                emotion, confidence, frame = emotion_recognizer.detect_emotion(frame)
-                current_emotion = emotion
-                current_emotion_confidence = confidence
+            # The driver's face found above is shared with the other detectors as crops of the frame
+            context = drowsiness_detector.frame_context(frame)
+            
+            # Check emotion when it fits into the budget, at most every SAMPLE_MIN_INTERVAL
+            if 'emotion' in planned:
+                with frame_scheduler.measure('emotion'):
+                    emotion, confidence, _ = emotion_recognizer.detect_emotion(frame, context, captured.timestamp)
                 
-                # Play appropriate music based on emotion
-                if emotion in ['happy', 'sad', 'neutral']:
+                # Play appropriate music when the (smoothed, hysteresis-stable) emotion changes
+                if emotion != current_emotion and emotion in ['happy', 'sad', 'neutral']:
                     music_player.play_for_emotion(emotion)
-                
-                last_emotion_check = current_time
+                current_emotion = emotion
+                current_emotion_confidence = confidence
+            
+            # Check for phone use the same way
+            if 'phone' in planned:
+                with frame_scheduler.measure('phone'):
+                    phone_result = phone_detector.process_frame(frame, context)
+                if phone_result is not None:
+                    phone_detected = phone_result['is_detected']
             
             # Update statistics once per second
             if current_time - last_stats_update >= 1.0:
@@ -434,16 +495,26 @@ def monitoring_loop():
                     location=f"Emotion: {current_emotion}, Heart Rate: {heart_rate} BPM"
                 )
             
-            # Update the output frame
+            # Publish the frame to the video streams by reference
             with frame_lock:
-                output_frame = frame.copy()
+                previous = output_frame
+                output_frame, output_analysis = captured, analysis
+            if previous is not None:
+                previous.release()
             
+            frame_scheduler.end(captured)
             frame_count += 1
-            time.sleep(0.01)  # Small delay to control frame rate
             
     except Exception as e:
         logger.error(f"Error in monitoring loop: {e}")
     finally:
+        with frame_lock:
+            if output_frame is not None:
+                output_frame.release()
+            output_frame = output_analysis = None
+        if grabber is not None:
+            grabber.stop()
+            logger.info(f"{grabber.dropped} of {grabber.grabbed} frames dropped to keep up with the source")
         if camera:
             camera.release()
         heart_rate_monitor.stop()
@@ -495,10 +566,13 @@ def get_status():
         'is_monitoring': is_monitoring,
         'is_drowsy': is_drowsy,
         'current_ear': current_ear,
+        'phone_detected': phone_detected,
         'heart_rate': heart_rate,
         'current_emotion': current_emotion,
         'emotion_confidence': current_emotion_confidence,
-        'monitoring_mode': monitoring_mode
+        'emotion_stats': emotion_recognizer.stats(),
+        'monitoring_mode': monitoring_mode,
+        'scheduler': frame_scheduler.stats() if frame_scheduler is not None else None
     })
 
 @app.context_processor
@@ -740,7 +814,7 @@ def kill_process_on_port(port):
 
 def cleanup():
     """Cleanup function to properly close resources"""
-    global is_monitoring, camera, output_frame
+    global is_monitoring, camera, output_frame, output_analysis
     
     logger.info("Cleaning up resources...")
     
@@ -753,7 +827,10 @@ def cleanup():
         camera = None
     
     # Clear output frame
-    output_frame = None
+    with frame_lock:
+        if output_frame is not None:
+            output_frame.release()
+        output_frame = output_analysis = None
     
     # Stop other components
     heart_rate_monitor.stop()
@@ -5,12 +5,24 @@ Uses Eye Aspect Ratio (EAR) to detect drowsiness
 
 import cv2
 import dlib
+import math
 import numpy as np
-from scipy.spatial import distance as dist
-from imutils import face_utils
 import time
 import threading
 import config
+import face_geometry
+import overlay
+from metric_history import MetricHistory
+from ear_calibration import EarCalibrator
+from head_pose import NeutralPose
+from event_detection import EventDetector, FacialEvent
+from capture import TimestampedCapture
+from scheduler import FrameGrabber, RealtimeScheduler
+from face_detectors import create_face_detector
+from face_tracking import FaceTracker
+from frame_context import FrameContext
+from landmark_models import create_landmark_model
+from model_registry import registry
 from database import db
 import os
 import logging
@@ -22,115 +34,615 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class DrowsinessDetector:
-    """Class for detecting drowsiness using eye aspect ratio"""
+class FaceAnalysis:
+    """Measurements and drowsiness decision for one occupant's face in a frame"""
+    
+    def __init__(self, track_id: int, face: dlib.rectangle):
+        """Initialize an empty analysis for a tracked face"""
+        self.track_id = track_id
+        self.face = face  # dlib.rectangle of the analysed face
+        self.shape = None  # Landmarks as a (68, 2) array
+        self.ear = 0.0
+        self.mar = 0.0
+        self.head_pose = None  # (pitch, yaw, roll) in degrees
+        self.events = []  # Blink/yawn events completed on this frame
+        self.is_drowsy = False
+        self.fatigue_detected = False  # Multi-indicator check (closure, yawn, head pose, blink rate)
+    
+    @property
+    def face_detected(self) -> bool:
+        """Whether the face was found in the frame"""
+        return self.face is not None
+
+class FrameAnalysis:
+    """Results of analysing a single frame, computed once and shared by all consumers
+    
+    Every occupant gets a FaceAnalysis in faces, largest face first. The
+    single-face attributes (face, ear, is_drowsy, ...) refer to the primary
+    occupant, the largest face, which is normally the driver.
+    """
+    
+    def __init__(self, frame: np.ndarray):
+        """Initialize an empty analysis for the given frame"""
+        self.frame = frame
+        self.gray = None
+        self.faces = []  # FaceAnalysis per occupant, largest face first
+    
+    @property
+    def primary(self) -> Optional[FaceAnalysis]:
+        """Analysis of the largest face, or None"""
+        return self.faces[0] if self.faces else None
+    
+    @property
+    def face_detected(self) -> bool:
+        """Whether a face was found in the frame"""
+        return bool(self.faces)
+    
+    @property
+    def face(self) -> Optional[dlib.rectangle]:
+        """Primary occupant's face rectangle"""
+        return self.primary.face if self.faces else None
+    
+    @property
+    def shape(self) -> Optional[np.ndarray]:
+        """Primary occupant's landmark array"""
+        return self.primary.shape if self.faces else None
+    
+    @property
+    def ear(self) -> float:
+        """Primary occupant's EAR"""
+        return self.primary.ear if self.faces else 0.0
+    
+    @property
+    def mar(self) -> float:
+        """Primary occupant's MAR"""
+        return self.primary.mar if self.faces else 0.0
+    
+    @property
+    def head_pose(self) -> Optional[Tuple[float, float, float]]:
+        """Primary occupant's head pose"""
+        return self.primary.head_pose if self.faces else None
+    
+    @property
+    def events(self) -> list:
+        """Primary occupant's completed events"""
+        return self.primary.events if self.faces else []
+    
+    @property
+    def is_drowsy(self) -> bool:
+        """Primary occupant's drowsiness decision"""
+        return self.primary.is_drowsy if self.faces else False
+    
+    @property
+    def fatigue_detected(self) -> bool:
+        """Primary occupant's fatigue decision"""
+        return self.primary.fatigue_detected if self.faces else False
+
+class DriverState:
+    """Temporal drowsiness state of one driver: metric history, timers and blink/yawn events"""
     
     def __init__(self):
-        """Initialize drowsiness detection system"""
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor('shape_predictor_68_face_landmarks.dat')
-        self.EAR_THRESHOLD = 0.25  # Increased threshold to be less sensitive
-        self.EAR_FRAMES = 30  # Number of consecutive frames to check
-        self.ear_history = []
-        self.last_blink_time = time.time()
+        """Initialize an empty state from config.DROWSINESS_PARAMS"""
+        params = config.DROWSINESS_PARAMS
+        # The configured threshold applies until the driver's own threshold is calibrated
+        self.EAR_THRESHOLD = params['EAR_THRESHOLD']
+        self.calibrator = EarCalibrator(duration=params['EAR_CALIBRATION_SECONDS'],
+                                        min_samples=params['EAR_CALIBRATION_MIN_SAMPLES'],
+                                        ratio=params['EAR_CALIBRATION_RATIO'],
+                                        low_quantile=params['EAR_CALIBRATION_QUANTILE'],
+                                        min_threshold=params['EAR_THRESHOLD_MIN'],
+                                        max_threshold=params['EAR_THRESHOLD_MAX'])
+        self.user_id = None  # Set when the state belongs to a known driver
+        # Rolling EAR/MAR window used for PERCLOS and the API statistics
+        window = params['PERCLOS_WINDOW_SECONDS']
+        self.history = MetricHistory(int(math.ceil(window * params['HISTORY_MAX_FPS'])),
+                                     params['HISTORY_MAX_SAMPLE_SECONDS'], window)
+        self.perclos_threshold = params['PERCLOS_THRESHOLD']
+        self.perclos_min_seconds = params['PERCLOS_MIN_SECONDS']
+        self.last_blink_time = None
         self.blink_cooldown = 1.0  # Minimum time between blinks (seconds)
         self.drowsy_start_time = None
         self.DROWSY_THRESHOLD = 2.0  # Seconds of continuous low EAR to trigger drowsiness
+        # Blink/yawn events and the multi-indicator fatigue check
+        self.YAWN_THRESHOLD = params['MAR_THRESHOLD']
+        self.EYES_CLOSED_SECONDS = params['EYES_CLOSED_SECONDS']
+        self.eyes_closed_since = None  # Capture time of the first frame of the current eye closure
+        self.blink_rate_threshold = params['BLINK_RATE_THRESHOLD']
+        self.head_pose_limit = params['HEAD_POSE_LIMIT']
+        self.neutral_pose = NeutralPose(duration=params['HEAD_POSE_CALIBRATION_SECONDS'],
+                                        min_samples=params['HEAD_POSE_CALIBRATION_MIN_SAMPLES'])
+        self.events = EventDetector(self.EAR_THRESHOLD, self.YAWN_THRESHOLD,
+                                    min_blink_duration=params['BLINK_MIN_DURATION'],
+                                    max_blink_duration=params['BLINK_MAX_DURATION'],
+                                    min_yawn_duration=params['YAWN_MIN_DURATION'],
+                                    rate_window=params['BLINK_RATE_WINDOW'])
+    
+    def update(self, analysis: FaceAnalysis, timestamp: float) -> FaceAnalysis:
+        """
+        Advance the state with a measured face and fill in its decisions
+        
+        Args:
+            analysis: FaceAnalysis with the face's measurements, or None
+            timestamp: Time of the frame in seconds
+            
+        Returns:
+            FaceAnalysis: The same analysis with is_drowsy, events and fatigue_detected set
+        """
+        if analysis is None or not analysis.face_detected:
+            return analysis
+        
+        if self.calibrator.update(analysis.ear, timestamp) is not None:
+            self._finish_calibration()
+        if analysis.head_pose is not None:
+            self.neutral_pose.update(analysis.head_pose, timestamp)
+        
+        analysis.is_drowsy = self._update_drowsy_state(analysis.ear, analysis.mar, timestamp)
+        analysis.events = self.events.update(analysis.ear, analysis.mar, timestamp)
+        analysis.fatigue_detected = self._check_drowsiness(analysis.ear, analysis.events, analysis.head_pose,
+                                                           timestamp)
+        return analysis
+
+    def set_ear_threshold(self, threshold: float):
+        """Switch the eye-closure threshold of the timers, PERCLOS and event detection"""
+        self.EAR_THRESHOLD = threshold
+        self.events.ear_threshold = threshold
+
+    def load_calibration(self, user_id: int):
+        """
+        Attach the state to a driver and apply their stored threshold, if any,
+        so a warm restart skips the calibration phase
+        
+        Args:
+            user_id: The driver's user_id in the users table
+        """
+        self.user_id = user_id
+        stored = db.get_ear_calibration(user_id)
+        if stored is not None and not self.calibrator.calibrated:
+            self.calibrator.threshold = stored['ear_threshold']
+            self.set_ear_threshold(stored['ear_threshold'])
+            logger.info(f"Loaded EAR threshold {stored['ear_threshold']:.3f} for user {user_id}")
+        elif self.calibrator.calibrated:
+            self._finish_calibration()
+
+    def _finish_calibration(self):
+        """Apply the calibrated threshold and persist it for a known driver"""
+        baseline = self.calibrator.baseline()
+        self.set_ear_threshold(self.calibrator.threshold)
+        logger.info(f"Calibrated EAR threshold {self.calibrator.threshold:.3f} "
+                    f"(open-eye median {baseline['ear_median']:.3f})")
+        if self.user_id is not None:
+            db.save_ear_calibration(self.user_id, baseline['ear_median'], self.calibrator.threshold)
+
+    def _update_drowsy_state(self, ear: float, mar: float, current_time: float) -> bool:
+        """
+        Update the metric history and drowsiness timer with a new sample
+        
+        Args:
+            ear: The average eye aspect ratio of the current frame
+            mar: The mouth aspect ratio of the current frame
+            current_time: Timestamp of the sample in seconds
+            
+        Returns:
+            bool: Whether the driver is considered drowsy
+        """
+        # The blink cooldown starts with the first sample
+        if self.last_blink_time is None:
+            self.last_blink_time = current_time
+        
+        # Update metric history
+        self.history.append(ear, mar, current_time, ear < self.EAR_THRESHOLD)
+        
+        # Check for drowsiness
+        
+        # If EAR is below threshold
+        if ear < self.EAR_THRESHOLD:
+            # Check if enough time has passed since last blink
+            if current_time - self.last_blink_time > self.blink_cooldown:
+                if self.drowsy_start_time is None:
+                    self.drowsy_start_time = current_time
+                
+                # Check if drowsy for long enough
+                if current_time - self.drowsy_start_time >= self.DROWSY_THRESHOLD:
+                    is_drowsy = True
+                else:
+                    is_drowsy = False
+            else:
+                is_drowsy = False
+                self.drowsy_start_time = None
+        else:
+            is_drowsy = False
+            self.drowsy_start_time = None
+            self.last_blink_time = current_time
+        
+        # Eyes closed for a large fraction of the recent window
+        if (self.history.window_seconds >= self.perclos_min_seconds
+                and self.history.perclos >= self.perclos_threshold):
+            is_drowsy = True
+        
+        return is_drowsy
+
+    def _check_drowsiness(self, ear: float, events: list, head_pose: Optional[Tuple[float, float, float]],
+                          current_time: float) -> bool:
+        """
+        Check for fatigue using multiple indicators
+        
+        Args:
+            ear: The average eye aspect ratio of the current frame
+            events: Blink/yawn events completed on the current frame
+            head_pose: (pitch, yaw, roll) in degrees, if estimated on this frame
+            current_time: Capture time of the frame in seconds
+            
+        Returns:
+            bool: Whether any fatigue indicator fired
+        """
+        # Check eye closure, timed by the capture timestamps so dropped frames do not delay it
+        if ear < self.EAR_THRESHOLD:
+            if self.eyes_closed_since is None:
+                self.eyes_closed_since = current_time
+            if current_time - self.eyes_closed_since >= self.EYES_CLOSED_SECONDS:
+                return True
+        else:
+            self.eyes_closed_since = None
+        
+        # Check yawning and long eye closures
+        if any(event.kind in (FacialEvent.YAWN, FacialEvent.LONG_CLOSURE) for event in events):
+            return True
+        
+        # Check head movement away from the driver's neutral pose, once it is known
+        deviation = self.neutral_pose.deviation(head_pose) if head_pose is not None else None
+        if deviation is not None:
+            limit = self.head_pose_limit
+            if any(abs(angle) > limit for angle in deviation):
+                return True
+        
+        # Check blink rate
+        if self.events.blink_rate > self.blink_rate_threshold:
+            return True
+        
+        return False
+
+class DrowsinessDetector:
+    """Class for detecting drowsiness using eye aspect ratio"""
+    
+    def __init__(self, user_id: Optional[int] = None):
+        """
+        Initialize drowsiness detection system
+        
+        Args:
+            user_id: users table id of the driver, whose EAR calibration is loaded
+                and stored with the primary occupant's state. None (the default)
+                calibrates in memory only.
+        """
+        self.user_id = user_id
+        self.driver_track_id = None
+        self.min_driver_track_id = 1  # Tracks created before the driver's track was lost cannot become the driver
+        self.last_analysis = None  # FrameAnalysis of the last analysed frame, see frame_context
+        self.detector = create_face_detector(config.DROWSINESS_PARAMS['FACE_DETECTOR'])
+        # Only the landmarks of the enabled metrics are requested from the landmark model
+        self.landmark_model = create_landmark_model(config.DROWSINESS_PARAMS['LANDMARK_MODEL'])
+        self.metrics = []
+        for metric in config.DROWSINESS_PARAMS['LANDMARK_METRICS']:
+            if self.landmark_model.covers(face_geometry.METRIC_POINTS[metric]):
+                self.metrics.append(metric)
+            else:
+                logger.warning(f"Landmark model '{self.landmark_model.name}' lacks the points for '{metric}', disabled")
+        if not self.metrics:
+            raise ValueError(f"Landmark model '{self.landmark_model.name}' supports none of the configured metrics")
+        self.landmark_points = face_geometry.required_points(self.metrics)
+        # The face outline, when the model regresses it, gives tracking a steadier
+        # landmark box to check for drift and to place the next face box around
+        if self.landmark_model.covers(face_geometry.FACE_OUTLINE_POINTS):
+            self.landmark_points = np.union1d(self.landmark_points, face_geometry.FACE_OUTLINE_POINTS)
+        # Face tracking: the detector only runs every few frames, in between the
+        # face boxes are derived from the previous frame's landmarks. Every
+        # occupant's track holds its own timers, metric history and events.
+        params = config.DROWSINESS_PARAMS
+        self.redetect_interval = params['REDETECT_INTERVAL']
+        self.max_tracking_drift = params['MAX_TRACKING_DRIFT']
+        self.tracker = FaceTracker(DriverState, max_faces=params['MAX_FACES'],
+                                   iou_threshold=params['TRACK_IOU_THRESHOLD'],
+                                   max_centroid_shift=params['TRACK_MAX_CENTROID_SHIFT'],
+                                   max_missed=params['TRACK_MAX_MISSED'])
+        self.frames_since_detection = 0
+        self.last_detection_seconds = None  # Cost of the face detector on the latest frame, None if it did not run
+        # Detection runs on a downscaled copy of the frame, the rectangle is mapped
+        # back so the shape predictor still sees the full resolution image
+        self.detection_scale = config.DROWSINESS_PARAMS['DETECTION_SCALE']
+        self.detection_min_width = config.DROWSINESS_PARAMS['DETECTION_MIN_WIDTH']
+        self.detection_upsample = config.DROWSINESS_PARAMS['DETECTION_UPSAMPLE']
         logger.info("DrowsinessDetector initialized")
-        # Initialize pygame mixer for sound playback
-        pygame.mixer.init()
+        # The pygame mixer is initialized on the first alert so headless runs
+        # without an audio device can still analyse frames
+        self.alert_thread = None
         self.alert_sound = os.path.join(os.path.dirname(__file__), 'static', 'alert.wav')
 
+    @property
+    def predictor(self):
+        """Shared dlib 68-point shape predictor, loaded on first use (used by get_landmarks)"""
+        return registry.get('shape_predictor')
+
     def calculate_ear(self, eye):
-        """Calculate the eye aspect ratio"""
-        # Vertical distances
-        v1 = np.linalg.norm(eye[1] - eye[5])
-        v2 = np.linalg.norm(eye[2] - eye[4])
+        """Calculate the eye aspect ratio of a single 6-point eye"""
+        return float(face_geometry.aspect_ratio(
+            eye, face_geometry.EYE_VERTICAL_PAIRS, face_geometry.EYE_HORIZONTAL_PAIR))
+
+    def _detect_faces(self, gray: np.ndarray) -> list:
+        """
+        Run the face detector on a downscaled copy of the grayscale frame
+        
+        Args:
+            gray: Full resolution grayscale image
+            
+        Returns:
+            list: Detected face rectangles in full resolution coordinates
+        """
+        height, width = gray.shape[:2]
+        scale = max(self.detection_scale, min(1.0, self.detection_min_width / float(width)))
         
-        # Horizontal distance
-        h = np.linalg.norm(eye[0] - eye[3])
+        if scale >= 1.0:
+            return self.detector.detect(gray, self.detection_upsample)
         
-        # Calculate EAR
-        ear = (v1 + v2) / (2.0 * h)
-        return ear
+        small = cv2.resize(gray, (int(width * scale), int(height * scale)),
+                           interpolation=cv2.INTER_AREA)
+        faces = self.detector.detect(small, self.detection_upsample)
+        
+        # Map the rectangles back to full resolution
+        return [dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                               int(face.right() / scale), int(face.bottom() / scale))
+                for face in faces]
 
-    def detect_drowsiness(self, frame):
-        """Detect drowsiness in the given frame"""
-        try:
-            # Convert frame to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def _redetection_scheduled(self) -> bool:
+        """Whether the next frame completes redetect_interval frames since the
+        last detection, counting the detection frame itself"""
+        return self.frames_since_detection >= self.redetect_interval - 1
+
+    @property
+    def detection_due(self) -> bool:
+        """Whether the next frame would run the face detector: no tracked face,
+        a lost track, or a scheduled re-detection"""
+        tracks = self.tracker.active_tracks
+        return (not tracks or self._redetection_scheduled()
+                or any(track.tracked_face is None for track in tracks))
+
+    def _locate_faces(self, gray: np.ndarray, redetect: bool = True, frame_index: Optional[int] = None) -> list:
+        """
+        Get the face rectangles for this frame, running the face detector only
+        when there is no tracked face, a track was lost, or the tracked faces
+        are due for re-detection
+        
+        Args:
+            gray: Grayscale image
+            redetect: Whether a scheduled re-detection may run, tracking
+                continues past the re-detection interval when False
+            frame_index: Position of the frame in its video. Re-detection is then
+                scheduled on every redetect_interval-th index instead of counted
+                from the last detection, so it does not depend on where analysis started.
             
-            # Detect faces
-            faces = self.detector(gray, 0)
+        Returns:
+            list: (FaceTrack, dlib.rectangle) per occupant, largest face first
+        """
+        self.last_detection_seconds = None
+        tracks = self.tracker.active_tracks
+        if frame_index is not None:
+            due = self.redetect_interval <= 0 or frame_index % self.redetect_interval == 0
+        else:
+            due = self._redetection_scheduled()
+        if (tracks and (not due or not redetect)
+                and all(track.tracked_face is not None for track in tracks)):
+            self.frames_since_detection += 1
+            for track in tracks:
+                track.face = track.tracked_face
+            tracks.sort(key=lambda track: track.face.width() * track.face.height(), reverse=True)
+            return [(track, track.face) for track in tracks]
+        
+        return self._redetect_faces(gray)
+
+    def _redetect_faces(self, gray: np.ndarray) -> list:
+        """
+        Run the face detector and match its faces to the existing occupants
+        
+        Args:
+            gray: Grayscale image
             
-            if len(faces) == 0:
-                return frame, False, 0.0
-            
-            # Get the first face
-            face = faces[0]
-            
-            # Get facial landmarks
-            shape = self.predictor(gray, face)
-            shape = face_utils.shape_to_np(shape)
-            
-            # Get eye landmarks
-            left_eye = shape[36:42]
-            right_eye = shape[42:48]
-            
-            # Calculate EAR for both eyes
-            left_ear = self.calculate_ear(left_eye)
-            right_ear = self.calculate_ear(right_eye)
-            
-            # Average EAR
-            ear = (left_ear + right_ear) / 2.0
-            
-            # Update EAR history
-            self.ear_history.append(ear)
-            if len(self.ear_history) > self.EAR_FRAMES:
-                self.ear_history.pop(0)
-            
-            # Check for drowsiness
-            current_time = time.time()
-            
-            # If EAR is below threshold
-            if ear < self.EAR_THRESHOLD:
-                # Check if enough time has passed since last blink
-                if current_time - self.last_blink_time > self.blink_cooldown:
-                    if self.drowsy_start_time is None:
-                        self.drowsy_start_time = current_time
-                    
-                    # Check if drowsy for long enough
-                    if current_time - self.drowsy_start_time >= self.DROWSY_THRESHOLD:
-                        is_drowsy = True
-                    else:
-                        is_drowsy = False
-                else:
-                    is_drowsy = False
-                    self.drowsy_start_time = None
+        Returns:
+            list: (FaceTrack, dlib.rectangle) per occupant, largest face first
+        """
+        self.frames_since_detection = 0
+        start = time.perf_counter()
+        faces = self._detect_faces(gray)
+        self.last_detection_seconds = time.perf_counter() - start
+        tracks = self.tracker.associate(faces)
+        return [(track, track.face) for track in tracks]
+
+    def _landmark_faces(self, gray: np.ndarray, located: list) -> list:
+        """
+        Regress the landmarks of located faces and advance their tracking
+        
+        Args:
+            gray: Grayscale image
+            located: (FaceTrack, dlib.rectangle) per occupant, from _locate_faces
+            
+        Returns:
+            list: (FaceTrack, dlib.rectangle, landmarks) of the faces whose
+                landmarks are valid, faces where tracking was lost or the
+                landmark model failed are left out
+        """
+        points = self.landmark_points
+        landmarked = []
+        for track, face in located:
+            shape = self.landmark_model.predict(gray, face, points)
+            if shape is None:
+                # No landmarks to follow, the face is detected again
+                track.lose_tracking()
+                continue
+            if track.update_landmarks(shape[points], gray.shape, self.max_tracking_drift):
+                landmarked.append((track, face, shape))
+        return landmarked
+
+    def analyze_frame(self, frame: np.ndarray, timestamp: Optional[float] = None,
+                      redetect: bool = True) -> FrameAnalysis:
+        """
+        Run the full per-frame pipeline once: grayscale conversion, face
+        detection/tracking, landmarks, EAR, MAR, head pose and the drowsiness state
+        
+        Args:
+            frame: The BGR video frame to analyse
+            timestamp: Capture time of the frame in seconds, which drives all
+                drowsiness timing. Defaults to now, which makes the results
+                depend on the processing speed.
+            redetect: Whether a scheduled face re-detection may run on this frame
+            
+        Returns:
+            FrameAnalysis: The analysis results
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        analysis = self.measure_frame(frame, timestamp, redetect)
+        self.last_analysis = self.update_state(analysis, timestamp)
+        return self.last_analysis
+
+    def frame_context(self, frame: np.ndarray) -> FrameContext:
+        """
+        Regions of interest around the driver for the other detectors, taken
+        from the analysis of the frame so the face is only located once
+        
+        Args:
+            frame: The frame last passed to analyze_frame or process_frame
+            
+        Returns:
+            FrameContext: The driver's regions, without a face when the frame was not analysed
+        """
+        analysis = self.last_analysis
+        if analysis is None or analysis.frame is not frame:
+            return FrameContext(frame)
+        return FrameContext.from_analysis(analysis, self.driver_track_id)
+
+    def measure_frame(self, frame: np.ndarray, timestamp: Optional[float] = None,
+                      redetect: bool = True, frame_index: Optional[int] = None) -> FrameAnalysis:
+        """
+        Measure a frame without touching the temporal drowsiness state: faces,
+        landmarks, EAR, MAR and head pose of every occupant. Landmarks and
+        EAR/MAR are smoothed by the filters of each occupant's track.
+        
+        Args:
+            frame: The BGR video frame to analyse
+            timestamp: Time of the frame in seconds for the smoothing filters, defaults to now
+            redetect: Whether a scheduled face re-detection may run, see _locate_faces
+            frame_index: Index of the frame among the analysed frames of a video,
+                schedules re-detection by position, see _locate_faces
+            
+        Returns:
+            FrameAnalysis: The measurements, with no drowsiness decision
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        analysis = FrameAnalysis(frame)
+        
+        # Convert frame to grayscale
+        analysis.gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        # Detect or track the faces, and landmark every face on the same
+        # grayscale image. Tracking follows the raw landmarks so a lost face is
+        # noticed without filter lag, the metrics use the smoothed ones.
+        located = self._locate_faces(analysis.gray, redetect, frame_index)
+        landmarked = self._landmark_faces(analysis.gray, located)
+        if len(landmarked) < len(located) and self.last_detection_seconds is None:
+            # A tracked face drifted off its landmarks: detect the faces on this
+            # frame instead of reporting the lost landmarks
+            located = self._redetect_faces(analysis.gray)
+            landmarked = self._landmark_faces(analysis.gray, located)
+        if not landmarked:
+            return analysis
+        
+        points = self.landmark_points
+        smoothed = np.zeros((len(landmarked), 68, 2))
+        for i, (track, face, shape) in enumerate(landmarked):
+            face_analysis = FaceAnalysis(track.track_id, face)
+            if track.landmark_filter is not None:
+                smoothed[i, points] = track.landmark_filter.filter(
+                    shape[points], timestamp, scale=max(face.width(), face.height()))
+                shape = np.rint(smoothed[i]).astype(np.int32)
             else:
-                is_drowsy = False
-                self.drowsy_start_time = None
-                self.last_blink_time = current_time
+                smoothed[i] = shape
+            face_analysis.shape = shape
+            analysis.faces.append(face_analysis)
+        
+        # EAR/MAR of all faces in one vectorized call
+        ears = face_geometry.eye_aspect_ratio(smoothed) if 'ear' in self.metrics else np.zeros(len(smoothed))
+        mars = face_geometry.mouth_aspect_ratio(smoothed) if 'mar' in self.metrics else np.zeros(len(smoothed))
+        
+        for i, ((track, _, _), face_analysis) in enumerate(zip(landmarked, analysis.faces)):
+            ear, mar = ears[i], mars[i]
+            if track.metric_filter is not None:
+                ear, mar = track.metric_filter.filter((ear, mar), timestamp)
+            face_analysis.ear = float(ear)
+            face_analysis.mar = float(mar)
+            if 'head_pose' in self.metrics:
+                face_analysis.head_pose = self._estimate_head_pose(
+                    smoothed[i], analysis.gray.shape, track.head_pose_estimator)
+        return analysis
+
+    def update_state(self, analysis: FrameAnalysis, timestamp: float) -> FrameAnalysis:
+        """
+        Advance every occupant's drowsiness state with a measured frame
+        
+        Args:
+            analysis: FrameAnalysis from measure_frame
+            timestamp: Time of the frame in seconds
             
-            # Draw face rectangle and landmarks
-            (x, y, w, h) = face_utils.rect_to_bb(face)
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        Returns:
+            FrameAnalysis: The same analysis with the per-face decisions set
+        """
+        # The driver is the primary occupant when their track starts, and keeps
+        # the calibration until that track is dropped. After that only a face
+        # that appears later can take over, occupants already in view (with
+        # calibration samples of their own) never write the driver's baseline.
+        if self.driver_track_id is not None and self.driver_track_id not in self.tracker.tracks:
+            self.driver_track_id = None
+            self.min_driver_track_id = self.tracker.next_track_id
+        primary = analysis.primary
+        if (self.user_id is not None and primary is not None and self.driver_track_id is None
+                and primary.track_id >= self.min_driver_track_id):
+            track = self.tracker.tracks.get(primary.track_id)
+            if track is not None:
+                self.driver_track_id = track.track_id
+                track.state.load_calibration(self.user_id)
+        
+        for face_analysis in analysis.faces:
+            track = self.tracker.tracks.get(face_analysis.track_id)
+            if track is not None:
+                track.state.update(face_analysis, timestamp)
+        return analysis
+
+    @property
+    def state(self) -> Optional[DriverState]:
+        """Drowsiness state of the primary occupant (largest face), or None"""
+        tracks = self.tracker.active_tracks
+        if not tracks:
+            return None
+        return max(tracks, key=lambda track: track.face.width() * track.face.height()).state
+
+    def detect_drowsiness(self, frame, draw=True, timestamp=None, redetect=True):
+        """
+        Detect drowsiness in the given frame
+        
+        Args:
+            frame: The video frame to process
+            draw: Whether to draw the overlay on the frame. Headless callers
+                should pass False (or use analyze_frame) to skip annotation.
+            timestamp: Capture time of the frame in seconds, defaults to now
+            redetect: Whether a scheduled face re-detection may run on this frame
             
-            # Draw eye landmarks
-            for (x, y) in left_eye:
-                cv2.circle(frame, (x, y), 1, (0, 0, 255), -1)
-            for (x, y) in right_eye:
-                cv2.circle(frame, (x, y), 1, (0, 0, 255), -1)
+        Returns:
+            tuple: (frame, is_drowsy, ear)
+        """
+        try:
+            analysis = self.analyze_frame(frame, timestamp, redetect)
             
-            # Add EAR value and status text
-            cv2.putText(frame, f"EAR: {ear:.2f}", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            status = "Drowsy" if is_drowsy else "Alert"
-            color = (0, 0, 255) if is_drowsy else (0, 255, 0)
-            cv2.putText(frame, f"Status: {status}", (10, 60),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            if draw:
+                overlay.draw_drowsiness(frame, analysis)
             
-            return frame, is_drowsy, ear
+            return frame, analysis.is_drowsy, analysis.ear
             
         except Exception as e:
             logger.error(f"Error in drowsiness detection: {str(e)}")
@@ -139,8 +651,7 @@ class DrowsinessDetector:
     def cleanup(self):
         """Clean up resources"""
         try:
-            if hasattr(self, 'predictor'):
-                del self.predictor
+            # The shape predictor is shared through the model registry and stays loaded
             if hasattr(self, 'detector'):
                 del self.detector
             logger.info("DrowsinessDetector cleaned up")
@@ -157,15 +668,8 @@ class DrowsinessDetector:
         Returns:
             float: The MAR value
         """
-        # Calculate vertical distances
-        v1 = dist.euclidean(mouth_points[2], mouth_points[10])
-        v2 = dist.euclidean(mouth_points[4], mouth_points[8])
-        v3 = dist.euclidean(mouth_points[0], mouth_points[6])
-        
-        # Calculate MAR
-        mar = (v1 + v2) / (2.0 * v3)
-        
-        return mar
+        return float(face_geometry.aspect_ratio(
+            mouth_points, face_geometry.MOUTH_VERTICAL_PAIRS, face_geometry.MOUTH_HORIZONTAL_PAIR))
     
     def get_landmarks(self, frame, face):
         """
@@ -193,12 +697,7 @@ class DrowsinessDetector:
     
     def get_eye_landmarks(self, landmarks, start, end):
         """Get eye landmarks as numpy array"""
-        points = []
-        for n in range(start, end):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            points.append([x, y])
-        return np.array(points, dtype=np.int32)
+        return face_geometry.shape_to_array(landmarks)[start:end]
 
     def _get_face_location(self, gray: np.ndarray) -> Optional[dlib.rectangle]:
         """
@@ -212,7 +711,7 @@ class DrowsinessDetector:
         """
         try:
             # Detect faces with improved parameters
-            faces = self.detector(gray, 1)  # 1 means upscale the image once
+            faces = self._detect_faces(gray)
             
             if len(faces) == 0:
                 return None
@@ -242,203 +741,30 @@ class DrowsinessDetector:
     def _calculate_ear(self, landmarks: dlib.full_object_detection) -> float:
         """Calculate Eye Aspect Ratio with improved accuracy"""
         try:
-            # Left eye points (36-41)
-            left_eye = np.array([(landmarks.part(36 + i).x, landmarks.part(36 + i).y) for i in range(6)])
-            # Right eye points (42-47)
-            right_eye = np.array([(landmarks.part(42 + i).x, landmarks.part(42 + i).y) for i in range(6)])
-            
-            # Calculate EAR for both eyes
-            left_ear = self._calculate_ear_for_eye(left_eye)
-            right_ear = self._calculate_ear_for_eye(right_eye)
-            
-            # Return average EAR
-            return (left_ear + right_ear) / 2.0
+            return float(face_geometry.eye_aspect_ratio(face_geometry.shape_to_array(landmarks)))
         except Exception as e:
             logger.error(f"Error calculating EAR: {e}")
             return 0.0
 
     def _calculate_ear_for_eye(self, eye_points: np.ndarray) -> float:
         """Calculate EAR for a single eye with improved accuracy"""
-        # Calculate vertical distances
-        v1 = dist.euclidean(eye_points[1], eye_points[5])
-        v2 = dist.euclidean(eye_points[2], eye_points[4])
-        
-        # Calculate horizontal distance
-        h = dist.euclidean(eye_points[0], eye_points[3])
-        
-        # Calculate EAR with improved formula
-        ear = (v1 + v2) / (2.0 * h)
-        return ear
+        return self.calculate_ear(eye_points)
 
     def _calculate_mar(self, landmarks: dlib.full_object_detection) -> float:
         """Calculate Mouth Aspect Ratio for yawn detection"""
         try:
-            # Mouth points (48-68)
-            mouth_points = np.array([(landmarks.part(48 + i).x, landmarks.part(48 + i).y) for i in range(20)])
-            
-            # Calculate vertical distances
-            v1 = dist.euclidean(mouth_points[2], mouth_points[10])
-            v2 = dist.euclidean(mouth_points[4], mouth_points[8])
-            
-            # Calculate horizontal distance
-            h = dist.euclidean(mouth_points[0], mouth_points[6])
-            
-            # Calculate MAR
-            mar = (v1 + v2) / (2.0 * h)
-            return mar
+            return float(face_geometry.mouth_aspect_ratio(face_geometry.shape_to_array(landmarks)))
         except Exception as e:
             logger.error(f"Error calculating MAR: {e}")
             return 0.0
 
-    def _estimate_head_pose(self, landmarks: dlib.full_object_detection) -> Optional[Tuple[float, float, float]]:
-        """Estimate head pose using facial landmarks"""
-        current_time = time.time()
-        if current_time - self.last_head_pose_time < self.head_pose_cooldown:
-            return None
-        
-        # Get 3D model points
-        model_points = np.array([
-            (0.0, 0.0, 0.0),             # Nose tip
-            (0.0, -330.0, -65.0),        # Chin
-            (-225.0, 170.0, -135.0),     # Left eye left corner
-            (225.0, 170.0, -135.0),      # Right eye right corner
-            (-150.0, -150.0, -125.0),    # Left mouth corner
-            (150.0, -150.0, -125.0)      # Right mouth corner
-        ])
-        
-        # Get 2D image points
-        image_points = np.array([
-            (landmarks.part(30).x, landmarks.part(30).y),     # Nose tip
-            (landmarks.part(8).x, landmarks.part(8).y),       # Chin
-            (landmarks.part(36).x, landmarks.part(36).y),     # Left eye left corner
-            (landmarks.part(45).x, landmarks.part(45).y),     # Right eye right corner
-            (landmarks.part(48).x, landmarks.part(48).y),     # Left mouth corner
-            (landmarks.part(54).x, landmarks.part(54).y)      # Right mouth corner
-        ], dtype="double")
-        
-        # Camera parameters
-        size = (640, 480)
-        focal_length = size[1]
-        center = (size[1]/2, size[0]/2)
-        camera_matrix = np.array(
-            [[focal_length, 0, center[0]],
-             [0, focal_length, center[1]],
-             [0, 0, 1]], dtype="double"
-        )
-        
-        # Distortion coefficients
-        dist_coeffs = np.zeros((4,1))
-        
-        # Solve PnP
-        (success, rotation_vector, translation_vector) = cv2.solvePnP(
-            model_points, image_points, camera_matrix, dist_coeffs
-        )
-        
-        if success:
-            # Convert rotation vector to angles
-            rotation_matrix, _ = cv2.Rodrigues(rotation_vector)
-            pose_matrix = np.hstack((rotation_matrix, translation_vector))
-            _, _, _, _, _, _, euler_angles = cv2.decomposeProjectionMatrix(
-                np.hstack((pose_matrix, np.array([[0], [0], [0], [1]])))
-            )
-            
-            self.last_head_pose_time = current_time
-            return tuple(euler_angles.flatten())
-        
-        return None
-
-    def _check_drowsiness(self, ear: float, mar: float, head_pose: Optional[Tuple[float, float, float]]) -> bool:
-        """Check for drowsiness using multiple indicators"""
-        current_time = time.time()
-        
-        # Check eye closure
-        if ear < self.EAR_THRESHOLD:
-            self.FRAME_COUNTER += 1
-            if self.FRAME_COUNTER >= self.CONSECUTIVE_FRAMES:
-                return True
-        else:
-            self.FRAME_COUNTER = 0
-        
-        # Check yawning
-        if mar > self.YAWN_THRESHOLD:
-            if current_time - self.last_yawn_time >= self.yawn_cooldown:
-                self.last_yawn_time = current_time
-                return True
-        
-        # Check head pose if available
-        if head_pose is not None:
-            pitch, yaw, roll = head_pose
-            if abs(pitch) > 20 or abs(yaw) > 20 or abs(roll) > 20:
-                return True
-        
-        # Check blink rate
-        if current_time - self.last_blink_time >= 1.0:
-            if self.blink_counter > self.blink_rate_threshold:
-                return True
-            self.blink_counter = 0
-            self.last_blink_time = current_time
-        
-        return False
+    def _estimate_head_pose(self, shape: np.ndarray, frame_shape: Tuple[int, ...],
+                            estimator) -> Optional[Tuple[float, float, float]]:
+        """Estimate head pose (pitch, yaw, roll) in degrees using facial landmarks and a track's estimator"""
+        image_points = face_geometry.head_pose_image_points(shape)
+        return estimator.estimate(image_points, frame_shape)
 
-    def _draw_visual_feedback(self, frame: np.ndarray, landmarks: dlib.full_object_detection,
-                            ear: float, mar: float, head_pose: Optional[Tuple[float, float, float]],
-                            is_drowsy: bool) -> None:
-        """Draw visual feedback on the frame with improved visibility"""
-        # Draw face rectangle
-        face_rect = landmarks.rect
-        cv2.rectangle(frame, 
-                     (face_rect.left(), face_rect.top()),
-                     (face_rect.right(), face_rect.bottom()),
-                     (0, 255, 0), 2)
-        
-        # Draw facial landmarks with improved visibility
-        for n in range(68):
-            x = landmarks.part(n).x
-            y = landmarks.part(n).y
-            # Draw larger dots for better visibility
-            cv2.circle(frame, (x, y), 3, (0, 255, 0), -1)
-            # Add white border for better contrast
-            cv2.circle(frame, (x, y), 4, (255, 255, 255), 1)
-        
-        # Draw metrics with improved visibility
-        metrics = [
-            (f"EAR: {ear:.2f}", 30),
-            (f"MAR: {mar:.2f}", 60),
-            (f"Status: {'DROWSY!' if is_drowsy else 'ALERT'}", 90)
-        ]
-        
-        for text, y_pos in metrics:
-            # Add black background for better readability
-            (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-            cv2.rectangle(frame, (10, y_pos - 25), (10 + text_width, y_pos + 5), (0, 0, 0), -1)
-            # Draw text
-            color = (0, 0, 255) if is_drowsy and "Status" in text else (0, 255, 0)
-            cv2.putText(frame, text, (10, y_pos),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        
-        # Draw head pose if available
-        if head_pose is not None:
-            pitch, yaw, roll = head_pose
-            pose_text = [
-                (f"Pitch: {pitch:.1f}", 120),
-                (f"Yaw: {yaw:.1f}", 150),
-                (f"Roll: {roll:.1f}", 180)
-            ]
-            
-            for text, y_pos in pose_text:
-                # Add black background
-                (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-                cv2.rectangle(frame, (10, y_pos - 25), (10 + text_width, y_pos + 5), (0, 0, 0), -1)
-                # Draw text
-                cv2.putText(frame, text, (10, y_pos),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-    def _draw_no_face_warning(self, frame: np.ndarray) -> None:
-        """Draw a warning when no face is detected"""
-        # Draw a warning message
-        cv2.putText(frame, "No face detected", (30, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-
-    def process_frame(self, frame):
+    def process_frame(self, frame, timestamp=None):
         """
         Process a frame for the API server
         
@@ -447,57 +773,37 @@ class DrowsinessDetector:
         
         Args:
             frame: The video frame to process
+            timestamp: Capture time of the frame in seconds, defaults to now
             
         Returns:
             dict: Detection results in a format suitable for the API
         """
         try:
-            # Process the frame using the existing method
-            processed_frame, is_drowsy, ear = self.detect_drowsiness(frame)
+            # Detection, landmarks and all metrics are computed in a single pass
+            analysis = self.analyze_frame(frame, timestamp)
+            occupants = [self._occupant_result(face) for face in analysis.faces]
             
-            # Get estimated head pose if available
-            head_pose = {"x": 0, "y": 0, "z": 0}
-            
-            # If we have landmarks calculation, try to get more metrics
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.detector(gray, 0)
-            
-            face_detected = len(faces) > 0
-            mar = 0.0  # Default MAR value
-            
-            if face_detected:
-                face = faces[0]
-                landmarks = self.predictor(gray, face)
-                
-                # Get MAR (Mouth Aspect Ratio) for yawn detection
-                if hasattr(self, 'calculate_mar'):
-                    mouth_points = []
-                    for n in range(48, 68):  # Mouth landmarks
-                        x = landmarks.part(n).x
-                        y = landmarks.part(n).y
-                        mouth_points.append((x, y))
-                    mar = self.calculate_mar(mouth_points)
-                
-                # Try to get head pose if the method exists
-                if hasattr(self, '_estimate_head_pose'):
-                    head_pose_result = self._estimate_head_pose(landmarks)
-                    if head_pose_result:
-                        head_pose = {
-                            "x": head_pose_result[0],
-                            "y": head_pose_result[1],
-                            "z": head_pose_result[2]
-                        }
-            
-            # Return results in the expected format
-            return {
-                "ear": ear,
-                "is_drowsy": is_drowsy,
-                "face_detected": face_detected,
-                "mar": mar,
-                "head_pose": head_pose,
-                "blink_count": getattr(self, 'blink_count', 0),
-                "yawn_count": getattr(self, 'yawn_count', 0)
-            }
+            # The top-level fields describe the primary occupant (the driver)
+            if occupants:
+                result = dict(occupants[0])
+            else:
+                result = {
+                    "ear": 0.0,
+                    "mar": 0.0,
+                    "is_drowsy": False,
+                    "fatigue_detected": False,
+                    "head_pose": {"x": 0, "y": 0, "z": 0},
+                    "events": []
+                }
+                state = self.state
+                if state is not None:
+                    result.update(state.events.stats())
+                    result["rolling_stats"] = state.history.stats()
+            
+            result["face_detected"] = analysis.face_detected
+            result["face_count"] = len(occupants)
+            result["occupants"] = occupants
+            return result
         except Exception as e:
             logger.error(f"Error in process_frame: {str(e)}")
             # Return default values on error
@@ -508,9 +814,44 @@ class DrowsinessDetector:
                 "mar": 0.0,
                 "head_pose": {"x": 0, "y": 0, "z": 0},
                 "blink_count": 0,
-                "yawn_count": 0
+                "yawn_count": 0,
+                "face_count": 0,
+                "occupants": []
             }
 
+    def _occupant_result(self, face: FaceAnalysis) -> dict:
+        """
+        Build the API result of one occupant
+        
+        Args:
+            face: FaceAnalysis of the occupant on the current frame
+            
+        Returns:
+            dict: Per-occupant measurements, decisions and counters
+        """
+        head_pose = {"x": 0, "y": 0, "z": 0}
+        if face.head_pose:
+            head_pose = {"x": face.head_pose[0], "y": face.head_pose[1], "z": face.head_pose[2]}
+        
+        result = {
+            "track_id": face.track_id,
+            "box": [face.face.left(), face.face.top(), face.face.width(), face.face.height()],
+            "ear": face.ear,
+            "mar": face.mar,
+            "is_drowsy": face.is_drowsy,
+            "fatigue_detected": face.fatigue_detected,
+            "head_pose": head_pose,
+            "events": [event.to_dict() for event in face.events]
+        }
+        
+        track = self.tracker.tracks.get(face.track_id)
+        if track is not None:
+            result.update(track.state.events.stats())
+            result["rolling_stats"] = track.state.history.stats()
+            result["ear_threshold"] = track.state.EAR_THRESHOLD
+            result["calibrated"] = track.state.calibrator.calibrated
+        return result
+
     def trigger_alert(self):
         """Trigger drowsiness alert"""
         # Log alert to database
@@ -543,28 +884,67 @@ class DrowsinessDetector:
             video_source: The video source (0 for webcam)
         """
         self.is_running = True
-        cap = cv2.VideoCapture(video_source)
+        cap = TimestampedCapture(video_source)
+        # The grabber keeps only the newest frame, so a slow analysis drops
+        # frames instead of falling behind the camera
+        grabber = FrameGrabber(cap)
+        grabber.start()
+        scheduler = RealtimeScheduler(config.SCHEDULER_PARAMS['TARGET_LATENCY'],
+                                      config.SCHEDULER_PARAMS['COST_SMOOTHING'])
+        scheduler.add_stage('drowsiness', required=True)
+        scheduler.add_stage('detection', max_interval=config.SCHEDULER_PARAMS['DETECTION_MAX_INTERVAL'],
+                            due=lambda: self.detection_due)
+        display = None  # Reused buffer the overlay is drawn on, bus frames are read-only
         
         while self.is_running:
-            ret, frame = cap.read()
-            
-            if not ret:
-                break
-            
-            # Detect drowsiness
-            frame, drowsy, ear = self.detect_drowsiness(frame)
+            captured = grabber.next()
+            if captured is None:
+                if grabber.finished:
+                    break
+                continue
+            
+            with captured:
+                # Detect drowsiness, timed by the capture timestamp. Scheduled
+                # re-detection is deferred while the frame is over its latency budget.
+                planned = scheduler.begin(captured)
+                start = time.perf_counter()
+                analysis = self.analyze_frame(captured.image, captured.timestamp,
+                                              redetect='detection' in planned)
+                self.record_stages(scheduler, time.perf_counter() - start)
+                scheduler.end(captured)
+                
+                if display is None or display.shape != captured.image.shape:
+                    display = np.empty_like(captured.image)
+                np.copyto(display, captured.image)
             
             # Display the frame
-            cv2.imshow("Drowsiness Detection", frame)
+            cv2.imshow("Drowsiness Detection", overlay.draw_drowsiness(display, analysis))
             
             # Break loop on 'q' key press
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
         
         # Clean up
+        grabber.stop()
+        logger.info(f"Scheduler: {scheduler.stats()}, {grabber.dropped} of {grabber.grabbed} frames dropped")
         cap.release()
         cv2.destroyAllWindows()
     
+    def record_stages(self, scheduler, seconds: float):
+        """
+        Report the cost of an analysed frame to a RealtimeScheduler, split into
+        the face detector (when it ran) and the rest of the drowsiness pipeline
+        
+        Args:
+            scheduler: Scheduler with 'drowsiness' and 'detection' stages
+            seconds: Run time of the frame's drowsiness analysis
+        """
+        detection = self.last_detection_seconds
+        if detection is not None:
+            scheduler.record('detection', detection)
+            seconds -= detection
+        scheduler.record('drowsiness', seconds)
+
     def stop(self):
         """Stop drowsiness detection"""
         self.is_running = False
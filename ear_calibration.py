@@ -0,0 +1,161 @@
+"""
+EAR Calibration Module for the Drowsiness Detection System
+Learns a driver's open-eye EAR distribution over the first minutes of a
+session with constant-memory streaming quantiles and derives a per-driver
+eye-closure threshold from it
+"""
+
+import math
+from typing import Optional
+
+class StreamingQuantile:
+    """P-square estimate of a single quantile in O(1) memory (Jain & Chlamtac, 1985)"""
+
+    def __init__(self, quantile: float):
+        """
+        Initialize the estimator
+
+        Args:
+            quantile: Quantile to track, between 0 and 1
+        """
+        self.quantile = quantile
+        self.count = 0
+        self._heights = []  # Marker heights, the first 5 samples until initialized
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self._increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def update(self, value: float):
+        """Add a sample"""
+        self.count += 1
+
+        if self.count <= 5:
+            self._heights.append(value)
+            self._heights.sort()
+            return
+
+        heights = self._heights
+        positions = self._positions
+
+        # Find the cell the sample falls into, extending the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            offset = self._desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1)
+                    or (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        """Piecewise-parabolic marker height prediction"""
+        h, n = self._heights, self._positions
+        return h[i] + step / float(n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / float(n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / float(n[i] - n[i - 1]))
+
+    def _linear(self, i: int, step: int) -> float:
+        """Linear marker height prediction, used when the parabola overshoots"""
+        h, n = self._heights, self._positions
+        return h[i] + step * (h[i + step] - h[i]) / float(n[i + step] - n[i])
+
+    @property
+    def value(self) -> float:
+        """Current estimate, NaN before the first sample"""
+        if self.count == 0:
+            return math.nan
+        if self.count <= 5:
+            index = min(len(self._heights) - 1, int(round(self.quantile * (len(self._heights) - 1))))
+            return self._heights[index]
+        return self._heights[2]
+
+class EarCalibrator:
+    """Online calibration of a driver's eye-closure EAR threshold"""
+
+    def __init__(self, duration: float = 120.0, min_samples: int = 300, ratio: float = 0.75,
+                 low_quantile: float = 0.1, min_threshold: float = 0.15, max_threshold: float = 0.3):
+        """
+        Initialize the calibrator
+
+        Args:
+            duration: Seconds of samples to learn from
+            min_samples: Samples required before the calibration can finish
+            ratio: Threshold as a fraction of the open-eye median EAR
+            low_quantile: The threshold never exceeds this quantile of the open-eye EAR
+            min_threshold: Lower bound of the calibrated threshold
+            max_threshold: Upper bound of the calibrated threshold
+        """
+        self.duration = duration
+        self.min_samples = min_samples
+        self.ratio = ratio
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.median = StreamingQuantile(0.5)
+        self.low = StreamingQuantile(low_quantile)
+        self.start_time = None
+        self.threshold = None  # Set once calibrated
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether the calibration has finished"""
+        return self.threshold is not None
+
+    def update(self, ear: float, timestamp: float) -> Optional[float]:
+        """
+        Feed one EAR sample of a detected face
+
+        Args:
+            ear: Eye aspect ratio
+            timestamp: Time of the sample in seconds
+
+        Returns:
+            Optional[float]: The calibrated threshold on the sample that completes the calibration, else None
+        """
+        if self.calibrated:
+            return None
+
+        if self.start_time is None:
+            self.start_time = timestamp
+        self.median.update(ear)
+        self.low.update(ear)
+
+        if timestamp - self.start_time < self.duration or self.median.count < self.min_samples:
+            return None
+
+        # Blinks are rare enough that the median and low quantile describe open eyes
+        threshold = min(self.ratio * self.median.value, self.low.value)
+        self.threshold = min(self.max_threshold, max(self.min_threshold, threshold))
+        return self.threshold
+
+    def baseline(self) -> dict:
+        """
+        Learned open-eye statistics
+
+        Returns:
+            dict: Open-eye median and low quantile EAR, sample count and threshold
+        """
+        return {
+            "ear_median": self.median.value,
+            "ear_low": self.low.value,
+            "samples": self.median.count,
+            "ear_threshold": self.threshold
+        }
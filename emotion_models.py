@@ -0,0 +1,151 @@
+"""
+Emotion Model Backends for the Drowsiness Detection System
+Runs the 48x48 grayscale emotion CNN on batches of faces. All faces of a
+frame, or of several queued frames, go through a single call, which returns
+the 7-class softmax of every face in the model's class order. Besides the
+Keras model, the exports written by export_emotion_model.py run without
+importing TensorFlow.
+"""
+
+import logging
+
+import numpy as np
+
+import config
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+FACE_SIZE = 48  # Width and height of the model input
+CLASSES = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprised', 'neutral']  # Model output order
+
+class EmotionModel:
+    """Base class for emotion model backends"""
+
+    name = 'base'
+
+    def __init__(self, max_batch: int = 16):
+        """
+        Initialize the backend
+
+        Args:
+            max_batch: Largest number of faces per inference call
+        """
+        self.max_batch = max_batch
+
+    def predict(self, faces: np.ndarray) -> np.ndarray:
+        """
+        Classify a batch of faces
+
+        Args:
+            faces: (N, 48, 48) uint8 grayscale faces
+
+        Returns:
+            np.ndarray: (N, 7) float32 class probabilities
+        """
+        if len(faces) == 0:
+            return np.zeros((0, len(CLASSES)), dtype=np.float32)
+        inputs = (np.asarray(faces, dtype=np.float32) / 255.0)[..., np.newaxis]
+        return np.concatenate([self._infer(inputs[start:start + self.max_batch])
+                               for start in range(0, len(inputs), self.max_batch)])
+
+    def _infer(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Run the model on one batch
+
+        Args:
+            inputs: (N, 48, 48, 1) float32 faces scaled to 0..1, N <= max_batch
+
+        Returns:
+            np.ndarray: (N, 7) class probabilities
+        """
+        raise NotImplementedError
+
+class KerasEmotionModel(EmotionModel):
+    """The Keras model called directly through a tf.function, without Model.predict"""
+
+    name = 'keras'
+
+    def __init__(self, max_batch: int = 16):
+        """Initialize the backend, TensorFlow is only loaded by the first inference"""
+        super().__init__(max_batch)
+        self._function = None
+
+    def _compile(self):
+        """Trace the forward pass once for any batch size"""
+        import tensorflow as tf
+
+        model = registry.get('emotion_model')
+
+        @tf.function(input_signature=[tf.TensorSpec([None, FACE_SIZE, FACE_SIZE, 1], tf.float32)])
+        def forward(inputs):
+            return model(inputs, training=False)
+
+        return forward
+
+    def _infer(self, inputs: np.ndarray) -> np.ndarray:
+        """Run the compiled forward pass"""
+        if self._function is None:
+            self._function = self._compile()
+        return self._function(inputs).numpy()
+
+class TfliteEmotionModel(EmotionModel):
+    """The TFLite export run by tflite-runtime"""
+
+    name = 'tflite'
+
+    def _infer(self, inputs: np.ndarray) -> np.ndarray:
+        """Run the interpreter, resizing its input to the batch size when it changes"""
+        interpreter = registry.get('emotion_tflite')
+        input_details = interpreter.get_input_details()[0]
+        if tuple(input_details['shape']) != inputs.shape:
+            interpreter.resize_tensor_input(input_details['index'], inputs.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_details['index'], inputs)
+        interpreter.invoke()
+        return interpreter.get_tensor(interpreter.get_output_details()[0]['index']).copy()
+
+class OnnxEmotionModel(EmotionModel):
+    """The ONNX export run by ONNX Runtime"""
+
+    name = 'onnx'
+
+    def _infer(self, inputs: np.ndarray) -> np.ndarray:
+        """Run the session, the export has a dynamic batch dimension"""
+        session = registry.get('emotion_onnx')
+        return session.run(None, {session.get_inputs()[0].name: inputs})[0]
+
+class OpenCvEmotionModel(EmotionModel):
+    """The ONNX export run by the OpenCV DNN module, no dependency beyond OpenCV"""
+
+    name = 'opencv'
+
+    def _infer(self, inputs: np.ndarray) -> np.ndarray:
+        """Run the network on the NHWC batch as exported"""
+        net = registry.get('emotion_dnn')
+        net.setInput(inputs)
+        return net.forward()
+
+EMOTION_MODELS = {
+    KerasEmotionModel.name: KerasEmotionModel,
+    TfliteEmotionModel.name: TfliteEmotionModel,
+    OnnxEmotionModel.name: OnnxEmotionModel,
+    OpenCvEmotionModel.name: OpenCvEmotionModel
+}
+
+def create_emotion_model(name: str = None) -> EmotionModel:
+    """
+    Create an emotion model backend
+
+    Args:
+        name: Backend name ('keras', 'tflite', 'onnx' or 'opencv'), defaults to config.EMOTION_PARAMS['BACKEND']
+
+    Returns:
+        EmotionModel: The emotion model backend
+    """
+    name = name or config.EMOTION_PARAMS['BACKEND']
+    if name not in EMOTION_MODELS:
+        raise ValueError(f"Unknown emotion model '{name}', expected one of {sorted(EMOTION_MODELS)}")
+
+    logger.info(f"Using '{name}' emotion model")
+    return EMOTION_MODELS[name](config.EMOTION_PARAMS['MAX_BATCH'])
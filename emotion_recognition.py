@@ -5,14 +5,17 @@ Uses a CNN model to detect emotions from facial expressions
 
 import cv2
 import numpy as np
-import tensorflow as tf
 import threading
 import queue
 import logging
-import os
 import time
+from typing import Optional
 import config
 from database import db
+from emotion_models import CLASSES, FACE_SIZE, create_emotion_model
+from emotion_sampling import create_emotion_sampler
+from frame_context import FrameContext
+from smoothing import create_emotion_filter
 import requests
 
 # Configure logging
@@ -25,38 +28,25 @@ class EmotionRecognizer:
     
     def __init__(self):
         """Initialize emotion recognition system"""
-        self.model = None
-        self.emotions = ['happy', 'sad', 'angry']  # Focus on three emotions
+        self.emotions = list(CLASSES)  # All seven classes of the model, in its output order
         self.current_emotion = 'neutral'
         self.confidence = 0.0
+        self.emotion_filter = create_emotion_filter(self.emotions)
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.frame_queue = queue.Queue(maxsize=1)  # Reduced queue size
+        self.emotion_model = create_emotion_model()
+        self.frame_queue = queue.Queue(maxsize=config.EMOTION_PARAMS['QUEUE_SIZE'])
         self.result_queue = queue.Queue(maxsize=1)  # Reduced queue size
+        self.frames_submitted = 0
+        self.result_lock = threading.Lock()
+        self.result_seq = None  # Sequence number of the frame the current emotion comes from
+        self.result_time = None  # time.monotonic() when the current emotion was computed
         self.is_running = False
         self.processing_thread = None
-        self.last_emotion_time = time.time()
-        self.emotion_cooldown = 0.5  # Minimum time between emotion updates
-        self._load_emotion_model()
+        self.sampler = create_emotion_sampler()  # Decides which submitted frames reach the model
+        self.inferences = 0  # Faces classified by the model
         self._start_processing_thread()
         logger.info("EmotionRecognizer initialized")
 
-    def _load_emotion_model(self):
-        """Load the pre-trained emotion recognition model"""
-        try:
-            model_path = 'models/emotion_model.h5'
-            if not os.path.exists(model_path):
-                logger.info("Downloading emotion recognition model...")
-                # Download model from URL
-                import urllib.request
-                url = "https://github.com/atulapra/Emotion-detection/raw/master/model.h5"
-                urllib.request.urlretrieve(url, model_path)
-            
-            self.model = tf.keras.models.load_model(model_path)
-            logger.info("Emotion recognition model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading emotion model: {str(e)}")
-            raise
-    
     def _start_processing_thread(self):
         """Start the emotion processing thread"""
         self.is_running = True
@@ -69,70 +59,112 @@ class EmotionRecognizer:
         while self.is_running:
             try:
                 # Get frame from queue with timeout
-                frame = self.frame_queue.get(timeout=0.1)  # Reduced timeout
-                
-                # Detect faces
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+                items = [self.frame_queue.get(timeout=0.1)]  # Reduced timeout
+            except queue.Empty:
+                continue
+            
+            try:
+                # Frames queued in the meantime share the same inference call
+                while True:
+                    try:
+                        items.append(self.frame_queue.get_nowait())
+                    except queue.Empty:
+                        break
                 
-                # Process each face
-                for (x, y, w, h) in faces:
-                    face = gray[y:y+h, x:x+w]
-                    face = cv2.resize(face, (48, 48))
-                    face = face.astype('float32') / 255.0
-                    face = np.expand_dims(face, axis=[0, -1])
+                # Collect every face with the frame it belongs to
+                faces = []
+                owners = []  # (item index, face box) per face, no box for faces cropped by the caller
+                for index, (frame, face, _, _) in enumerate(items):
+                    if face is not None:
+                        # Driver face cropped by the caller, no detection needed
+                        faces.append(face)
+                        owners.append((index, None))
+                        continue
                     
-                    # Predict emotion
-                    predictions = self.model.predict(face, verbose=0)  # Disable verbose output
-                    emotion_idx = np.argmax(predictions[0])
-                    confidence = predictions[0][emotion_idx]
-                    
-                    # Map the model's output to our three emotions
-                    if emotion_idx == 3:  # Happy
-                        mapped_idx = 0
-                    elif emotion_idx == 4:  # Sad
-                        mapped_idx = 1
-                    elif emotion_idx == 0:  # Angry
-                        mapped_idx = 2
-                    else:
-                        continue  # Skip other emotions
-                    
-                    # Update current emotion and confidence
-                    self.current_emotion = self.emotions[mapped_idx]
-                    self.confidence = float(confidence)
+                    # Detect faces
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    for (x, y, w, h) in self.face_cascade.detectMultiScale(gray, 1.1, 4):
+                        faces.append(cv2.resize(gray[y:y+h, x:x+w], (FACE_SIZE, FACE_SIZE)))
+                        owners.append((index, (x, y, w, h)))
+                
+                # One batched inference for all faces
+                predictions = self.emotion_model.predict(np.stack(faces)) if faces else []
+                self.inferences += len(faces)
+                
+                # The emotion follows one face per frame: the caller's crop, or the largest detected face
+                driver_faces = {}  # Item index -> (face area, prediction)
+                for (index, box), prediction in zip(owners, predictions):
+                    area = box[2] * box[3] if box is not None else float('inf')
+                    if index not in driver_faces or area > driver_faces[index][0]:
+                        driver_faces[index] = (area, prediction)
+                    if box is None:
+                        continue
                     
                     # Draw rectangle and label
+                    x, y, w, h = box
+                    frame = items[index][0]
+                    label = f"{self.emotions[int(np.argmax(prediction))]} ({prediction.max():.2f})"
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-                    label = f"{self.current_emotion} ({confidence:.2f})"
                     cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
                 
-                # Put processed frame in result queue
+                # Update the emotion in frame order, readers of the result see a consistent emotion and sequence
+                with self.result_lock:
+                    for index in sorted(driver_faces):
+                        _, _, seq, timestamp = items[index]
+                        self._apply_prediction(driver_faces[index][1], timestamp)
+                        self.result_seq = seq
+                        self.result_time = time.monotonic()
+                
+                # Put the latest processed frame in result queue
                 if not self.result_queue.full():
-                    self.result_queue.put(frame)
+                    self.result_queue.put(items[-1][0])
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 logger.error(f"Error processing frame: {str(e)}")
                 continue
+
+    def _apply_prediction(self, prediction: np.ndarray, timestamp: float):
+        """
+        Update the current emotion from the model output of the driver's face.
+        The probabilities are averaged over time and the current emotion only
+        changes once another one leads it by EMOTION_PARAMS['SWITCH_MARGIN'].
+        
+        Args:
+            prediction: Class probabilities of the face
+            timestamp: Capture time of the frame in seconds
+        """
+        self.current_emotion = self.emotion_filter.update(prediction, timestamp)
+        self.confidence = self.emotion_filter.confidence
     
-    def detect_emotion(self, frame):
-        """Detect emotion in the given frame"""
-        try:
-            current_time = time.time()
-            
-            # Check if enough time has passed since last emotion update
-            if current_time - self.last_emotion_time < self.emotion_cooldown:
-                return self.current_emotion, self.confidence, frame
+    @property
+    def probabilities(self) -> dict:
+        """Averaged probability of every emotion, empty before the first result"""
+        if self.emotion_filter.probabilities is None:
+            return {}
+        return {emotion: float(p) for emotion, p in zip(self.emotions, self.emotion_filter.probabilities)}
+    
+    def detect_emotion(self, frame, context: Optional[FrameContext] = None, timestamp: Optional[float] = None):
+        """
+        Detect emotion in the given frame
+        
+        Args:
+            frame: BGR frame. Faces found by the Haar cascade are annotated on
+                it, so it must be writable when no context is given.
+            context: FrameContext of the frame. The driver's face crop is
+                classified directly and the Haar cascade is skipped.
+            timestamp: Capture time of the frame in seconds, defaults to now
             
-            # Put frame in processing queue if not full
-            if not self.frame_queue.full():
-                self.frame_queue.put(frame)
+        Returns:
+            tuple: (emotion, averaged confidence, frame annotated if it was processed)
+        """
+        try:
+            self._submit(frame, context, timestamp=timestamp)
             
             # Get processed frame from result queue
             try:
                 processed_frame = self.result_queue.get_nowait()
-                self.last_emotion_time = current_time
+                if processed_frame is None:
+                    processed_frame = frame
                 return self.current_emotion, self.confidence, processed_frame
             except queue.Empty:
                 return self.current_emotion, self.confidence, frame
@@ -141,6 +173,108 @@ class EmotionRecognizer:
             logger.error(f"Error in emotion detection: {str(e)}")
             return self.current_emotion, self.confidence, frame
     
+    def process_frame(self, frame, context: Optional[FrameContext] = None, seq: Optional[int] = None,
+                      timestamp: Optional[float] = None):
+        """
+        Submit a frame to the worker and return the latest result without waiting for it
+        
+        Args:
+            frame: BGR frame, copied for the worker when no context is given
+            context: FrameContext of the frame, only the driver's face crop is then classified
+            seq: Sequence number of the frame, e.g. FrameRef.seq, numbered by the recognizer if None
+            timestamp: Capture time of the frame in seconds, defaults to now
+            
+        Returns:
+            Optional[dict]: The current emotion, its averaged confidence and the averaged
+                probabilities of all emotions, with the sequence number of the frame it was
+                computed from and its age in seconds. None until the first result.
+        """
+        if frame is None:
+            return None
+        
+        try:
+            self._submit(frame.copy() if context is None else frame, context, seq, timestamp)
+            
+            with self.result_lock:
+                if self.result_seq is None:
+                    return None
+                return {
+                    "emotion": self.current_emotion,
+                    "confidence": self.confidence,
+                    "probabilities": self.probabilities,
+                    "seq": self.result_seq,
+                    "age": time.monotonic() - self.result_time
+                }
+        except Exception as e:
+            logger.error(f"Error in emotion detection: {str(e)}")
+            return None
+    
+    def _submit(self, frame, context: Optional[FrameContext] = None, seq: Optional[int] = None,
+                timestamp: Optional[float] = None) -> bool:
+        """
+        Queue a frame for the worker without blocking, replacing the oldest
+        queued frame when full. Frames the sampler leaves out are dropped.
+        
+        Args:
+            frame: BGR frame, annotated by the worker when no context is given
+            context: FrameContext of the frame
+            seq: Sequence number of the frame, numbered by the recognizer if None
+            timestamp: Capture time of the frame in seconds, defaults to now
+            
+        Returns:
+            bool: Whether the frame was queued
+        """
+        self.frames_submitted += 1
+        if seq is None:
+            seq = self.frames_submitted
+        if timestamp is None:
+            timestamp = time.time()
+        
+        face = None
+        if context is not None:
+            face = context.face_crop()
+            if face is None:
+                return False
+        
+        # Skip the model while the face looks the same and the emotion is settled
+        if self.sampler is not None:
+            if context is not None:
+                image = context.gray if context.gray is not None else context.frame
+                box = context.face_box()
+            else:
+                image, box = frame, None
+            if not self.sampler.should_sample(image, timestamp, self.confidence, box):
+                return False
+        
+        if face is not None:
+            # Only the model input leaves this thread, the crop is a view of a shared frame
+            item = (None, cv2.resize(face, (FACE_SIZE, FACE_SIZE)), seq, timestamp)
+        else:
+            item = (frame, None, seq, timestamp)
+        
+        while True:
+            try:
+                self.frame_queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    self.frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def stats(self) -> dict:
+        """
+        Inference statistics
+        
+        Returns:
+            dict: Submitted frames, faces classified by the model and the sampler statistics
+        """
+        return {
+            "submitted": self.frames_submitted,
+            "inferences": self.inferences,
+            "sampling": self.sampler.stats() if self.sampler is not None else None
+        }
+    
     def cleanup(self):
         """Cleanup resources"""
         self.is_running = False
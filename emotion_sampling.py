@@ -0,0 +1,155 @@
+"""
+Emotion Sampling Module for the Drowsiness Detection System
+Decides when the emotion CNN runs. Emotions change slowly, so while the
+driver's face looks the same as at the last inference, the interval between
+inferences grows, and jumps to the longest interval once the smoothed
+emotion is confident. Every change of the face shrinks the interval again,
+down to the shortest one while the face keeps changing. Changes are
+measured as the difference of tiny downsampled thumbnails of the region the
+face had at the last inference, so jitter of the face box itself does not
+count as a change.
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+
+class EmotionSampler:
+    """Adaptive sampling schedule of the emotion model for one face"""
+
+    def __init__(self, min_interval: float = 0.2, max_interval: float = 10.0,
+                 change_threshold: float = 0.05, confidence_threshold: float = 0.6,
+                 backoff: float = 2.0, thumbnail_size: int = 8):
+        """
+        Initialize the sampler
+
+        Args:
+            min_interval: Shortest time between inferences in seconds, used while the face changes
+            max_interval: Longest time between inferences in seconds, used while the face is
+                unchanged and the emotion confident
+            change_threshold: Mean absolute thumbnail difference (fraction of the pixel range)
+                from the last inference at which the face counts as changed
+            confidence_threshold: Smoothed confidence above which the emotion counts as settled
+            backoff: Factor the interval grows by after every inference on an unchanged face,
+                and shrinks by after every inference on a changed face
+            thumbnail_size: Width and height of the thumbnails compared
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.confidence_threshold = confidence_threshold
+        self.backoff = backoff
+        self.thumbnail_size = thumbnail_size
+        self.samples = 0  # Inferences granted
+        self.skipped = 0  # Frames left out
+        self.reset()
+
+    def reset(self):
+        """Forget the last inference, the next frame is sampled"""
+        self.reference = None  # Thumbnail of the face at the last inference
+        self.reference_box = None  # Face box at the last inference
+        self.reference_shape = None  # Frame size at the last inference
+        self.last_sample = None  # Capture time of the last inference
+        self.interval = self.min_interval
+        self.change = 0.0  # Thumbnail difference of the last frame checked
+
+    def thumbnail(self, image: np.ndarray, box: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+        """
+        Downsample a region of an image to the comparison thumbnail
+
+        Args:
+            image: Frame, grayscale preferably
+            box: (left, top, right, bottom) region, the whole image if None
+
+        Returns:
+            np.ndarray: float32 thumbnail
+        """
+        if box is not None:
+            left, top, right, bottom = box
+            image = image[top:bottom, left:right]
+        size = (self.thumbnail_size, self.thumbnail_size)
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def should_sample(self, image: np.ndarray, timestamp: float, confidence: float = 0.0,
+                      box: Optional[Tuple[int, int, int, int]] = None) -> bool:
+        """
+        Decide whether to run the emotion model on a frame, and record the
+        frame as the new reference when it is sampled
+
+        Args:
+            image: The frame, grayscale preferably
+            timestamp: Capture time of the frame in seconds
+            confidence: Current smoothed confidence of the emotion
+            box: (left, top, right, bottom) face box in the frame, the whole frame is compared if None
+
+        Returns:
+            bool: Whether the model should run on this frame
+        """
+        if (self.reference is None or (box is None) != (self.reference_box is None)
+                or image.shape[:2] != self.reference_shape or timestamp < self.last_sample):
+            self.interval = self.min_interval
+            return self._sample(image, box, timestamp)
+
+        elapsed = timestamp - self.last_sample
+        if elapsed < self.min_interval:
+            self.skipped += 1
+            return False
+
+        # The current frame is compared in the region of the reference face
+        thumbnail = self.thumbnail(image, self.reference_box)
+        self.change = float(np.abs(thumbnail - self.reference).mean()) / 255.0
+        if self.change >= self.change_threshold:
+            # Speed up while the face keeps changing, a single change only halves the interval
+            self.interval = max(self.min_interval, self.interval / self.backoff)
+            return self._sample(image, box, timestamp)
+
+        if elapsed >= self.interval:
+            # Unchanged face: back off, straight to the longest interval once the emotion is settled
+            if confidence >= self.confidence_threshold:
+                self.interval = self.max_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+            return self._sample(image, box, timestamp)
+
+        self.skipped += 1
+        return False
+
+    def _sample(self, image: np.ndarray, box: Optional[Tuple[int, int, int, int]], timestamp: float) -> bool:
+        """Record a granted inference and its face as the new reference"""
+        self.reference = self.thumbnail(image, box)
+        self.reference_box = box
+        self.reference_shape = image.shape[:2]
+        self.last_sample = timestamp
+        self.samples += 1
+        return True
+
+    def stats(self) -> dict:
+        """
+        Sampling statistics
+
+        Returns:
+            dict: Granted and skipped frames, current interval and last thumbnail difference
+        """
+        return {
+            "samples": self.samples,
+            "skipped": self.skipped,
+            "interval": self.interval,
+            "change": self.change
+        }
+
+def create_emotion_sampler() -> Optional[EmotionSampler]:
+    """
+    Create the emotion sampler of a recognizer
+
+    Returns:
+        EmotionSampler: Sampler configured from config.EMOTION_PARAMS, or None when adaptive sampling is disabled
+    """
+    params = config.EMOTION_PARAMS
+    if not params['ADAPTIVE_SAMPLING']:
+        return None
+    return EmotionSampler(params['SAMPLE_MIN_INTERVAL'], params['SAMPLE_MAX_INTERVAL'],
+                          params['SAMPLE_CHANGE_THRESHOLD'], params['SAMPLE_CONFIDENCE'],
+                          params['SAMPLE_BACKOFF'])
@@ -0,0 +1,157 @@
+"""
+Event Detection Module for the Drowsiness Detection System
+Streaming state machine that turns per-frame EAR/MAR samples into blink,
+long eye closure and yawn events
+"""
+
+from collections import deque
+
+class FacialEvent:
+    """A completed blink, long eye closure or yawn"""
+
+    BLINK = 'blink'
+    LONG_CLOSURE = 'long_closure'
+    YAWN = 'yawn'
+
+    def __init__(self, kind: str, start_time: float, end_time: float):
+        """
+        Initialize the event
+
+        Args:
+            kind: One of BLINK, LONG_CLOSURE or YAWN
+            start_time: Timestamp of the first sample of the event
+            end_time: Timestamp of the first sample after the event
+        """
+        self.kind = kind
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @property
+    def duration(self) -> float:
+        """Event duration in seconds"""
+        return self.end_time - self.start_time
+
+    def to_dict(self) -> dict:
+        """Event as a JSON-serialisable dict"""
+        return {
+            "type": self.kind,
+            "start_time": self.start_time,
+            "duration": self.duration
+        }
+
+    def __repr__(self):
+        return f"FacialEvent({self.kind!r}, start={self.start_time:.3f}, duration={self.duration:.3f})"
+
+class EventDetector:
+    """Constant-time-per-sample blink and yawn detector with counters"""
+
+    def __init__(self, ear_threshold: float, mar_threshold: float,
+                 min_blink_duration: float = 0.05, max_blink_duration: float = 0.5,
+                 min_yawn_duration: float = 1.0, hysteresis: float = 0.02,
+                 rate_window: float = 60.0):
+        """
+        Initialize the detector
+
+        Args:
+            ear_threshold: EAR below which the eyes count as closed
+            mar_threshold: MAR above which the mouth counts as open for a yawn
+            min_blink_duration: Shorter closures are treated as landmark noise
+            max_blink_duration: Longer closures are reported as long closures
+            min_yawn_duration: Minimum mouth opening time for a yawn
+            hysteresis: Margin the EAR/MAR must cross back over to end an event
+            rate_window: Window in seconds for the blink rate
+        """
+        self.ear_threshold = ear_threshold
+        self.mar_threshold = mar_threshold
+        self.min_blink_duration = min_blink_duration
+        self.max_blink_duration = max_blink_duration
+        self.min_yawn_duration = min_yawn_duration
+        self.hysteresis = hysteresis
+        self.rate_window = rate_window
+
+        self.eyes_closed_since = None
+        self.mouth_open_since = None
+        self.blink_count = 0
+        self.long_closure_count = 0
+        self.yawn_count = 0
+        self.last_event = None
+        self._recent_blinks = deque()  # End times of blinks inside the rate window
+
+    def update(self, ear: float, mar: float, timestamp: float) -> list:
+        """
+        Feed one sample
+
+        Args:
+            ear: Eye aspect ratio
+            mar: Mouth aspect ratio
+            timestamp: Time of the sample in seconds
+
+        Returns:
+            list: FacialEvent objects completed by this sample
+        """
+        events = []
+
+        # Eyes: open -> closed below the threshold, closed -> open above threshold + hysteresis
+        if self.eyes_closed_since is None:
+            if ear < self.ear_threshold:
+                self.eyes_closed_since = timestamp
+        elif ear >= self.ear_threshold + self.hysteresis:
+            duration = timestamp - self.eyes_closed_since
+            if duration > self.max_blink_duration:
+                events.append(FacialEvent(FacialEvent.LONG_CLOSURE, self.eyes_closed_since, timestamp))
+                self.long_closure_count += 1
+            elif duration >= self.min_blink_duration:
+                events.append(FacialEvent(FacialEvent.BLINK, self.eyes_closed_since, timestamp))
+                self.blink_count += 1
+                self._recent_blinks.append(timestamp)
+            self.eyes_closed_since = None
+
+        # Mouth: a yawn is a sustained opening above the MAR threshold
+        if self.mouth_open_since is None:
+            if mar > self.mar_threshold:
+                self.mouth_open_since = timestamp
+        elif mar <= self.mar_threshold - self.hysteresis:
+            if timestamp - self.mouth_open_since >= self.min_yawn_duration:
+                events.append(FacialEvent(FacialEvent.YAWN, self.mouth_open_since, timestamp))
+                self.yawn_count += 1
+            self.mouth_open_since = None
+
+        self._expire_blinks(timestamp)
+
+        if events:
+            self.last_event = events[-1]
+        return events
+
+    def _expire_blinks(self, timestamp: float):
+        """Drop blinks that left the rate window (amortized O(1))"""
+        while self._recent_blinks and timestamp - self._recent_blinks[0] > self.rate_window:
+            self._recent_blinks.popleft()
+
+    @property
+    def blink_rate(self) -> float:
+        """Blinks per minute over the rate window"""
+        return len(self._recent_blinks) * 60.0 / self.rate_window
+
+    def reset(self):
+        """Clear the in-progress state and counters"""
+        self.eyes_closed_since = None
+        self.mouth_open_since = None
+        self.blink_count = 0
+        self.long_closure_count = 0
+        self.yawn_count = 0
+        self.last_event = None
+        self._recent_blinks.clear()
+
+    def stats(self) -> dict:
+        """
+        Counters and rates as plain values
+
+        Returns:
+            dict: Blink/yawn/long closure counts and blink rate per minute
+        """
+        return {
+            "blink_count": self.blink_count,
+            "yawn_count": self.yawn_count,
+            "long_closure_count": self.long_closure_count,
+            "blink_rate": self.blink_rate
+        }
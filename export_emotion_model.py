@@ -0,0 +1,146 @@
+"""
+Export the emotion model of the Drowsiness Detection System
+Converts the Keras emotion model to TFLite and/or ONNX with a dynamic batch
+dimension, then checks every runtime that can load the exports ('tflite',
+'onnx', 'opencv') for numerical parity with the Keras output. Select one with
+EMOTION_PARAMS['BACKEND'] to run emotion recognition without TensorFlow.
+
+Usage:
+    python export_emotion_model.py [--formats tflite onnx] [--video uploads/Garden_Explosion.mp4] [--tolerance 1e-4]
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+import config
+from emotion_models import CLASSES, FACE_SIZE, KerasEmotionModel, create_emotion_model
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Runtimes able to load each export format
+FORMAT_BACKENDS = {
+    'tflite': ['tflite'],
+    'onnx': ['onnx', 'opencv']
+}
+
+def export_tflite(model, output_path):
+    """
+    Convert the Keras model to a float32 TFLite flatbuffer
+
+    Args:
+        model: Loaded Keras emotion model
+        output_path: File to write
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+def export_onnx(model, output_path, opset=13):
+    """
+    Convert the Keras model to ONNX with a dynamic batch dimension
+
+    Args:
+        model: Loaded Keras emotion model
+        output_path: File to write
+        opset: ONNX opset version
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = [tf.TensorSpec([None, FACE_SIZE, FACE_SIZE, 1], tf.float32, name='input')]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset, output_path=output_path)
+
+EXPORTERS = {
+    'tflite': (export_tflite, config.EMOTION_TFLITE_PATH),
+    'onnx': (export_onnx, config.EMOTION_ONNX_PATH)
+}
+
+def parity_faces(video_path, count):
+    """
+    Faces to compare the runtimes on: faces cut from a video if given, plus
+    random images covering the whole input range
+
+    Args:
+        video_path: Video to cut faces from, or None
+        count: Number of faces of each kind
+
+    Returns:
+        np.ndarray: (N, 48, 48) uint8 faces
+    """
+    faces = [np.random.default_rng(0).integers(0, 256, (count, FACE_SIZE, FACE_SIZE), dtype=np.uint8)]
+    if video_path:
+        from benchmark_emotion import load_faces
+        faces.append(load_faces(video_path, 300, count))
+    return np.concatenate(faces)
+
+def check_parity(backend_names, faces, tolerance):
+    """
+    Compare backends against the Keras model
+
+    Args:
+        backend_names: Emotion model backends to check
+        faces: (N, 48, 48) uint8 faces
+        tolerance: Largest accepted absolute probability difference
+
+    Returns:
+        bool: Whether at least one backend could be loaded and every loaded
+            backend is within tolerance
+    """
+    reference = KerasEmotionModel().predict(faces)
+    print(f"{'backend':>8} {'max |diff|':>11} {'top-1 agreement':>16}")
+    passed = True
+    checked = 0
+
+    for name in backend_names:
+        try:
+            predictions = create_emotion_model(name).predict(faces)
+        except Exception as e:
+            print(f"{name:>8} skipped: {e}")
+            continue
+
+        difference = np.abs(predictions - reference).max()
+        agreement = np.mean(predictions.argmax(axis=1) == reference.argmax(axis=1))
+        print(f"{name:>8} {difference:>11.2e} {agreement:>16.3f}")
+        checked += 1
+        passed = passed and difference <= tolerance and predictions.shape == (len(faces), len(CLASSES))
+
+    if checked == 0:
+        print("No backend could be loaded, nothing was checked")
+        return False
+    if not passed:
+        print(f"Difference above {tolerance}")
+    return passed
+
+def main():
+    """Parse arguments, export the model and check parity"""
+    parser = argparse.ArgumentParser(description="Export the Keras emotion model for TensorFlow-free inference")
+    parser.add_argument('--formats', nargs='+', default=['tflite', 'onnx'], choices=sorted(EXPORTERS),
+                        help="Export formats")
+    parser.add_argument('--video', help="Video to cut parity check faces from, random faces only if omitted")
+    parser.add_argument('--faces', type=int, default=64, help="Number of faces of each kind in the parity check")
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                        help="Largest accepted absolute difference to the Keras probabilities")
+    args = parser.parse_args()
+
+    model = registry.get('emotion_model')
+    for name in args.formats:
+        exporter, output_path = EXPORTERS[name]
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        exporter(model, output_path)
+        print(f"Saved {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+    backends = [backend for name in args.formats for backend in FORMAT_BACKENDS[name]]
+    if not check_parity(backends, parity_faces(args.video, args.faces), args.tolerance):
+        print("Parity check failed")
+        sys.exit(1)
+    print("Parity check passed")
+
+if __name__ == "__main__":
+    main()
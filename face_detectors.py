@@ -0,0 +1,153 @@
+"""
+Face Detector Backends for the Drowsiness Detection System
+Interchangeable face detectors (dlib HOG, OpenCV Haar cascade, OpenCV DNN)
+that all return dlib rectangles, so they can feed the dlib shape predictor
+"""
+
+import cv2
+import dlib
+import numpy as np
+import logging
+import os
+import config
+
+logger = logging.getLogger(__name__)
+
+class FaceDetector:
+    """Base class for face detectors"""
+
+    name = 'base'
+
+    def detect(self, gray: np.ndarray, upsample: int = 0) -> list:
+        """
+        Detect faces in a grayscale image
+
+        Args:
+            gray: Grayscale image
+            upsample: Number of times to upsample the image (only used by HOG)
+
+        Returns:
+            list: dlib.rectangle per face, most confident first
+        """
+        raise NotImplementedError
+
+class HogFaceDetector(FaceDetector):
+    """dlib HOG + linear SVM frontal face detector"""
+
+    name = 'hog'
+
+    def __init__(self):
+        """Initialize the HOG detector"""
+        self.detector = dlib.get_frontal_face_detector()
+
+    def detect(self, gray: np.ndarray, upsample: int = 0) -> list:
+        """Detect faces with the HOG detector"""
+        return list(self.detector(gray, upsample))
+
+class HaarFaceDetector(FaceDetector):
+    """OpenCV Haar cascade face detector"""
+
+    name = 'haar'
+
+    def __init__(self, cascade_file: str = None, scale_factor: float = None, min_neighbors: int = None):
+        """
+        Initialize the Haar cascade detector
+
+        Args:
+            cascade_file: Cascade file, either a path or a file name in cv2.data.haarcascades
+            scale_factor: Scale step between cascade pyramid levels
+            min_neighbors: Neighbouring detections required to keep a face
+        """
+        params = config.FACE_DETECTOR_PARAMS
+        cascade_file = cascade_file or params['HAAR_CASCADE']
+        if not os.path.exists(cascade_file):
+            cascade_file = os.path.join(cv2.data.haarcascades, cascade_file)
+
+        self.cascade = cv2.CascadeClassifier(cascade_file)
+        if self.cascade.empty():
+            raise IOError(f"Could not load Haar cascade: {cascade_file}")
+
+        self.scale_factor = scale_factor or params['HAAR_SCALE_FACTOR']
+        self.min_neighbors = min_neighbors or params['HAAR_MIN_NEIGHBORS']
+
+    def detect(self, gray: np.ndarray, upsample: int = 0) -> list:
+        """Detect faces with the Haar cascade"""
+        faces = self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors)
+
+        # Largest face first
+        faces = sorted(faces, key=lambda box: box[2] * box[3], reverse=True)
+        return [dlib.rectangle(int(x), int(y), int(x + w - 1), int(y + h - 1)) for (x, y, w, h) in faces]
+
+class DnnFaceDetector(FaceDetector):
+    """OpenCV DNN face detector using the res10 300x300 SSD Caffe model"""
+
+    name = 'dnn'
+
+    def __init__(self, prototxt_path: str = None, model_path: str = None, confidence_threshold: float = None):
+        """
+        Initialize the DNN detector from local model files
+
+        Args:
+            prototxt_path: Path to the network definition (deploy.prototxt)
+            model_path: Path to the weights (res10_300x300_ssd_iter_140000.caffemodel)
+            confidence_threshold: Minimum detection confidence
+        """
+        prototxt_path = prototxt_path or config.FACE_DNN_PROTOTXT_PATH
+        model_path = model_path or config.FACE_DNN_MODEL_PATH
+
+        for path in (prototxt_path, model_path):
+            if not os.path.exists(path):
+                raise IOError(f"DNN face detector file not found: {path}")
+
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+        self.confidence_threshold = confidence_threshold or config.FACE_DETECTOR_PARAMS['DNN_CONFIDENCE']
+        self.input_size = (300, 300)
+
+    def detect(self, gray: np.ndarray, upsample: int = 0) -> list:
+        """Detect faces with the SSD network"""
+        height, width = gray.shape[:2]
+
+        # The network expects 3 channels
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if gray.ndim == 2 else gray
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, self.input_size), 1.0, self.input_size,
+                                     (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        # Columns: image id, class, confidence, x1, y1, x2, y2 (relative coordinates)
+        detections = detections[detections[:, 2] >= self.confidence_threshold]
+        detections = detections[np.argsort(-detections[:, 2])]
+
+        faces = []
+        for x1, y1, x2, y2 in detections[:, 3:7]:
+            left = max(0, int(x1 * width))
+            top = max(0, int(y1 * height))
+            right = min(width - 1, int(x2 * width))
+            bottom = min(height - 1, int(y2 * height))
+            if right > left and bottom > top:
+                faces.append(dlib.rectangle(left, top, right, bottom))
+
+        return faces
+
+FACE_DETECTORS = {
+    HogFaceDetector.name: HogFaceDetector,
+    HaarFaceDetector.name: HaarFaceDetector,
+    DnnFaceDetector.name: DnnFaceDetector
+}
+
+def create_face_detector(name: str = None) -> FaceDetector:
+    """
+    Create a face detector backend
+
+    Args:
+        name: Backend name ('hog', 'haar' or 'dnn'), defaults to config.DROWSINESS_PARAMS['FACE_DETECTOR']
+
+    Returns:
+        FaceDetector: The detector backend
+    """
+    name = name or config.DROWSINESS_PARAMS['FACE_DETECTOR']
+    if name not in FACE_DETECTORS:
+        raise ValueError(f"Unknown face detector '{name}', expected one of {sorted(FACE_DETECTORS)}")
+
+    logger.info(f"Using '{name}' face detector")
+    return FACE_DETECTORS[name]()
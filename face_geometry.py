@@ -0,0 +1,143 @@
+"""
+Facial Geometry Module for the Drowsiness Detection System
+Vectorized landmark metrics (EAR, MAR, head pose points) computed on 68-point
+landmark arrays of shape (68, 2), or batches of shape (N, 68, 2)
+"""
+
+import numpy as np
+
+# Landmark ranges of the 68-point model
+LEFT_EYE = slice(36, 42)
+RIGHT_EYE = slice(42, 48)
+MOUTH = slice(48, 68)
+
+# Point pairs for the aspect ratios, relative to a single 6-point eye / 20-point mouth
+EYE_VERTICAL_PAIRS = np.array([[1, 5], [2, 4]])
+EYE_HORIZONTAL_PAIR = np.array([0, 3])
+MOUTH_VERTICAL_PAIRS = np.array([[2, 10], [4, 8]])
+MOUTH_HORIZONTAL_PAIR = np.array([0, 6])
+
+# The same pairs in 68-point indices, with the left and right eye stacked
+FACE_EYE_VERTICAL_PAIRS = np.stack([EYE_VERTICAL_PAIRS + 36, EYE_VERTICAL_PAIRS + 42])
+FACE_EYE_HORIZONTAL_PAIRS = np.stack([EYE_HORIZONTAL_PAIR + 36, EYE_HORIZONTAL_PAIR + 42])
+FACE_MOUTH_VERTICAL_PAIRS = MOUTH_VERTICAL_PAIRS + 48
+FACE_MOUTH_HORIZONTAL_PAIR = MOUTH_HORIZONTAL_PAIR + 48
+
+# Nose tip, chin, left eye left corner, right eye right corner, left and right mouth corners
+HEAD_POSE_POINTS = np.array([30, 8, 36, 45, 48, 54])
+
+# Jawline and eyebrows, their bounding box is the bounding box of all 68 landmarks
+FACE_OUTLINE_POINTS = np.arange(0, 27)
+
+# Landmarks each metric needs, so landmark models only have to provide those
+METRIC_POINTS = {
+    'ear': np.arange(36, 48),
+    'mar': np.arange(48, 68),
+    'head_pose': HEAD_POSE_POINTS
+}
+
+def required_points(metrics) -> np.ndarray:
+    """
+    Landmark indices needed by a set of metrics
+
+    Args:
+        metrics: Metric names, keys of METRIC_POINTS
+
+    Returns:
+        np.ndarray: Sorted unique 68-point indices
+    """
+    if not metrics:
+        return np.array([], dtype=int)
+    return np.unique(np.concatenate([METRIC_POINTS[metric] for metric in metrics]))
+
+def shape_to_array(shape, dtype=np.int32) -> np.ndarray:
+    """
+    Convert a dlib full_object_detection to a (num_parts, 2) array in one pass
+
+    Args:
+        shape: dlib.full_object_detection returned by a shape predictor
+        dtype: Data type of the returned array
+
+    Returns:
+        np.ndarray: Landmark coordinates
+    """
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=dtype)
+
+def pair_distances(points: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """
+    Euclidean distances between pairs of landmarks
+
+    Args:
+        points: Landmarks of shape (..., P, 2)
+        pairs: Index pairs of shape (..., 2), indexing the P axis
+
+    Returns:
+        np.ndarray: Distances of shape points.shape[:-2] + pairs.shape[:-1]
+    """
+    points = np.asarray(points, dtype=np.float64)
+    diff = points[..., pairs[..., 0], :] - points[..., pairs[..., 1], :]
+    return np.sqrt(np.sum(diff * diff, axis=-1))
+
+def aspect_ratio(points: np.ndarray, vertical_pairs: np.ndarray, horizontal_pair: np.ndarray) -> np.ndarray:
+    """
+    Generic aspect ratio: mean vertical distance over horizontal distance
+
+    Args:
+        points: Landmarks of shape (..., P, 2)
+        vertical_pairs: Vertical index pairs of shape (..., V, 2)
+        horizontal_pair: Horizontal index pair of shape (..., 2)
+
+    Returns:
+        np.ndarray: Aspect ratios
+    """
+    vertical = pair_distances(points, vertical_pairs)
+    horizontal = pair_distances(points, horizontal_pair)
+    return vertical.sum(axis=-1) / (vertical.shape[-1] * horizontal)
+
+def eye_aspect_ratios(points: np.ndarray) -> np.ndarray:
+    """
+    Left and right eye aspect ratios
+
+    Args:
+        points: 68-point landmarks of shape (68, 2) or (N, 68, 2)
+
+    Returns:
+        np.ndarray: EAR of shape (2,) or (N, 2), left eye first
+    """
+    return aspect_ratio(points, FACE_EYE_VERTICAL_PAIRS, FACE_EYE_HORIZONTAL_PAIRS)
+
+def eye_aspect_ratio(points: np.ndarray) -> np.ndarray:
+    """
+    Average eye aspect ratio of both eyes
+
+    Args:
+        points: 68-point landmarks of shape (68, 2) or (N, 68, 2)
+
+    Returns:
+        np.ndarray: EAR as a scalar array or of shape (N,)
+    """
+    return eye_aspect_ratios(points).mean(axis=-1)
+
+def mouth_aspect_ratio(points: np.ndarray) -> np.ndarray:
+    """
+    Mouth aspect ratio used for yawn detection
+
+    Args:
+        points: 68-point landmarks of shape (68, 2) or (N, 68, 2)
+
+    Returns:
+        np.ndarray: MAR as a scalar array or of shape (N,)
+    """
+    return aspect_ratio(points, FACE_MOUTH_VERTICAL_PAIRS, FACE_MOUTH_HORIZONTAL_PAIR)
+
+def head_pose_image_points(points: np.ndarray) -> np.ndarray:
+    """
+    2D image points used to solve the head pose, ordered like the 3D model points
+
+    Args:
+        points: 68-point landmarks of shape (68, 2) or (N, 68, 2)
+
+    Returns:
+        np.ndarray: Float64 points of shape (6, 2) or (N, 6, 2)
+    """
+    return np.asarray(points, dtype=np.float64)[..., HEAD_POSE_POINTS, :]
@@ -0,0 +1,238 @@
+"""
+Face Tracking Module for the Drowsiness Detection System
+Keeps a stable identity for every occupant in view. Face detections are
+associated with existing tracks by IoU, falling back to centroid distance,
+and between detections each track follows its own landmarks.
+"""
+
+import dlib
+import numpy as np
+from typing import Callable, List, Tuple
+
+from head_pose import HeadPoseEstimator
+from smoothing import create_landmark_filter, create_metric_filter
+
+def rect_iou(a: dlib.rectangle, b: dlib.rectangle) -> float:
+    """Intersection over union of two dlib rectangles"""
+    left, top = max(a.left(), b.left()), max(a.top(), b.top())
+    right, bottom = min(a.right(), b.right()), min(a.bottom(), b.bottom())
+    intersection = max(0, right - left + 1) * max(0, bottom - top + 1)
+    union = a.width() * a.height() + b.width() * b.height() - intersection
+    return intersection / float(union) if union > 0 else 0.0
+
+def rect_center(rect: dlib.rectangle) -> Tuple[float, float]:
+    """Centre of a dlib rectangle"""
+    return (rect.left() + rect.right()) / 2.0, (rect.top() + rect.bottom()) / 2.0
+
+class FaceTrack:
+    """One tracked occupant: face box, landmark tracking reference, smoothing filters, head pose and drowsiness state"""
+
+    def __init__(self, track_id: int, face: dlib.rectangle, state):
+        """
+        Initialize the track
+
+        Args:
+            track_id: Identity of the occupant, unique per tracker
+            face: Rectangle the occupant was first detected in
+            state: Temporal drowsiness state of the occupant (DriverState)
+        """
+        self.track_id = track_id
+        self.face = face  # Rectangle landmarked on the latest frame
+        self.tracked_face = None  # Rectangle for the next frame, derived from the landmarks
+        self.last_landmark_box = None
+        self.box_offsets = None  # Detected face box edges relative to the landmark box
+        self.missed = 0  # Consecutive detection passes without a matching face
+        self.head_pose_estimator = HeadPoseEstimator()
+        # Landmark and EAR/MAR smoothing, None when disabled in config
+        self.landmark_filter = create_landmark_filter()
+        self.metric_filter = create_metric_filter()
+        self.state = state
+
+    def update_landmarks(self, shape: np.ndarray, frame_shape: Tuple[int, ...], max_drift: float) -> bool:
+        """
+        Derive the next frame's face rectangle from the current landmarks. The
+        landmark model expects boxes like the face detector's, so the rectangle
+        keeps the offsets from the landmark box that the face box had on the
+        last detection.
+
+        Tracking is dropped (forcing a full detection) when the landmarks jump or
+        change scale by more than max_drift relative to the previous frame, which
+        is the usual sign that the predictor lost the face. The landmarks of such
+        a frame must not be used.
+
+        Args:
+            shape: Facial landmarks as an (N, 2) array
+            frame_shape: Shape of the frame the landmarks belong to
+            max_drift: Maximum shift/scale change as a fraction of the face size
+
+        Returns:
+            bool: Whether the landmarks are valid, False when tracking was dropped
+        """
+        x_min, y_min = shape.min(axis=0)
+        x_max, y_max = shape.max(axis=0)
+        w = max(1, x_max - x_min)
+        h = max(1, y_max - y_min)
+
+        if self.last_landmark_box is None:
+            # Fresh detection: remember where the face box lies around the landmarks
+            face = self.face
+            self.box_offsets = ((face.left() - x_min) / float(w), (face.top() - y_min) / float(h),
+                                (face.right() - x_max) / float(w), (face.bottom() - y_max) / float(h))
+
+        if self.last_landmark_box is not None:
+            prev_x, prev_y, prev_w, prev_h = self.last_landmark_box
+            size = max(prev_w, prev_h)
+            shift = max(abs((x_min + w / 2) - (prev_x + prev_w / 2)),
+                        abs((y_min + h / 2) - (prev_y + prev_h / 2))) / size
+            scale_change = abs(w * h / float(prev_w * prev_h) - 1.0)
+            if shift > max_drift or scale_change > max_drift:
+                self.tracked_face = None
+                self.last_landmark_box = None
+                self.reset_filters()
+                return False
+
+        self.last_landmark_box = (x_min, y_min, w, h)
+
+        left = int(round(x_min + self.box_offsets[0] * w))
+        top = int(round(y_min + self.box_offsets[1] * h))
+        right = int(round(x_max + self.box_offsets[2] * w))
+        bottom = int(round(y_max + self.box_offsets[3] * h))
+
+        # Clamp the face box to the frame
+        left, top = max(0, left), max(0, top)
+        right = min(frame_shape[1] - 1, right)
+        bottom = min(frame_shape[0] - 1, bottom)
+
+        if right <= left or bottom <= top:
+            self.tracked_face = None
+            return False
+
+        self.tracked_face = dlib.rectangle(left, top, right, bottom)
+        return True
+
+    @property
+    def reference(self) -> dlib.rectangle:
+        """Rectangle new detections are compared against"""
+        return self.tracked_face if self.tracked_face is not None else self.face
+
+    def reset_filters(self):
+        """Restart smoothing, so landmarks that jumped are not blended with the old face"""
+        if self.landmark_filter is not None:
+            self.landmark_filter.reset()
+        if self.metric_filter is not None:
+            self.metric_filter.reset()
+
+    def lose_tracking(self):
+        """Forget the landmark reference, smoothing and head pose, the identity and state are kept"""
+        self.tracked_face = None
+        self.last_landmark_box = None
+        self.reset_filters()
+        self.head_pose_estimator.reset()
+
+class FaceTracker:
+    """Associates face detections with occupant tracks across frames"""
+
+    def __init__(self, state_factory: Callable, max_faces: int = 4, iou_threshold: float = 0.3,
+                 max_centroid_shift: float = 0.5, max_missed: int = 3):
+        """
+        Initialize the tracker
+
+        Args:
+            state_factory: Callable creating the drowsiness state of a new track
+            max_faces: Maximum number of occupants tracked per frame
+            iou_threshold: Minimum IoU to match a detection to a track
+            max_centroid_shift: Fallback match on centre distance, as a fraction of the face width
+            max_missed: Detection passes a track survives without a match
+        """
+        self.state_factory = state_factory
+        self.max_faces = max_faces
+        self.iou_threshold = iou_threshold
+        self.max_centroid_shift = max_centroid_shift
+        self.max_missed = max_missed
+        self.tracks = {}  # track_id -> FaceTrack
+        self._next_id = 1
+
+    @property
+    def next_track_id(self) -> int:
+        """Identity the next new track will get, identities only increase"""
+        return self._next_id
+
+    @property
+    def active_tracks(self) -> List[FaceTrack]:
+        """Tracks matched by the latest detection pass"""
+        return [track for track in self.tracks.values() if track.missed == 0]
+
+    def associate(self, faces: List[dlib.rectangle]) -> List[FaceTrack]:
+        """
+        Match a detection pass to the existing tracks
+
+        Detections are matched greedily by IoU, then by centroid distance.
+        Unmatched detections start new tracks, unmatched tracks count a miss
+        and are dropped after max_missed passes.
+
+        Args:
+            faces: Detected face rectangles
+
+        Returns:
+            List[FaceTrack]: Tracks of this frame, largest face first, with face set to the detection
+        """
+        faces = sorted(faces, key=lambda rect: rect.width() * rect.height(), reverse=True)[:self.max_faces]
+        tracks = list(self.tracks.values())
+        matches = {}  # face index -> track
+
+        candidates = []
+        for track_index, track in enumerate(tracks):
+            reference = track.reference
+            for face_index, face in enumerate(faces):
+                iou = rect_iou(reference, face)
+                if iou >= self.iou_threshold:
+                    candidates.append((-iou, track_index, face_index))
+        self._assign(sorted(candidates), tracks, matches)
+
+        # Faces that moved too far for any overlap, e.g. after a few missed detections
+        candidates = []
+        for track_index, track in enumerate(tracks):
+            reference = track.reference
+            ref_x, ref_y = rect_center(reference)
+            for face_index, face in enumerate(faces):
+                x, y = rect_center(face)
+                shift = np.hypot(x - ref_x, y - ref_y) / max(1, reference.width())
+                if shift <= self.max_centroid_shift:
+                    candidates.append((shift, track_index, face_index))
+        self._assign(sorted(candidates), tracks, matches)
+
+        matched = set(id(track) for track in matches.values())
+        for track in tracks:
+            if id(track) not in matched:
+                track.missed += 1
+                track.lose_tracking()
+                if track.missed > self.max_missed:
+                    del self.tracks[track.track_id]
+
+        result = []
+        for face_index, face in enumerate(faces):
+            track = matches.get(face_index)
+            if track is None:
+                track = FaceTrack(self._next_id, face, self.state_factory())
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+            track.face = face
+            track.missed = 0
+            # A fresh detection resets the landmark tracking reference
+            track.last_landmark_box = None
+            result.append(track)
+        return result
+
+    def _assign(self, candidates: list, tracks: List[FaceTrack], matches: dict):
+        """Greedily accept (score, track_index, face_index) candidates, best score first"""
+        used_tracks = set(id(track) for track in matches.values())
+        for _, track_index, face_index in candidates:
+            track = tracks[track_index]
+            if face_index in matches or id(track) in used_tracks:
+                continue
+            matches[face_index] = track
+            used_tracks.add(id(track))
+
+    def reset(self):
+        """Drop every track and its state"""
+        self.tracks.clear()
@@ -0,0 +1,217 @@
+"""
+Frame Bus Module for the Drowsiness Detection System
+Hands frames from a producer (the capture grabber, the API upload handler)
+to any number of readers without copying. Frames are decoded into a small
+pool of preallocated buffers and published as read-only references with a
+sequence number. Readers hold a reference while they use a frame, and its
+buffer goes back to the pool once the last reference is released.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FrameRef:
+    """Reference-counted, read-only view of a published frame"""
+
+    def __init__(self, bus: 'FrameBus', buffer: np.ndarray, timestamp: float, seq: int,
+                 arrival: float, recycle: bool):
+        """
+        Initialize the reference, owned once by the bus
+
+        Args:
+            bus: Bus the frame was published on
+            buffer: Writable array holding the pixels
+            timestamp: Capture timestamp in seconds
+            seq: Sequence number on the bus, starting at 1
+            arrival: time.monotonic() when the frame was published
+            recycle: Whether the buffer returns to the pool after the last release
+        """
+        self.bus = bus
+        self.buffer = buffer
+        self.image = buffer.view()
+        self.image.flags.writeable = False  # Shared by every reader, never modified in place
+        self.timestamp = timestamp
+        self.seq = seq
+        self.arrival = arrival
+        self.recycle = recycle
+        self.refcount = 1
+        self.reads = 0  # References handed to readers
+
+    def acquire(self) -> 'FrameRef':
+        """Take another reference, e.g. to keep the frame beyond the current loop iteration"""
+        self.bus._acquire(self)
+        return self
+
+    def release(self):
+        """Drop a reference, the buffer is recycled when none are left"""
+        self.bus._release(self)
+
+    def __enter__(self) -> 'FrameRef':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+class FrameBus:
+    """Latest-frame bus with a recycled buffer pool"""
+
+    def __init__(self, pool_size: int = 4):
+        """
+        Initialize the bus
+
+        Args:
+            pool_size: Free buffers kept for reuse. The pool grows when readers
+                hold more frames, the extra buffers are dropped when released.
+        """
+        self.pool_size = pool_size
+        self.published = 0  # Frames published so far
+        self.dropped = 0  # Frames replaced before any reader took them
+        self.allocated = 0  # Buffers allocated by the pool
+        self.recycled = 0  # Buffers handed out again from the pool
+        self.closed = False
+        self._free = []
+        self._latest = None
+        self._condition = threading.Condition()
+
+    def buffer(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        Get a writable buffer to capture the next frame into
+
+        Args:
+            shape: Frame shape
+            dtype: Frame data type
+
+        Returns:
+            np.ndarray: A free pool buffer of that shape, newly allocated if none is free
+        """
+        with self._condition:
+            while self._free:
+                buffer = self._free.pop()
+                if buffer.shape == tuple(shape) and buffer.dtype == dtype:
+                    self.recycled += 1
+                    return buffer
+                # Buffers of an old frame size are dropped
+            self.allocated += 1
+        return np.empty(shape, dtype=dtype)
+
+    def recycle(self, buffer: np.ndarray):
+        """Return a buffer taken with buffer() that was not published"""
+        with self._condition:
+            if len(self._free) < self.pool_size:
+                self._free.append(buffer)
+
+    def publish(self, buffer: np.ndarray, timestamp: float, recycle: bool = True) -> int:
+        """
+        Publish a frame as the latest one. The producer must not write to the
+        buffer afterwards.
+
+        Args:
+            buffer: Frame pixels, usually from buffer()
+            timestamp: Capture timestamp in seconds
+            recycle: Whether the buffer may be reused once released
+
+        Returns:
+            int: Sequence number of the frame
+        """
+        with self._condition:
+            self.published += 1
+            previous = self._latest
+            self._latest = FrameRef(self, buffer, timestamp, self.published, time.monotonic(), recycle)
+            if previous is not None:
+                if previous.reads == 0:
+                    self.dropped += 1
+                self._release_locked(previous)
+            self._condition.notify_all()
+            return self.published
+
+    def latest(self) -> Optional[FrameRef]:
+        """
+        Take a reference to the latest frame
+
+        Returns:
+            Optional[FrameRef]: The latest frame, to be released by the caller, or None
+        """
+        with self._condition:
+            return self._take_locked()
+
+    def wait(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[FrameRef]:
+        """
+        Wait for a frame newer than after_seq and take a reference to it
+
+        Args:
+            after_seq: Sequence number of the last frame the reader saw
+            timeout: Seconds to wait, forever if None
+
+        Returns:
+            Optional[FrameRef]: The latest frame, to be released by the caller.
+                None on timeout or when the bus was closed.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.closed or (self._latest is not None and self._latest.seq > after_seq), timeout)
+            if self._latest is None or self._latest.seq <= after_seq:
+                return None
+            return self._take_locked()
+
+    def close(self):
+        """Mark the end of the stream and wake the waiting readers"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def clear(self):
+        """Drop the latest frame, readers keep their references"""
+        with self._condition:
+            if self._latest is not None:
+                self._release_locked(self._latest)
+                self._latest = None
+
+    def stats(self) -> dict:
+        """
+        Bus statistics
+
+        Returns:
+            dict: Published, dropped, allocated and recycled counts and free pool buffers
+        """
+        with self._condition:
+            return {
+                "published": self.published,
+                "dropped": self.dropped,
+                "allocated": self.allocated,
+                "recycled": self.recycled,
+                "free": len(self._free)
+            }
+
+    def _take_locked(self) -> Optional[FrameRef]:
+        """Hand a reference to the latest frame to a reader"""
+        ref = self._latest
+        if ref is not None:
+            ref.refcount += 1
+            ref.reads += 1
+        return ref
+
+    def _acquire(self, ref: FrameRef):
+        """Add a reference to a frame"""
+        with self._condition:
+            if ref.refcount <= 0:
+                raise RuntimeError(f"Frame {ref.seq} was already released")
+            ref.refcount += 1
+
+    def _release(self, ref: FrameRef):
+        """Drop a reference to a frame"""
+        with self._condition:
+            self._release_locked(ref)
+
+    def _release_locked(self, ref: FrameRef):
+        """Drop a reference and recycle the buffer when it was the last"""
+        if ref.refcount <= 0:
+            raise RuntimeError(f"Frame {ref.seq} released more often than acquired")
+        ref.refcount -= 1
+        if ref.refcount == 0 and ref.recycle and len(self._free) < self.pool_size:
+            self._free.append(ref.buffer)
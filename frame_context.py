@@ -0,0 +1,133 @@
+"""
+Frame Context Module for the Drowsiness Detection System
+Regions of interest of one frame, derived once from the drowsiness
+analysis and shared by the other detectors: the driver's face crop for
+emotion recognition and an expanded head-and-hands region for phone
+detection. Crops are NumPy slices of the frame, never copies.
+"""
+
+from typing import Optional, Tuple
+
+import dlib
+import numpy as np
+
+import config
+
+class FrameContext:
+    """Per-frame regions of interest around the driver's face"""
+
+    def __init__(self, frame: np.ndarray, gray: Optional[np.ndarray] = None,
+                 face: Optional[dlib.rectangle] = None):
+        """
+        Initialize the context
+
+        Args:
+            frame: BGR frame
+            gray: Grayscale version of the frame, if already computed
+            face: The driver's face rectangle, None when no face was found
+        """
+        self.frame = frame
+        self.gray = gray
+        self.face = face
+        self._boxes = {}  # Cached regions as (left, top, right, bottom)
+
+    @classmethod
+    def from_analysis(cls, analysis, driver_track_id: Optional[int] = None) -> 'FrameContext':
+        """
+        Build the context of an analysed frame
+
+        Args:
+            analysis: FrameAnalysis from DrowsinessDetector
+            driver_track_id: Track of the driver, the primary occupant when None or not in view
+
+        Returns:
+            FrameContext: The frame's regions of interest
+        """
+        driver = analysis.primary
+        for face_analysis in analysis.faces:
+            if face_analysis.track_id == driver_track_id:
+                driver = face_analysis
+                break
+        return cls(analysis.frame, analysis.gray, driver.face if driver is not None else None)
+
+    @property
+    def face_detected(self) -> bool:
+        """Whether the driver's face is known"""
+        return self.face is not None
+
+    def _region(self, name: str, left: float, top: float, right: float, bottom: float) -> Tuple[int, int, int, int]:
+        """Clamp a region to the frame and cache it under name"""
+        box = self._boxes.get(name)
+        if box is None:
+            height, width = self.frame.shape[:2]
+            box = (max(0, int(left)), max(0, int(top)), min(width, int(right)), min(height, int(bottom)))
+            self._boxes[name] = box
+        return box
+
+    def face_box(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Driver's face with the configured margin
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: (left, top, right, bottom) in frame pixels, None without a face
+        """
+        if self.face is None:
+            return None
+        margin = config.ROI_PARAMS['FACE_MARGIN']
+        face = self.face
+        return self._region('face', face.left() - margin * face.width(), face.top() - margin * face.height(),
+                            face.right() + 1 + margin * face.width(), face.bottom() + 1 + margin * face.height())
+
+    def phone_box(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Region where a phone held by the driver appears: the head, widened to
+        both sides and extended down to the hands
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: (left, top, right, bottom) in frame pixels, None without a face
+        """
+        if self.face is None:
+            return None
+        params = config.ROI_PARAMS
+        face = self.face
+        center_x = (face.left() + face.right()) / 2.0
+        half_width = params['PHONE_REGION_WIDTH'] * face.width() / 2.0
+        return self._region('phone', center_x - half_width, face.top() - params['PHONE_REGION_ABOVE'] * face.height(),
+                            center_x + half_width, face.bottom() + params['PHONE_REGION_BELOW'] * face.height())
+
+    def face_crop(self, gray: bool = True) -> Optional[np.ndarray]:
+        """
+        View of the driver's face
+
+        Args:
+            gray: Crop the grayscale frame instead of the BGR frame
+
+        Returns:
+            Optional[np.ndarray]: Slice of the frame, None without a face or an empty crop
+        """
+        box = self.face_box()
+        image = self.gray if gray and self.gray is not None else self.frame
+        return self._crop(image, box)
+
+    def phone_crop(self) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        View of the phone region, the whole frame when no face is known
+
+        Returns:
+            tuple: (BGR slice of the frame, (left, top) offset of the slice in the frame)
+        """
+        box = self.phone_box()
+        crop = self._crop(self.frame, box)
+        if crop is None:
+            return self.frame, (0, 0)
+        return crop, box[:2]
+
+    @staticmethod
+    def _crop(image: np.ndarray, box: Optional[Tuple[int, int, int, int]]) -> Optional[np.ndarray]:
+        """Slice a box out of an image, None for a missing or empty box"""
+        if box is None:
+            return None
+        left, top, right, bottom = box
+        if right <= left or bottom <= top:
+            return None
+        return image[top:bottom, left:right]
@@ -0,0 +1,185 @@
+"""
+Head Pose Module for the Drowsiness Detection System
+Estimates head pitch, yaw and roll from facial landmarks with solvePnP, and
+learns each driver's neutral pose so head movement is measured from it
+"""
+
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+from ear_calibration import StreamingQuantile
+
+# Generic 3D face model (nose tip, chin, left eye left corner, right eye right corner,
+# left mouth corner, right mouth corner), matching face_geometry.HEAD_POSE_POINTS.
+# The y and z axes are flipped so the model uses the camera convention (y down,
+# z away from the camera) and a frontal face solves to the identity rotation.
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),
+    (0.0, -330.0, -65.0),
+    (-225.0, 170.0, -135.0),
+    (225.0, 170.0, -135.0),
+    (-150.0, -150.0, -125.0),
+    (150.0, -150.0, -125.0)
+]) * np.array([1.0, -1.0, -1.0])
+
+def rotation_matrix_to_euler(rotation_matrix: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Convert a rotation matrix to Euler angles
+
+    Args:
+        rotation_matrix: 3x3 rotation matrix
+
+    Returns:
+        Tuple[float, float, float]: (pitch, yaw, roll) in degrees
+    """
+    r = rotation_matrix
+    sy = np.sqrt(r[0, 0] * r[0, 0] + r[1, 0] * r[1, 0])
+
+    if sy > 1e-6:
+        pitch = np.arctan2(r[2, 1], r[2, 2])
+        yaw = np.arctan2(-r[2, 0], sy)
+        roll = np.arctan2(r[1, 0], r[0, 0])
+    else:
+        # Gimbal lock, roll is not observable
+        pitch = np.arctan2(-r[1, 2], r[1, 1])
+        yaw = np.arctan2(-r[2, 0], sy)
+        roll = 0.0
+
+    return tuple(float(angle) for angle in np.degrees([pitch, yaw, roll]))
+
+class HeadPoseEstimator:
+    """Head pose estimator with cached camera intrinsics and warm-started solvePnP"""
+
+    def __init__(self):
+        """Initialize the estimator, intrinsics are computed on the first frame"""
+        self.frame_size = None
+        self.camera_matrix = None
+        self.dist_coeffs = np.zeros((4, 1))
+        self.rvec = None
+        self.tvec = None
+
+    def _update_intrinsics(self, frame_shape: Tuple[int, ...]):
+        """Recompute the camera matrix only when the frame size changes"""
+        height, width = frame_shape[:2]
+        if self.frame_size == (width, height):
+            return
+
+        # Approximate a pinhole camera: focal length ~ image width, principal point at the centre
+        focal_length = float(width)
+        self.camera_matrix = np.array(
+            [[focal_length, 0, width / 2.0],
+             [0, focal_length, height / 2.0],
+             [0, 0, 1]], dtype=np.float64
+        )
+        self.frame_size = (width, height)
+        self.reset()
+
+    def estimate(self, image_points: np.ndarray, frame_shape: Tuple[int, ...]) -> Optional[Tuple[float, float, float]]:
+        """
+        Estimate the head pose
+
+        Args:
+            image_points: (6, 2) float64 image points from face_geometry.head_pose_image_points
+            frame_shape: Shape of the frame the points belong to
+
+        Returns:
+            Optional[Tuple[float, float, float]]: (pitch, yaw, roll) in degrees, or None
+        """
+        self._update_intrinsics(frame_shape)
+
+        if self.rvec is not None:
+            # Start the iterative solver from the previous frame's pose
+            success, rvec, tvec = cv2.solvePnP(
+                MODEL_POINTS, image_points, self.camera_matrix, self.dist_coeffs,
+                self.rvec.copy(), self.tvec.copy(), useExtrinsicGuess=True,
+                flags=cv2.SOLVEPNP_ITERATIVE
+            )
+        else:
+            success, rvec, tvec = cv2.solvePnP(
+                MODEL_POINTS, image_points, self.camera_matrix, self.dist_coeffs,
+                flags=cv2.SOLVEPNP_ITERATIVE
+            )
+
+        # A face behind the camera means the solver converged to the mirrored solution
+        if not success or tvec[2, 0] <= 0:
+            self.reset()
+            return None
+
+        self.rvec = rvec
+        self.tvec = tvec
+        rotation_matrix, _ = cv2.Rodrigues(rvec)
+        return rotation_matrix_to_euler(rotation_matrix)
+
+    def reset(self):
+        """Forget the previous pose so the next estimate starts cold"""
+        self.rvec = None
+        self.tvec = None
+
+class NeutralPose:
+    """A driver's neutral head pose, the median pose over the first seconds of a session.
+    The generic face model and approximate intrinsics bias the absolute angles
+    by camera placement and face shape, deviations from the neutral pose are not."""
+
+    def __init__(self, duration: float = 30.0, min_samples: int = 30):
+        """
+        Initialize the calibration
+
+        Args:
+            duration: Seconds of poses to learn from, the neutral pose is fixed afterwards
+            min_samples: Poses required before a neutral pose is available
+        """
+        self.duration = duration
+        self.min_samples = min_samples
+        self.medians = [StreamingQuantile(0.5) for _ in range(3)]
+        self.start_time = None
+        self.pose = None  # Fixed (pitch, yaw, roll) once calibrated
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether the neutral pose is fixed"""
+        return self.pose is not None
+
+    @property
+    def neutral(self) -> Optional[Tuple[float, float, float]]:
+        """Neutral (pitch, yaw, roll), the running median during calibration, None before min_samples"""
+        if self.pose is not None:
+            return self.pose
+        if self.medians[0].count < self.min_samples:
+            return None
+        return tuple(median.value for median in self.medians)
+
+    def update(self, head_pose: Tuple[float, float, float], timestamp: float):
+        """
+        Feed one estimated pose
+
+        Args:
+            head_pose: (pitch, yaw, roll) in degrees
+            timestamp: Time of the pose in seconds
+        """
+        if self.calibrated:
+            return
+
+        if self.start_time is None:
+            self.start_time = timestamp
+        for median, angle in zip(self.medians, head_pose):
+            median.update(angle)
+
+        if timestamp - self.start_time >= self.duration and self.medians[0].count >= self.min_samples:
+            self.pose = self.neutral
+
+    def deviation(self, head_pose: Tuple[float, float, float]) -> Optional[Tuple[float, float, float]]:
+        """
+        Rotation of a pose away from the neutral pose
+
+        Args:
+            head_pose: (pitch, yaw, roll) in degrees
+
+        Returns:
+            Optional[Tuple[float, float, float]]: Angle differences in degrees within
+                [-180, 180), or None while no neutral pose is available
+        """
+        neutral = self.neutral
+        if neutral is None:
+            return None
+        return tuple((angle - rest + 180.0) % 360.0 - 180.0 for angle, rest in zip(head_pose, neutral))
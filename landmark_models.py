@@ -0,0 +1,130 @@
+"""
+Landmark Model Backends for the Drowsiness Detection System
+Interchangeable facial landmark regressors (dlib 68-point predictor, a dlib
+predictor trained on an eye/mouth subset, OpenCV LBF facemark). Every model
+reports its points in the 68-point iBUG numbering, so the metrics in
+face_geometry work unchanged, and fills only the points the caller requests.
+"""
+
+import dlib
+import numpy as np
+import logging
+import config
+import face_geometry
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+class LandmarkModel:
+    """Base class for landmark models"""
+
+    name = 'base'
+    points = np.arange(68)  # 68-point indices the model regresses
+
+    def covers(self, points) -> bool:
+        """Whether the model regresses all of the given 68-point indices"""
+        return bool(np.isin(points, self.points).all())
+
+    def predict(self, gray: np.ndarray, face: dlib.rectangle, points: np.ndarray = None) -> np.ndarray:
+        """
+        Regress the landmarks of a face
+
+        Args:
+            gray: Grayscale image
+            face: Face rectangle
+            points: 68-point indices to fill in, all points of the model if None
+
+        Returns:
+            np.ndarray: (68, 2) int32 array, rows that were not requested are zero.
+                None when the model failed to fit the face.
+        """
+        raise NotImplementedError
+
+class Dlib68LandmarkModel(LandmarkModel):
+    """dlib ensemble-of-regression-trees predictor for all 68 landmarks"""
+
+    name = 'dlib68'
+
+    def predict(self, gray: np.ndarray, face: dlib.rectangle, points: np.ndarray = None) -> np.ndarray:
+        """Regress all 68 landmarks and convert the requested ones"""
+        detection = registry.get('shape_predictor')(gray, face)
+        if points is None:
+            return face_geometry.shape_to_array(detection)
+
+        shape = np.zeros((68, 2), dtype=np.int32)
+        for index in points:
+            part = detection.part(int(index))
+            shape[index] = (part.x, part.y)
+        return shape
+
+class DlibSubsetLandmarkModel(LandmarkModel):
+    """dlib predictor trained on a subset of the 68 landmarks (see train_landmark_subset.py)"""
+
+    name = 'dlib_subset'
+
+    def __init__(self):
+        """Initialize the subset model, its point list comes from config"""
+        self.points = np.asarray(config.DROWSINESS_PARAMS['LANDMARK_SUBSET_POINTS'])
+        # The part count is only exposed on predictions, so run one on a blank image
+        predictor = registry.get('landmark_subset')
+        num_parts = predictor(np.zeros((16, 16), dtype=np.uint8), dlib.rectangle(0, 0, 15, 15)).num_parts
+        if num_parts != len(self.points):
+            raise ValueError(f"Subset landmark model has {num_parts} parts, "
+                             f"LANDMARK_SUBSET_POINTS lists {len(self.points)}")
+
+    def predict(self, gray: np.ndarray, face: dlib.rectangle, points: np.ndarray = None) -> np.ndarray:
+        """Regress the subset and place the requested points at their 68-point indices"""
+        detection = registry.get('landmark_subset')(gray, face)
+        fitted = np.zeros((68, 2), dtype=np.int32)
+        fitted[self.points] = face_geometry.shape_to_array(detection)
+        if points is None:
+            return fitted
+        shape = np.zeros((68, 2), dtype=np.int32)
+        shape[points] = fitted[points]
+        return shape
+
+class LbfLandmarkModel(LandmarkModel):
+    """OpenCV LBF facemark model (needs opencv-contrib-python)"""
+
+    name = 'lbf'
+
+    def __init__(self):
+        """Initialize the LBF model"""
+        self.facemark = registry.get('facemark_lbf')
+
+    def predict(self, gray: np.ndarray, face: dlib.rectangle, points: np.ndarray = None) -> np.ndarray:
+        """Fit the 68 landmarks and keep the requested ones, None when the fit failed"""
+        boxes = np.array([[face.left(), face.top(), face.width(), face.height()]], dtype=np.int32)
+        ok, landmarks = self.facemark.fit(gray, boxes)
+        if not ok:
+            return None
+
+        fitted = np.rint(landmarks[0][0]).astype(np.int32)
+        if points is None:
+            return fitted
+        shape = np.zeros((68, 2), dtype=np.int32)
+        shape[points] = fitted[points]
+        return shape
+
+LANDMARK_MODELS = {
+    Dlib68LandmarkModel.name: Dlib68LandmarkModel,
+    DlibSubsetLandmarkModel.name: DlibSubsetLandmarkModel,
+    LbfLandmarkModel.name: LbfLandmarkModel
+}
+
+def create_landmark_model(name: str = None) -> LandmarkModel:
+    """
+    Create a landmark model backend
+
+    Args:
+        name: Backend name ('dlib68', 'dlib_subset' or 'lbf'), defaults to config.DROWSINESS_PARAMS['LANDMARK_MODEL']
+
+    Returns:
+        LandmarkModel: The landmark model backend
+    """
+    name = name or config.DROWSINESS_PARAMS['LANDMARK_MODEL']
+    if name not in LANDMARK_MODELS:
+        raise ValueError(f"Unknown landmark model '{name}', expected one of {sorted(LANDMARK_MODELS)}")
+
+    logger.info(f"Using '{name}' landmark model")
+    return LANDMARK_MODELS[name]()
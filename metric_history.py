@@ -0,0 +1,181 @@
+"""
+Metric History Module for the Drowsiness Detection System
+Fixed-size ring buffer of EAR, MAR and timestamps over a rolling time window,
+with rolling statistics that are maintained incrementally in constant time
+per sample
+"""
+
+import numpy as np
+
+class MetricHistory:
+    """Ring buffer of per-frame eye/mouth metrics with rolling mean, variance and PERCLOS"""
+
+    def __init__(self, capacity: int, max_sample_duration: float = None, window: float = None):
+        """
+        Initialize an empty history
+
+        Args:
+            capacity: Maximum number of samples kept, the window holds fewer
+                seconds when samples arrive faster than capacity / window per second
+            max_sample_duration: Longest time in seconds a sample can cover, so a
+                gap without samples (e.g. no face in view) is not charged to the
+                sample after it. None leaves durations uncapped.
+            window: Seconds of samples kept, so the window does not depend on
+                the frame rate. None keeps the last capacity samples.
+        """
+        self.capacity = capacity
+        self.max_sample_duration = max_sample_duration
+        self.window = window
+        self.ear = np.zeros(capacity)
+        self.mar = np.zeros(capacity)
+        self.timestamps = np.zeros(capacity)
+        self.closed = np.zeros(capacity, dtype=bool)
+        # Time each sample covers (since the previous sample), used for PERCLOS
+        self.durations = np.zeros(capacity)
+        self.index = 0  # Next write position
+        self.count = 0
+        self._reset_sums()
+
+    def _reset_sums(self):
+        """Recompute the running sums from the buffer contents"""
+        valid = (self.index - self.count + np.arange(self.count)) % self.capacity
+        self._ear_sum = float(self.ear[valid].sum())
+        self._ear_sq_sum = float(np.square(self.ear[valid]).sum())
+        self._mar_sum = float(self.mar[valid].sum())
+        self._mar_sq_sum = float(np.square(self.mar[valid]).sum())
+        self._closed_count = int(self.closed[valid].sum())
+        self._closed_time = float(self.durations[valid][self.closed[valid]].sum())
+        self._total_time = float(self.durations[valid].sum())
+
+    def append(self, ear: float, mar: float, timestamp: float, eyes_closed: bool):
+        """
+        Add a sample, evicting the samples that left the time window, and the
+        oldest one when the buffer is full
+
+        Args:
+            ear: Eye aspect ratio
+            mar: Mouth aspect ratio
+            timestamp: Time of the sample in seconds
+            eyes_closed: Whether the eyes counted as closed in this sample
+        """
+        duration = 0.0
+        if self.count:
+            duration = max(0.0, timestamp - self.last_timestamp)
+            if self.max_sample_duration is not None:
+                duration = min(duration, self.max_sample_duration)
+
+        if self.window is not None:
+            while self.count and timestamp - self.timestamps[self._oldest] >= self.window:
+                self._evict_oldest()
+        if self.count == self.capacity:
+            self._evict_oldest()
+
+        i = self.index
+        self.ear[i] = ear
+        self.mar[i] = mar
+        self.timestamps[i] = timestamp
+        self.closed[i] = eyes_closed
+        self.durations[i] = duration
+        self.count += 1
+
+        self._ear_sum += ear
+        self._ear_sq_sum += ear * ear
+        self._mar_sum += mar
+        self._mar_sq_sum += mar * mar
+        self._total_time += duration
+        if eyes_closed:
+            self._closed_count += 1
+            self._closed_time += duration
+
+        self.index = (i + 1) % self.capacity
+
+        # Resync once per lap so floating point error cannot accumulate (amortized O(1))
+        if self.index == 0:
+            self._reset_sums()
+
+    @property
+    def _oldest(self) -> int:
+        """Buffer position of the oldest sample"""
+        return (self.index - self.count) % self.capacity
+
+    def _evict_oldest(self):
+        """Remove the oldest sample from the window and the running sums"""
+        i = self._oldest
+        self._ear_sum -= self.ear[i]
+        self._ear_sq_sum -= self.ear[i] * self.ear[i]
+        self._mar_sum -= self.mar[i]
+        self._mar_sq_sum -= self.mar[i] * self.mar[i]
+        self._total_time -= self.durations[i]
+        if self.closed[i]:
+            self._closed_count -= 1
+            self._closed_time -= self.durations[i]
+        self.count -= 1
+
+    def clear(self):
+        """Drop all samples"""
+        self.index = 0
+        self.count = 0
+        self._reset_sums()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def last_timestamp(self) -> float:
+        """Timestamp of the most recent sample"""
+        return float(self.timestamps[self.index - 1]) if self.count else 0.0
+
+    @property
+    def window_seconds(self) -> float:
+        """Time covered by the samples in the window"""
+        return self._total_time
+
+    @property
+    def ear_mean(self) -> float:
+        """Rolling mean of the EAR"""
+        return self._ear_sum / self.count if self.count else 0.0
+
+    @property
+    def ear_variance(self) -> float:
+        """Rolling variance of the EAR"""
+        if not self.count:
+            return 0.0
+        mean = self.ear_mean
+        return max(0.0, self._ear_sq_sum / self.count - mean * mean)
+
+    @property
+    def mar_mean(self) -> float:
+        """Rolling mean of the MAR"""
+        return self._mar_sum / self.count if self.count else 0.0
+
+    @property
+    def mar_variance(self) -> float:
+        """Rolling variance of the MAR"""
+        if not self.count:
+            return 0.0
+        mean = self.mar_mean
+        return max(0.0, self._mar_sq_sum / self.count - mean * mean)
+
+    @property
+    def perclos(self) -> float:
+        """Fraction of time the eyes were closed over the window"""
+        if self._total_time > 0:
+            return self._closed_time / self._total_time
+        return self._closed_count / self.count if self.count else 0.0
+
+    def stats(self) -> dict:
+        """
+        Rolling statistics as plain floats, without copying the history
+
+        Returns:
+            dict: Rolling EAR/MAR mean and variance, PERCLOS and window size
+        """
+        return {
+            "ear_mean": float(self.ear_mean),
+            "ear_variance": float(self.ear_variance),
+            "mar_mean": float(self.mar_mean),
+            "mar_variance": float(self.mar_variance),
+            "perclos": float(self.perclos),
+            "samples": self.count,
+            "window_seconds": float(self.window_seconds)
+        }
@@ -0,0 +1,213 @@
+"""
+Model Registry for the Drowsiness Detection System
+Loads the heavy models (dlib and OpenCV landmark models, Keras emotion
+model and its exports, YOLO phone detector) on first use and shares a
+single instance per process between every component, so features that are
+never used cost neither startup time nor memory. Load time and resident memory growth are
+recorded per model.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+def current_rss() -> int:
+    """
+    Resident set size of this process
+
+    Returns:
+        int: RSS in bytes, 0 if it cannot be read on this platform
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+class ModelRegistry:
+    """Process-wide registry of lazily loaded, shared models"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader):
+        """
+        Register a model loader
+
+        Args:
+            name: Name the model is requested by
+            loader: Callable without arguments returning the loaded model
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        """
+        Get a model, loading it on the first request
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            The shared model instance
+
+        Raises:
+            KeyError: If no loader is registered under name
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        # One lock per model so a slow load does not block the others
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                model = self._load(name)
+        return model
+
+    def _load(self, name: str):
+        """Run the loader of a model and record its cost"""
+        rss_before = current_rss()
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        load_seconds = time.perf_counter() - start
+        rss_delta = max(0, current_rss() - rss_before)
+
+        self._models[name] = model
+        self._stats[name] = {
+            "load_seconds": load_seconds,
+            "rss_mb": rss_delta / (1024.0 * 1024.0)
+        }
+        logger.info(f"Loaded model '{name}' in {load_seconds:.2f} s (+{self._stats[name]['rss_mb']:.1f} MB RSS)")
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether a model has been loaded"""
+        return name in self._models
+
+    def stats(self) -> dict:
+        """
+        Load statistics of every registered model
+
+        Returns:
+            dict: Per model: loaded flag, load time in seconds and RSS growth in MB
+        """
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": self._stats.get(name, {}).get("load_seconds"),
+                "rss_mb": self._stats.get(name, {}).get("rss_mb")
+            }
+            for name in self._loaders
+        }
+
+def _load_shape_predictor():
+    """Load the dlib 68-point shape predictor"""
+    import dlib
+    return dlib.shape_predictor(config.SHAPE_PREDICTOR_PATH)
+
+def _load_landmark_subset():
+    """Load the dlib eye/mouth subset predictor"""
+    import dlib
+
+    if not os.path.exists(config.LANDMARK_SUBSET_MODEL_PATH):
+        raise IOError(f"Subset landmark model not found: {config.LANDMARK_SUBSET_MODEL_PATH}, "
+                      f"train one with train_landmark_subset.py")
+    return dlib.shape_predictor(config.LANDMARK_SUBSET_MODEL_PATH)
+
+def _load_facemark_lbf():
+    """Load the OpenCV LBF facemark model"""
+    import cv2
+
+    if not hasattr(cv2, 'face'):
+        raise ImportError("The LBF landmark model needs opencv-contrib-python")
+    if not os.path.exists(config.LBF_MODEL_PATH):
+        raise IOError(f"LBF landmark model not found: {config.LBF_MODEL_PATH}")
+
+    facemark = cv2.face.createFacemarkLBF()
+    facemark.loadModel(config.LBF_MODEL_PATH)
+    return facemark
+
+def _load_emotion_model():
+    """Load the Keras emotion model, downloading it if missing"""
+    import tensorflow as tf
+
+    model_path = config.EMOTION_MODEL_PATH
+    if not os.path.exists(model_path):
+        logger.info("Downloading emotion recognition model...")
+        import urllib.request
+        url = "https://github.com/atulapra/Emotion-detection/raw/master/model.h5"
+        urllib.request.urlretrieve(url, model_path)
+
+    return tf.keras.models.load_model(model_path)
+
+def _require_emotion_export(path: str):
+    """Fail with a hint when an exported emotion model is missing"""
+    if not os.path.exists(path):
+        raise IOError(f"Exported emotion model not found: {path}, "
+                      f"create it with export_emotion_model.py")
+
+def _load_emotion_tflite():
+    """Load the TFLite emotion model into an interpreter, without TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        raise ImportError("The 'tflite' emotion model needs tflite-runtime")
+
+    _require_emotion_export(config.EMOTION_TFLITE_PATH)
+    interpreter = Interpreter(model_path=config.EMOTION_TFLITE_PATH)
+    interpreter.allocate_tensors()
+    return interpreter
+
+def _load_emotion_onnx():
+    """Load the ONNX emotion model into an ONNX Runtime session"""
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("The 'onnx' emotion model needs onnxruntime")
+
+    _require_emotion_export(config.EMOTION_ONNX_PATH)
+    return onnxruntime.InferenceSession(config.EMOTION_ONNX_PATH, providers=['CPUExecutionProvider'])
+
+def _load_emotion_dnn():
+    """Load the ONNX emotion model with the OpenCV DNN module"""
+    import cv2
+
+    _require_emotion_export(config.EMOTION_ONNX_PATH)
+    return cv2.dnn.readNetFromONNX(config.EMOTION_ONNX_PATH)
+
+def _load_phone_model():
+    """Load the YOLO phone detection weights"""
+    from ultralytics import YOLO
+    return YOLO(config.PHONE_MODEL_PATH)
+
+# Shared registry instance
+registry = ModelRegistry()
+registry.register('shape_predictor', _load_shape_predictor)
+registry.register('landmark_subset', _load_landmark_subset)
+registry.register('facemark_lbf', _load_facemark_lbf)
+registry.register('emotion_model', _load_emotion_model)
+registry.register('emotion_tflite', _load_emotion_tflite)
+registry.register('emotion_onnx', _load_emotion_onnx)
+registry.register('emotion_dnn', _load_emotion_dnn)
+registry.register('phone_model', _load_phone_model)
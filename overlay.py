@@ -0,0 +1,94 @@
+"""
+Overlay Rendering Module for the Drowsiness Detection System
+Draws detection results onto frames. Analysis never draws by itself, so
+headless and batch consumers never pay for annotation; callers that need
+pixels (video display, /video_feed) render explicitly.
+"""
+
+import cv2
+import numpy as np
+import face_geometry
+
+GREEN = (0, 255, 0)
+RED = (0, 0, 255)
+BLACK = (0, 0, 0)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+def _draw_label(frame: np.ndarray, text: str, y_pos: int, color=GREEN, background: bool = False):
+    """Draw a line of text at the left edge, optionally on a black background"""
+    if background:
+        (text_width, _), _ = cv2.getTextSize(text, FONT, 0.7, 2)
+        cv2.rectangle(frame, (10, y_pos - 25), (10 + text_width, y_pos + 5), BLACK, -1)
+    cv2.putText(frame, text, (10, y_pos), FONT, 0.7, color, 2)
+
+def _draw_face_box(frame: np.ndarray, face_analysis):
+    """Draw an occupant's face box, coloured by their status, with their track ID"""
+    face = face_analysis.face
+    color = RED if face_analysis.is_drowsy else GREEN
+    cv2.rectangle(frame, (face.left(), face.top()), (face.right(), face.bottom()), color, 2)
+    cv2.putText(frame, f"#{face_analysis.track_id} EAR {face_analysis.ear:.2f}",
+                (face.left(), max(15, face.top() - 8)), FONT, 0.5, color, 1)
+
+def draw_drowsiness(frame: np.ndarray, analysis) -> np.ndarray:
+    """
+    Draw every occupant's face box and eye landmarks, and the EAR and status
+    of the primary occupant
+
+    Args:
+        frame: Frame to draw on (modified in place)
+        analysis: FrameAnalysis of the same frame
+
+    Returns:
+        np.ndarray: The annotated frame
+    """
+    if not analysis.face_detected:
+        return frame
+
+    for face_analysis in analysis.faces:
+        _draw_face_box(frame, face_analysis)
+        for eye in (face_geometry.LEFT_EYE, face_geometry.RIGHT_EYE):
+            for (x, y) in face_analysis.shape[eye]:
+                cv2.circle(frame, (int(x), int(y)), 1, RED, -1)
+
+    _draw_label(frame, f"EAR: {analysis.ear:.2f}", 30)
+    status = "Drowsy" if analysis.is_drowsy else "Alert"
+    _draw_label(frame, f"Status: {status}", 60, RED if analysis.is_drowsy else GREEN)
+    return frame
+
+def draw_status(frame: np.ndarray, drowsiness: dict) -> np.ndarray:
+    """
+    Draw the drowsiness status summary kept by the API server
+
+    Args:
+        frame: Frame to draw on (modified in place)
+        drowsiness: Dict with 'is_drowsy', 'ear_value', 'blink_count' and 'yawn_count'
+
+    Returns:
+        np.ndarray: The annotated frame
+    """
+    drowsy = drowsiness.get("is_drowsy", False)
+    _draw_label(frame, f"Status: {'Drowsy' if drowsy else 'Alert'}", 30, RED if drowsy else GREEN)
+    _draw_label(frame, f"EAR: {drowsiness.get('ear_value', 0.0):.2f}", 60)
+    _draw_label(frame, f"Blinks: {drowsiness.get('blink_count', 0)}", 90)
+    _draw_label(frame, f"Yawns: {drowsiness.get('yawn_count', 0)}", 120)
+    return frame
+
+def draw_emotion(frame: np.ndarray, emotion: str, confidence: float) -> np.ndarray:
+    """
+    Draw the current emotion below the drowsiness labels
+
+    Args:
+        frame: Frame to draw on (modified in place)
+        emotion: Emotion label
+        confidence: Confidence of the emotion, 0 to 1
+
+    Returns:
+        np.ndarray: The annotated frame
+    """
+    _draw_label(frame, f"Emotion: {emotion} ({confidence:.2f})", 90)
+    return frame
+
+def draw_no_face_warning(frame: np.ndarray) -> np.ndarray:
+    """Draw a warning when no face is detected"""
+    cv2.putText(frame, "No face detected", (30, 30), FONT, 0.7, RED, 2)
+    return frame
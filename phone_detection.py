@@ -1,11 +1,11 @@
-import torch
 import cv2
 import numpy as np
 import logging
 from pathlib import Path
-from ultralytics import YOLO
 from typing import Tuple, Optional
 import time
+from frame_context import FrameContext
+from model_registry import registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -16,9 +16,6 @@ class PhoneDetector:
     def __init__(self):
         """Initialize phone detection with improved parameters"""
         try:
-            # Load YOLOv5 model with better parameters
-            self.model = YOLO('yolov5s.pt')
-            
             # Improved confidence thresholds
             self.conf_threshold = 0.5  # Higher confidence threshold for better accuracy
             self.iou_threshold = 0.45  # Adjusted IOU threshold
@@ -43,11 +40,20 @@ class PhoneDetector:
             
         except Exception as e:
             logger.error(f"Error initializing phone detector: {e}")
-            self.model = None
+
+    @property
+    def model(self):
+        """Shared YOLO model, loaded on first use"""
+        return registry.get('phone_model')
     
-    def detect_phone(self, frame: np.ndarray) -> Tuple[np.ndarray, bool, float]:
+    def detect_phone(self, frame: np.ndarray, context: Optional[FrameContext] = None) -> Tuple[np.ndarray, bool, float]:
         """
         Enhanced phone detection with tracking and performance optimization
+        
+        Args:
+            frame: BGR frame, annotated in place when a phone is found
+            context: FrameContext of the frame, YOLO then only runs on the driver's head-and-hands region
+            
         Returns: (processed_frame, phone_detected, confidence)
         """
         if frame is None:
@@ -65,7 +71,7 @@ class PhoneDetector:
             
             # If tracking failed or not initialized, run detection
             if current_time - self.last_detection_time >= self.detection_cooldown:
-                phone_detected, confidence, bbox = self._detect_phone(frame)
+                phone_detected, confidence, bbox = self._detect_phone(frame, context)
                 if phone_detected:
                     # Initialize tracker with detected phone
                     self.tracker = cv2.TrackerCSRT_create()
@@ -81,11 +87,14 @@ class PhoneDetector:
             logger.error(f"Error in phone detection: {e}")
             return frame, False, 0.0
 
-    def _detect_phone(self, frame: np.ndarray) -> Tuple[bool, float, Optional[Tuple[int, int, int, int]]]:
-        """Run YOLO detection for phones"""
+    def _detect_phone(self, frame: np.ndarray, context: Optional[FrameContext] = None
+                      ) -> Tuple[bool, float, Optional[Tuple[int, int, int, int]]]:
+        """Run YOLO detection for phones, on the context's phone region if given"""
         try:
+            region, (offset_x, offset_y) = context.phone_crop() if context is not None else (frame, (0, 0))
+            
             # Run YOLO detection
-            results = self.model(frame, conf=self.conf_threshold, iou=self.iou_threshold)
+            results = self.model(region, conf=self.conf_threshold, iou=self.iou_threshold)
             
             # Process results
             for result in results:
@@ -99,7 +108,8 @@ class PhoneDetector:
                         
                         # Check minimum size
                         if (x2 - x1) >= self.min_phone_size and (y2 - y1) >= self.min_phone_size:
-                            return True, confidence, (x1, y1, x2, y2)
+                            # Back to frame coordinates
+                            return True, confidence, (x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y)
             
             return False, 0.0, None
             
@@ -177,11 +187,13 @@ class PhoneDetector:
         cap.release()
         cv2.destroyAllWindows()
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, context: Optional[FrameContext] = None):
         """Process a single frame for the API server
         
         Args:
             frame: The input frame to process
+            context: FrameContext of the frame, YOLO then only runs on the
+                driver's head-and-hands region instead of the full frame
             
         Returns:
             dict: Detection results including is_detected and confidence
@@ -190,8 +202,10 @@ class PhoneDetector:
             return None
         
         try:
+            region = context.phone_crop()[0] if context is not None else frame
+            
             # Convert to RGB for YOLO
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb_frame = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
             
             # Perform detection
             results = self.model(rgb_frame)
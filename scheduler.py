@@ -0,0 +1,293 @@
+"""
+Real-Time Scheduling Module for the Drowsiness Detection System
+A grabber thread drains the capture into a frame bus so the analysis always
+gets the freshest frame instead of a growing backlog, and a deadline scheduler decides per
+frame which optional analyses (face re-detection, emotion, phone) fit into
+the remaining latency budget, based on their measured cost.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from frame_bus import FrameBus, FrameRef
+
+logger = logging.getLogger(__name__)
+
+class FrameGrabber:
+    """Background thread capturing into a FrameBus, which keeps only the newest frame"""
+
+    def __init__(self, capture, loop: bool = False, pace: Optional[bool] = None, pool_size: int = 4):
+        """
+        Initialize the grabber
+
+        Args:
+            capture: Open capture.TimestampedCapture
+            loop: Restart video files at the end instead of stopping
+            pace: Release file frames at their timestamps, like a live camera.
+                Defaults to True for files and False for cameras, which are paced by the device.
+            pool_size: Frame buffers kept for reuse by the bus
+        """
+        self.capture = capture
+        self.loop = loop
+        self.pace = (not capture.live) if pace is None else pace
+        self.bus = FrameBus(pool_size)
+        self._frame_shape = None
+        self._consumed_seq = 0
+        self._running = False
+        self._thread = None
+
+    @property
+    def grabbed(self) -> int:
+        """Frames read from the capture"""
+        return self.bus.published
+
+    @property
+    def dropped(self) -> int:
+        """Frames replaced by a newer one before they were consumed"""
+        return self.bus.dropped
+
+    @property
+    def finished(self) -> bool:
+        """Whether the source ended or the grabber was stopped"""
+        return self.bus.closed
+
+    def start(self):
+        """Start the grabber thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the grabber thread, the capture is left open"""
+        self._running = False
+        self.bus.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self.bus.clear()
+
+    def _run(self):
+        """Grab frames until stopped or the source ends"""
+        pace_origin = None  # (capture timestamp, monotonic time) of the first paced frame
+
+        while self._running:
+            if not self.capture.grab():
+                if self.loop and not self.capture.live and self.capture.rewind():
+                    continue
+                logger.info("Capture ended")
+                break
+
+            timestamp = self.capture.timestamp
+            if self.pace:
+                if pace_origin is None:
+                    pace_origin = (timestamp, time.monotonic())
+                delay = pace_origin[1] + (timestamp - pace_origin[0]) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            # Decode into a recycled buffer, OpenCV only allocates when the frame size changes
+            buffer = self.bus.buffer(self._frame_shape) if self._frame_shape is not None else None
+            ret, image = self.capture.retrieve(buffer)
+            if buffer is not None and image is not buffer:
+                self.bus.recycle(buffer)
+            if not ret:
+                continue
+
+            self._frame_shape = image.shape
+            self.bus.publish(image, timestamp)
+
+        self.bus.close()
+
+    def next(self, timeout: float = 1.0) -> Optional[FrameRef]:
+        """
+        Wait for a frame newer than the last one returned
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            Optional[FrameRef]: The newest frame, to be released by the caller.
+                None on timeout or when the source ended.
+        """
+        frame = self.bus.wait(self._consumed_seq, timeout)
+        if frame is not None:
+            self._consumed_seq = frame.seq
+        return frame
+
+class Stage:
+    """Cost and deadline bookkeeping of one analysis stage"""
+
+    def __init__(self, name: str, min_interval: float = 0.0, max_interval: Optional[float] = None,
+                 required: bool = False, due: Optional[Callable[[], bool]] = None):
+        """
+        Initialize the stage
+
+        Args:
+            name: Stage name
+            min_interval: Seconds of capture time between runs
+            max_interval: Run even when over budget once this many seconds passed since the last run
+            required: Run on every frame regardless of the budget
+            due: Optional callable telling whether the stage has work on the current frame
+        """
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.required = required
+        self.due = due
+        self.cost = None  # Smoothed run time in seconds, unknown until the first run
+        self.last_run = None  # Capture timestamp of the last run
+        self.runs = 0
+        self.skipped = 0  # Due, but left out to hold the latency target
+        self.deadline_misses = 0  # Runs that finished after the frame's deadline
+
+    def since_last_run(self, timestamp: float) -> float:
+        """Capture time since the last run, infinite before the first"""
+        return float('inf') if self.last_run is None else timestamp - self.last_run
+
+    def is_due(self, timestamp: float) -> bool:
+        """Whether the stage wants to run on a frame captured at timestamp"""
+        if self.since_last_run(timestamp) < self.min_interval:
+            return False
+        return self.due is None or self.due()
+
+class RealtimeScheduler:
+    """Chooses the stages to run on each frame to hold a target end-to-end latency"""
+
+    def __init__(self, target_latency: float = 0.15, cost_smoothing: float = 0.2):
+        """
+        Initialize the scheduler
+
+        Args:
+            target_latency: Seconds from frame arrival to the end of its processing
+            cost_smoothing: Weight of the newest run time in the smoothed stage cost
+        """
+        self.target_latency = target_latency
+        self.cost_smoothing = cost_smoothing
+        self.stages = {}
+        self.frames = 0
+        self.latency = None  # Smoothed end-to-end latency in seconds
+        self.late_frames = 0
+        self._timestamp = None
+        self._deadline = None
+
+    def add_stage(self, name: str, min_interval: float = 0.0, max_interval: Optional[float] = None,
+                  required: bool = False, due: Optional[Callable[[], bool]] = None) -> Stage:
+        """
+        Register an analysis stage, see Stage for the arguments
+
+        Returns:
+            Stage: The registered stage
+        """
+        stage = Stage(name, min_interval, max_interval, required, due)
+        self.stages[name] = stage
+        return stage
+
+    def begin(self, frame: FrameRef) -> set:
+        """
+        Start a frame and plan its stages
+
+        Required stages always run. Due optional stages run, most overdue
+        first, while their estimated cost fits into what is left of the
+        latency budget after the required stages. A stage that has not run
+        for max_interval runs regardless, so none starves.
+
+        Args:
+            frame: The frame about to be processed
+
+        Returns:
+            set: Names of the stages to run on this frame
+        """
+        self._timestamp = frame.timestamp
+        self._deadline = frame.arrival + self.target_latency
+        budget = self._deadline - time.monotonic()
+
+        planned = set()
+        optional = []
+        for stage in self.stages.values():
+            if stage.required:
+                planned.add(stage.name)
+                budget -= stage.cost or 0.0
+            elif stage.is_due(frame.timestamp):
+                optional.append(stage)
+
+        def overdue(stage):
+            return stage.since_last_run(frame.timestamp) / max(stage.min_interval, 1e-3)
+
+        for stage in sorted(optional, key=overdue, reverse=True):
+            cost = stage.cost or 0.0
+            starving = (stage.max_interval is not None
+                        and stage.since_last_run(frame.timestamp) >= stage.max_interval)
+            if cost <= budget or starving:
+                planned.add(stage.name)
+                budget -= cost
+            else:
+                stage.skipped += 1
+        return planned
+
+    def record(self, name: str, seconds: float):
+        """
+        Record a run of a stage timed by the caller
+
+        Args:
+            name: Stage name
+            seconds: Run time of the stage
+        """
+        stage = self.stages[name]
+        stage.cost = seconds if stage.cost is None else (
+            stage.cost + self.cost_smoothing * (seconds - stage.cost))
+        stage.last_run = self._timestamp
+        stage.runs += 1
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            stage.deadline_misses += 1
+
+    @contextmanager
+    def measure(self, name: str):
+        """Context manager timing a run of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def end(self, frame: FrameRef) -> float:
+        """
+        Finish a frame
+
+        Args:
+            frame: The processed frame
+
+        Returns:
+            float: End-to-end latency of the frame in seconds
+        """
+        latency = time.monotonic() - frame.arrival
+        self.frames += 1
+        if latency > self.target_latency:
+            self.late_frames += 1
+        self.latency = latency if self.latency is None else (
+            self.latency + self.cost_smoothing * (latency - self.latency))
+        return latency
+
+    def stats(self) -> dict:
+        """
+        Scheduling statistics
+
+        Returns:
+            dict: Frame count, smoothed latency, late frames and per-stage cost, runs, skips and misses
+        """
+        return {
+            "frames": self.frames,
+            "latency_ms": self.latency * 1000.0 if self.latency is not None else None,
+            "target_latency_ms": self.target_latency * 1000.0,
+            "late_frames": self.late_frames,
+            "stages": {
+                name: {
+                    "cost_ms": stage.cost * 1000.0 if stage.cost is not None else None,
+                    "runs": stage.runs,
+                    "skipped": stage.skipped,
+                    "deadline_misses": stage.deadline_misses
+                }
+                for name, stage in self.stages.items()
+            }
+        }
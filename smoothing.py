@@ -0,0 +1,176 @@
+"""
+Smoothing Module for the Drowsiness Detection System
+Streaming One-Euro filters (Casiez et al., 2012) that remove landmark jitter
+while following fast movements such as blinks. One filter handles any array
+shape, e.g. all 68 landmarks of a face in one call, with constant state.
+Class probabilities (emotions) are averaged over time with an exponential
+moving average and the top class only changes with a margin (hysteresis).
+"""
+
+import math
+import numpy as np
+import config
+
+def _smoothing_factor(dt: float, cutoff):
+    """Exponential smoothing factor of a first-order low-pass filter"""
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class OneEuroFilter:
+    """Adaptive low-pass filter: strong smoothing at rest, little lag during fast motion"""
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, d_cutoff: float = 1.0):
+        """
+        Initialize the filter
+
+        Args:
+            min_cutoff: Cutoff frequency in Hz at zero speed, lower values smooth more
+            beta: Cutoff increase per unit of speed, higher values reduce lag
+            d_cutoff: Cutoff frequency in Hz of the speed estimate
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state, the next sample passes through unchanged"""
+        self.value = None
+        self.speed = None
+        self.timestamp = None
+
+    def filter(self, value, timestamp: float, scale: float = 1.0):
+        """
+        Filter a sample
+
+        Args:
+            value: Scalar or array sample, same shape on every call
+            timestamp: Time of the sample in seconds
+            scale: Unit the speed is measured in for the adaptive cutoff, e.g.
+                the face size for pixel coordinates, so beta does not depend on
+                how close the face is to the camera
+
+        Returns:
+            Filtered value, float64 array of the sample's shape
+        """
+        value = np.asarray(value, dtype=np.float64)
+
+        if self.value is None or timestamp <= self.timestamp:
+            # First sample, or a repeated/out-of-order timestamp
+            if self.value is None or self.value.shape != value.shape:
+                self.value = value.copy()
+                self.speed = np.zeros_like(value)
+            self.timestamp = timestamp if self.timestamp is None else max(self.timestamp, timestamp)
+            return self.value.copy()
+
+        dt = timestamp - self.timestamp
+        self.timestamp = timestamp
+
+        speed = (value - self.value) / dt
+        alpha_d = _smoothing_factor(dt, self.d_cutoff)
+        self.speed += alpha_d * (speed - self.speed)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self.speed) / max(scale, 1e-9)
+        alpha = _smoothing_factor(dt, cutoff)
+        self.value += alpha * (value - self.value)
+        return self.value.copy()
+
+class ProbabilityEma:
+    """Exponential moving average of class probabilities with a hysteresis top class"""
+
+    def __init__(self, classes: list, time_constant: float = 2.0, switch_margin: float = 0.1):
+        """
+        Initialize the average
+
+        Args:
+            classes: Class names, in the order of the probability vectors
+            time_constant: Seconds after which a sample's weight has decayed to 1/e
+            switch_margin: Probability by which another class must lead the
+                current top class before it takes over
+        """
+        self.classes = list(classes)
+        self.time_constant = time_constant
+        self.switch_margin = switch_margin
+        self.reset()
+
+    def reset(self):
+        """Forget the average, the next sample is taken as it is"""
+        self.probabilities = None
+        self.top_index = None
+        self.timestamp = None
+
+    @property
+    def top(self):
+        """Current top class name, None before the first sample"""
+        return self.classes[self.top_index] if self.top_index is not None else None
+
+    @property
+    def confidence(self) -> float:
+        """Averaged probability of the current top class"""
+        return float(self.probabilities[self.top_index]) if self.top_index is not None else 0.0
+
+    def update(self, probabilities, timestamp: float) -> str:
+        """
+        Add a sample
+
+        Args:
+            probabilities: Class probabilities of the sample
+            timestamp: Time of the sample in seconds, the weight of a sample
+                grows with the time since the previous one
+
+        Returns:
+            str: The top class after the update
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+
+        if self.probabilities is None:
+            self.probabilities = probabilities.copy()
+            self.timestamp = timestamp
+        else:
+            dt = max(0.0, timestamp - self.timestamp)
+            self.timestamp = max(self.timestamp, timestamp)
+            alpha = 1.0 - math.exp(-dt / self.time_constant) if self.time_constant > 0 else 1.0
+            self.probabilities += alpha * (probabilities - self.probabilities)
+
+        leader = int(np.argmax(self.probabilities))
+        if (self.top_index is None or self.probabilities[leader]
+                >= self.probabilities[self.top_index] + self.switch_margin):
+            self.top_index = leader
+        return self.top
+
+def create_landmark_filter():
+    """
+    Create the landmark coordinate filter of a face track
+
+    Returns:
+        OneEuroFilter: Filter configured from config.SMOOTHING_PARAMS, or None when disabled
+    """
+    params = config.SMOOTHING_PARAMS
+    if not params['LANDMARK_SMOOTHING']:
+        return None
+    return OneEuroFilter(params['LANDMARK_MIN_CUTOFF'], params['LANDMARK_BETA'], params['D_CUTOFF'])
+
+def create_metric_filter():
+    """
+    Create the EAR/MAR filter of a face track
+
+    Returns:
+        OneEuroFilter: Filter configured from config.SMOOTHING_PARAMS, or None when disabled
+    """
+    params = config.SMOOTHING_PARAMS
+    if not params['METRIC_SMOOTHING']:
+        return None
+    return OneEuroFilter(params['METRIC_MIN_CUTOFF'], params['METRIC_BETA'], params['D_CUTOFF'])
+
+def create_emotion_filter(classes: list):
+    """
+    Create the emotion probability average of a recognizer
+
+    Args:
+        classes: Emotion names in the model's output order
+
+    Returns:
+        ProbabilityEma: Average configured from config.EMOTION_PARAMS
+    """
+    params = config.EMOTION_PARAMS
+    return ProbabilityEma(classes, params['EMA_TIME_CONSTANT'], params['SWITCH_MARGIN'])
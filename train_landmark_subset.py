@@ -0,0 +1,141 @@
+"""
+Train the eye/mouth subset landmark model for the Drowsiness Detection System
+Labels faces in recorded videos with the 68-point dlib predictor and trains a
+smaller dlib shape predictor on the LANDMARK_SUBSET_POINTS only, with shallower
+trees and fewer cascade levels. Select it with LANDMARK_MODEL = 'dlib_subset'.
+The last frames of every video are held out to measure the error on faces
+the model was not trained on.
+
+Usage:
+    python train_landmark_subset.py cabin1.mp4 cabin2.mp4 [-o models/shape_predictor_eyes_mouth.dat] [--every 5] [--holdout 0.2]
+"""
+
+import argparse
+import logging
+import os
+
+import cv2
+import dlib
+import numpy as np
+
+import config
+from face_detectors import create_face_detector
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+def collect_samples(video_paths, points, every=5, max_samples=2000):
+    """
+    Label faces with the 68-point predictor and keep the subset points
+
+    Args:
+        video_paths: Videos to sample frames from
+        points: 68-point indices of the subset
+        every: Use every N-th frame
+        max_samples: Stop after this many labelled frames
+
+    Returns:
+        tuple: (images, detections, sources) with images and detections in the format
+            of dlib.train_shape_predictor, and the index of the video of each image
+    """
+    detector = create_face_detector()
+    predictor = registry.get('shape_predictor')
+    images = []
+    detections = []
+    sources = []
+
+    for source, video_path in enumerate(video_paths):
+        cap = cv2.VideoCapture(video_path)
+        frame_index = 0
+
+        while len(images) < max_samples:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            if frame_index % every == 0:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                labelled = []
+                for face in detector.detect(gray):
+                    shape = predictor(gray, face)
+                    parts = [shape.part(int(index)) for index in points]
+                    labelled.append(dlib.full_object_detection(face, parts))
+                if labelled:
+                    images.append(gray)
+                    detections.append(labelled)
+                    sources.append(source)
+
+            frame_index += 1
+
+        cap.release()
+
+    return images, detections, sources
+
+def split_holdout(sources, fraction):
+    """
+    Pick the held-out samples: the last fraction of every video's samples, as
+    neighbouring frames are too similar to test on each other
+
+    Args:
+        sources: Video index of every sample, in frame order
+        fraction: Fraction of each video's samples to hold out
+
+    Returns:
+        list: Whether each sample is held out
+    """
+    counts = np.bincount(sources)
+    seen = np.zeros_like(counts)
+    held_out = []
+    for source in sources:
+        held_out.append(bool(seen[source] >= counts[source] - int(counts[source] * fraction)))
+        seen[source] += 1
+    return held_out
+
+def main():
+    """Parse arguments and train the subset model"""
+    parser = argparse.ArgumentParser(description="Train an eye/mouth-only dlib landmark model")
+    parser.add_argument('videos', nargs='+', help="Videos to label and train on")
+    parser.add_argument('-o', '--output', default=config.LANDMARK_SUBSET_MODEL_PATH, help="Output model file")
+    parser.add_argument('--every', type=int, default=5, help="Use every N-th frame")
+    parser.add_argument('--max-samples', type=int, default=2000, help="Maximum number of labelled frames")
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help="Fraction of each video's labelled frames, taken from its end, kept out of training")
+    parser.add_argument('--tree-depth', type=int, default=4, help="Depth of each regression tree")
+    parser.add_argument('--cascade-depth', type=int, default=10, help="Number of cascade levels")
+    parser.add_argument('--trees', type=int, default=300, help="Regression trees per cascade level")
+    args = parser.parse_args()
+
+    points = np.asarray(config.DROWSINESS_PARAMS['LANDMARK_SUBSET_POINTS'])
+    if not 0.0 <= args.holdout < 1.0:
+        parser.error("--holdout must be in [0, 1)")
+
+    images, detections, sources = collect_samples(args.videos, points, args.every, args.max_samples)
+    if not images:
+        parser.error("No faces found in the given videos")
+    held_out = split_holdout(sources, args.holdout)
+    test_images = [image for image, test in zip(images, held_out) if test]
+    test_detections = [labelled for labelled, test in zip(detections, held_out) if test]
+    images = [image for image, test in zip(images, held_out) if not test]
+    detections = [labelled for labelled, test in zip(detections, held_out) if not test]
+    print(f"Training on {len(images)} frames, testing on {len(test_images)}, {len(points)} points per face")
+
+    options = dlib.shape_predictor_training_options()
+    options.tree_depth = args.tree_depth
+    options.cascade_depth = args.cascade_depth
+    options.num_trees_per_cascade_level = args.trees
+    options.oversampling_amount = 10
+    options.num_threads = os.cpu_count() or 1
+    options.be_verbose = True
+
+    predictor = dlib.train_shape_predictor(images, detections, options)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    predictor.save(args.output)
+    print(f"Saved {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB), "
+          f"training error {dlib.test_shape_predictor(images, detections, predictor):.2f} px")
+    if test_images:
+        print(f"Held-out error {dlib.test_shape_predictor(test_images, test_detections, predictor):.2f} px")
+    else:
+        print("No frames held out, the training error overstates the accuracy")
+
+if __name__ == "__main__":
+    main()